@@ -10,8 +10,10 @@ Demonstrates simple sequential workflow:
 
 Run:
     uvx --with langgraph --with mcp --with langchain-core python 01_basic_workflow.py
+    python 01_basic_workflow.py --resume <run-id>  # With CHECKPOINT_PATH set, after a crash or Ctrl-C
 """
 
+import argparse
 import asyncio
 import json
 import os
@@ -22,13 +24,37 @@ from langgraph.graph.message import add_messages
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+from adaptive_limiter import LimitedSession, PortalLimiters
+from catalog_index import CatalogIndex, CatalogStore
+from checkpoints import (
+    SQLiteCheckpointer,
+    finish_run,
+    new_run_id,
+    run_journal,
+    run_or_resume,
+)
+from ckan_client import CKANMCPClient
+from ckan_records import DatasetRecord, RawStore
+from hedging import HedgedSession
 from metadata_quality import MetadataQualityScorer
+from tool_cache import CachedSession, CoalescingSession, ToolCallCache
+from tracing import TracedSession, Tracer, traced_node
 
 # Configuration
 CKAN_SERVER = "https://www.dati.gov.it/opendata"
 MCP_SERVER_PATH = os.path.join(os.path.dirname(__file__), "../../dist/index.js")
 QUALITY_THRESHOLD = 40  # Minimum quality score (0-100)
-SEARCH_ROWS = 5  # Limit rows to avoid JSON truncation in MCP responses
+TOP_K = None  # e.g. 10: keep only the best-scoring datasets above the threshold
+MAX_RESULTS = 100  # Upper bound on datasets collected by the search node
+TOOL_CACHE_PATH = None  # Set to e.g. "tool_cache.sqlite" to cache across runs
+TRACE_PATH = None  # Set to e.g. "trace.json" or "metrics.prom" to export spans
+CHECKPOINT_PATH = None  # e.g. "checkpoints/checkpoints.sqlite": checkpoint runs, allow --resume
+RAW_STORE_PATH = None  # e.g. "raw_packages.sqlite": keep full package JSON for DatasetRecord.raw()
+SEARCH_INDEX_STORE = None  # e.g. "catalog_store": search a catalog_harvester.py copy locally
+PORTALS_PATH = os.path.join(os.path.dirname(__file__), "../../src/portals.json")
+SEARCH_PORTALS: list[str] = []  # Portal ids or URLs to fan out to; empty = CKAN_SERVER
+MAX_RESULTS_PER_PORTAL = 50
+PORTAL_TIMEOUT = 20.0  # Seconds; slower portals contribute partial results
 
 
 # State definition
@@ -37,77 +63,140 @@ class WorkflowState(TypedDict):
 
     messages: Annotated[list, add_messages]
     query: str
-    datasets: list[dict]
-    filtered_datasets: list[dict]
+    datasets: list[DatasetRecord]
+    filtered_datasets: list[DatasetRecord]
     csv_resources: list[dict]
     error: str | None
 
 
-# MCP Client helper
-class CKANMCPClient:
-    """Helper for calling CKAN MCP Server tools."""
-
-    def __init__(self, session: ClientSession):
-        self.session = session
+# Workflow nodes
+async def search_datasets_node(
+    state: WorkflowState, mcp_client: CKANMCPClient, index: CatalogIndex | None = None
+) -> WorkflowState:
+    """Node 1: Search datasets (in the local index, if one is given)."""
+    print(f"\n[1/3] Searching datasets for: '{state['query']}'")
 
-    async def search_packages(self, query: str, rows: int = SEARCH_ROWS) -> dict:
-        """Search CKAN packages."""
-        result = await self.session.call_tool(
-            "ckan_package_search",
-            arguments={
-                "server_url": CKAN_SERVER,
-                "q": query,
-                "rows": rows,
-                "response_format": "json",
-            },
+    try:
+        if index is not None:
+            result = index.search(state["query"], limit=MAX_RESULTS)
+            datasets, total = result.records, result.count
+            skipped = 0
+        else:
+            store = RawStore(RAW_STORE_PATH) if RAW_STORE_PATH else None
+            datasets = []
+            try:
+                async for dataset in mcp_client.iter_packages(
+                    state["query"], max_results=MAX_RESULTS
+                ):
+                    datasets.append(DatasetRecord.from_dict(dataset, store))
+            finally:
+                if store is not None:
+                    store.close()
+            total = mcp_client.last_search_count
+            skipped = mcp_client.last_search_skipped
+
+        state["datasets"] = datasets
+        state["messages"].append(
+            {"role": "assistant", "content": f"Found {len(datasets)} datasets"}
+        )
+        print(
+            f"   ✓ Found {total if total is not None else len(datasets)} total, fetched {len(datasets)}"
         )
+        if skipped:
+            print(f"   ⚠ Skipped {skipped} datasets truncated on every attempt")
 
-        # Parse JSON from text content
-        for content in result.content:
-            if content.type == "text":
-                try:
-                    text = content.text
-                    # Handle truncation marker if present
-                    if "[Response truncated" in text:
-                        text = text.split("[Response truncated")[0].strip()
-                    return json.loads(text)
-                except json.JSONDecodeError as e:
-                    return {"error": f"JSON parse error: {e}"}
+    except Exception as e:
+        state["error"] = str(e)
+        print(f"   ✗ Error: {e}")
 
-        return {"error": "No content in response"}
+    return state
 
 
-# Workflow nodes
-async def search_datasets_node(
+def load_portals(portal_ids: list[str]) -> list[dict]:
+    """Resolve portal ids from src/portals.json; plain URLs are used as-is."""
+    with open(PORTALS_PATH, encoding="utf-8") as f:
+        known = {p["id"]: p for p in json.load(f)["portals"]}
+
+    portals = []
+    for portal_id in portal_ids:
+        if portal_id in known:
+            portals.append({"id": portal_id, "api_url": known[portal_id]["api_url"]})
+        elif portal_id.startswith("http"):
+            portals.append({"id": portal_id, "api_url": portal_id})
+        else:
+            raise ValueError(f"Unknown portal: {portal_id}")
+    return portals
+
+
+async def _search_portal(
+    mcp_client: CKANMCPClient, portal: dict, query: str, store: RawStore | None
+) -> tuple[list[DatasetRecord], str]:
+    """Collect one portal's results; keep what arrived if it times out."""
+    datasets = []
+
+    async def collect():
+        async for dataset in mcp_client.iter_packages(
+            query, max_results=MAX_RESULTS_PER_PORTAL, server_url=portal["api_url"]
+        ):
+            dataset["_portal"] = portal["id"]  # Tag with source portal
+            datasets.append(DatasetRecord.from_dict(dataset, store))
+
+    try:
+        await asyncio.wait_for(collect(), timeout=PORTAL_TIMEOUT)
+        status = "ok"
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except Exception as e:
+        status = f"error: {e}"
+
+    return datasets, status
+
+
+async def search_portals_node(
     state: WorkflowState, mcp_client: CKANMCPClient
 ) -> WorkflowState:
-    """Node 1: Search datasets."""
-    print(f"\n[1/3] Searching datasets for: '{state['query']}'")
+    """Node 1 (multi-portal): search SEARCH_PORTALS concurrently."""
+    print(f"\n[1/3] Searching {len(SEARCH_PORTALS)} portals for: '{state['query']}'")
 
     try:
-        response = await mcp_client.search_packages(state["query"])
-
-        if "error" in response:
-            state["error"] = response["error"]
-            print(f"   ✗ Error: {response['error']}")
-            return state
-
-        if "results" in response:
-            datasets = response["results"]
-            state["datasets"] = datasets
-            state["messages"].append(
-                {"role": "assistant", "content": f"Found {len(datasets)} datasets"}
-            )
-            print(
-                f"   ✓ Found {response.get('count', len(datasets))} total, showing {len(datasets)}"
+        portals = load_portals(SEARCH_PORTALS)
+    except (OSError, KeyError, ValueError) as e:
+        state["error"] = f"Cannot load portals: {e}"
+        print(f"   ✗ Error: {state['error']}")
+        return state
+
+    store = RawStore(RAW_STORE_PATH) if RAW_STORE_PATH else None
+    try:
+        results = await asyncio.gather(
+            *(
+                _search_portal(mcp_client, portal, state["query"], store)
+                for portal in portals
             )
-        else:
-            state["error"] = "Unexpected response structure"
-            print(f"   ✗ Error: missing 'results' key")
+        )
+    finally:
+        if store is not None:
+            store.close()
+
+    datasets = []
+    for portal, (portal_datasets, status) in zip(portals, results):
+        datasets.extend(portal_datasets)
+        mark = "✓" if status == "ok" else "✗"
+        print(f"   {mark} {portal['id']}: {len(portal_datasets)} datasets ({status})")
+
+    if not datasets and all(status != "ok" for _, status in results):
+        state["error"] = "All portals failed: " + "; ".join(
+            f"{portal['id']} ({status})" for portal, (_, status) in zip(portals, results)
+        )
+        print(f"   ✗ Error: {state['error']}")
+        return state
 
-    except Exception as e:
-        state["error"] = str(e)
-        print(f"   ✗ Error: {e}")
+    state["datasets"] = datasets
+    state["messages"].append(
+        {
+            "role": "assistant",
+            "content": f"Found {len(datasets)} datasets across {len(portals)} portals",
+        }
+    )
 
     return state
 
@@ -122,17 +211,33 @@ async def filter_quality_node(state: WorkflowState) -> WorkflowState:
     scorer = MetadataQualityScorer()
     filtered = []
 
-    for ds in state["datasets"]:
-        quality = scorer.score_dataset(ds)
-        ds["_quality"] = quality  # Attach quality info to dataset
-
-        if quality["score"] >= QUALITY_THRESHOLD:
+    if TOP_K:
+        # Pruned scoring: datasets outside the top k are not scored in full, so have no score
+        selected = scorer.top_k(state["datasets"], TOP_K, QUALITY_THRESHOLD)
+        for ds, quality in selected:
+            ds["_quality"] = quality  # Attach quality info to dataset
             filtered.append(ds)
-            print(
-                f"   ✓ {ds['title'][:50]}: {quality['score']}/100 ({quality['level']})"
-            )
-        else:
-            print(f"   ✗ {ds['title'][:50]}: {quality['score']}/100 (rejected)")
+            print(f"   ✓ {ds['title'][:50]}: {quality['score']}/100 ({quality['level']})")
+
+        kept = {id(ds) for ds in filtered}
+        for ds in state["datasets"]:
+            if id(ds) not in kept:
+                print(
+                    f"   ✗ {ds['title'][:50]}: below {QUALITY_THRESHOLD}/100 "
+                    f"or not in top {TOP_K} (rejected)"
+                )
+    else:
+        for ds in state["datasets"]:
+            quality = scorer.score_dataset(ds)
+            ds["_quality"] = quality  # Attach quality info to dataset
+
+            if quality["score"] >= QUALITY_THRESHOLD:
+                filtered.append(ds)
+                print(
+                    f"   ✓ {ds['title'][:50]}: {quality['score']}/100 ({quality['level']})"
+                )
+            else:
+                print(f"   ✗ {ds['title'][:50]}: {quality['score']}/100 (rejected)")
 
     state["filtered_datasets"] = filtered
     state["messages"].append(
@@ -199,17 +304,23 @@ async def extract_csv_node(state: WorkflowState) -> WorkflowState:
 
 
 # Build graph
-async def build_workflow(mcp_client: CKANMCPClient) -> StateGraph:
+async def build_workflow(
+    mcp_client: CKANMCPClient,
+    checkpointer: SQLiteCheckpointer | None = None,
+    index: CatalogIndex | None = None,
+) -> StateGraph:
     """Build LangGraph workflow."""
     graph = StateGraph(WorkflowState)
 
     # Add nodes - wrap async functions properly
     async def search_wrapper(state: WorkflowState) -> WorkflowState:
-        return await search_datasets_node(state, mcp_client)
+        if SEARCH_PORTALS:
+            return await search_portals_node(state, mcp_client)
+        return await search_datasets_node(state, mcp_client, index)
 
-    graph.add_node("search", search_wrapper)
-    graph.add_node("filter", filter_quality_node)
-    graph.add_node("extract", extract_csv_node)
+    graph.add_node("search", traced_node(search_wrapper, "search"))
+    graph.add_node("filter", traced_node(filter_quality_node, "filter"))
+    graph.add_node("extract", traced_node(extract_csv_node, "extract"))
 
     # Define edges
     graph.add_edge(START, "search")
@@ -217,10 +328,10 @@ async def build_workflow(mcp_client: CKANMCPClient) -> StateGraph:
     graph.add_edge("filter", "extract")
     graph.add_edge("extract", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
 
 
-async def main():
+async def main(resume: str | None = None):
     """Run workflow."""
     print("=" * 60)
     print("LangGraph + CKAN MCP Server - Basic Workflow")
@@ -235,8 +346,30 @@ async def main():
             print("\n✓ Connected to CKAN MCP Server")
 
             # Build workflow
-            mcp_client = CKANMCPClient(session)
-            workflow = await build_workflow(mcp_client)
+            cache = ToolCallCache(disk_path=TOOL_CACHE_PATH)
+            tracer = Tracer()
+            run_id = resume or new_run_id()
+            checkpointer = SQLiteCheckpointer(CHECKPOINT_PATH) if CHECKPOINT_PATH else None
+            # Cache misses are coalesced with identical calls in flight, get a
+            # deadline, hedging and budgeted retries, and each attempt waits for
+            # a slot under its portal's AIMD concurrency limit
+            limiters = PortalLimiters()
+            limited = LimitedSession(session, limiters, CKAN_SERVER)
+            hedged = HedgedSession(limited)
+            coalescer = CoalescingSession(hedged)
+            tools = CachedSession(coalescer, cache)
+            journal = None
+            if checkpointer is not None:
+                # Replays this run's tool results when it is resumed
+                journal = run_journal(CHECKPOINT_PATH, run_id)
+                tools = CachedSession(tools, journal)
+                print(f"✓ Run id: {run_id} (resume with --resume {run_id})")
+            mcp_client = CKANMCPClient(TracedSession(tools), server_url=CKAN_SERVER)
+            index = None
+            if SEARCH_INDEX_STORE:
+                index = CatalogIndex.from_store(CatalogStore(SEARCH_INDEX_STORE, CKAN_SERVER))
+                print(f"✓ Local search index: {len(index)} packages")
+            workflow = await build_workflow(mcp_client, checkpointer, index)
 
             # Execute workflow
             initial_state: WorkflowState = {
@@ -248,7 +381,16 @@ async def main():
                 "error": None,
             }
 
-            result = await workflow.ainvoke(initial_state)
+            with tracer.activate():
+                if checkpointer is None:
+                    result = await workflow.ainvoke(initial_state)
+                else:
+                    result = await run_or_resume(
+                        workflow, initial_state, run_id, resume=resume is not None
+                    )
+                    journal.close()
+                    finish_run(CHECKPOINT_PATH, run_id)
+                    checkpointer.close()
 
             # Display results
             print("\n" + "=" * 60)
@@ -270,8 +412,35 @@ async def main():
                         print(f"   Dataset: {res['dataset_title']}")
                         print(f"   URL: {res['url']}")
 
+            stats = cache.stats()
+            print(
+                f"\nTool cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{coalescer.coalesced} coalesced"
+            )
+            print(
+                f"Hedged calls: {hedged.hedges} ({hedged.hedge_wins} won), "
+                f"{hedged.retries} retries"
+            )
+            for portal, limiter in limiters.stats().items():
+                print(
+                    f"Portal {portal}: concurrency limit {limiter['limit']}, "
+                    f"{limiter['overloads']} overloaded responses"
+                )
+            cache.close()
+
+            print("\nTimings:")
+            print(tracer.format_summary())
+            if TRACE_PATH:
+                tracer.export(TRACE_PATH)
+                print(f"✓ Trace written to {TRACE_PATH}")
+
             print("\n" + "=" * 60)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue an interrupted run")
+    args = parser.parse_args()
+    if args.resume and not CHECKPOINT_PATH:
+        parser.error("--resume needs CHECKPOINT_PATH to be set")
+    asyncio.run(main(args.resume))
@@ -10,10 +10,11 @@ Advanced workflow demonstrating:
 
 Run:
     python 02_data_exploration.py
+    python 02_data_exploration.py --resume <run-id>  # With CHECKPOINT_PATH set, after a crash or Ctrl-C
 """
 
+import argparse
 import asyncio
-import json
 import os
 from typing import Annotated, Literal
 
@@ -22,11 +23,36 @@ from langgraph.graph.message import add_messages
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+from checkpoints import (
+    SQLiteCheckpointer,
+    finish_run,
+    new_run_id,
+    run_journal,
+    run_or_resume,
+)
+from ckan_client import CKANMCPClient
+from ckan_records import CompactResource, DatasetRecord, RawStore
+from csv_profiler import TableProfile, profile_csv, profile_stream
+from hedging import HedgedSession
+from resource_cache import ResourceCache
+from sql_profile import SQLProfileError, profile_datastore_sql
+from tool_cache import CachedSession, CoalescingSession, ToolCallCache
+from tracing import TracedSession, Tracer, traced_node
+
 
 # Configuration
 CKAN_SERVER = "https://www.dati.gov.it/opendata"
 MCP_SERVER_PATH = os.path.join(os.path.dirname(__file__), "../../dist/index.js")
 SEARCH_ROWS = 5  # Markdown format handles truncation gracefully
+TOOL_CACHE_PATH = None  # Set to e.g. "tool_cache.sqlite" to cache across runs
+TRACE_PATH = None  # Set to e.g. "trace.json" or "metrics.prom" to export spans
+CHECKPOINT_PATH = None  # e.g. "checkpoints/checkpoints.sqlite": checkpoint runs, allow --resume
+RAW_STORE_PATH = None  # e.g. "raw_packages.sqlite": keep full package JSON for DatasetRecord.raw()
+CSV_PROFILE_MAX_BYTES = None  # Cap on bytes profiled per CSV; None = whole file
+DATASTORE_MODE = "sample"  # "sample" (3 records), "full" (stream every row) or "sql"
+# "sql" profiles with aggregate queries and falls back to "full" if SQL is disabled
+DATASTORE_CONCURRENCY = 4  # Pages in flight in "full" mode
+RESOURCE_CACHE_DIR = None  # e.g. "resource_cache": keep downloaded resources across runs
     # Note: Some queries return very large metadata. Use specific queries like "trasporti"
 # instead of generic ones like "CSV" or "popolazione" to avoid JSON truncation.
 
@@ -37,66 +63,14 @@ class ExplorationState(dict):
 
     messages: Annotated[list, add_messages]
     query: str
-    datasets: list[dict]
-    selected_dataset: dict | None
-    selected_resource: dict | None
+    datasets: list[DatasetRecord]
+    selected_dataset: DatasetRecord | None
+    selected_resource: CompactResource | None
     resource_type: Literal["datastore", "csv", "unknown"] | None
     analysis_result: dict | None
     error: str | None
 
 
-# MCP Client
-class CKANMCPClient:
-    """Helper for CKAN MCP operations."""
-
-    def __init__(self, session: ClientSession):
-        self.session = session
-
-    async def search_packages(self, query: str, rows: int = SEARCH_ROWS) -> dict:
-        """Search packages."""
-        result = await self.session.call_tool(
-            "ckan_package_search",
-            arguments={
-                "server_url": CKAN_SERVER,
-                "q": query,
-                "rows": rows,
-                "response_format": "json",
-            },
-        )
-        for content in result.content:
-            if content.type == "text":
-                try:
-                    text = content.text
-                    if "[Response truncated" in text:
-                        text = text.split("[Response truncated")[0].strip()
-                    return json.loads(text)
-                except json.JSONDecodeError as e:
-                    return {"error": f"JSON parse error: {e}"}
-        return {"error": "No content in response"}
-
-    async def datastore_search(self, resource_id: str, limit: int = 3) -> dict:
-        """Query DataStore."""
-        result = await self.session.call_tool(
-            "ckan_datastore_search",
-            arguments={
-                "server_url": CKAN_SERVER,
-                "resource_id": resource_id,
-                "limit": limit,
-                "response_format": "json",
-            },
-        )
-        for content in result.content:
-            if content.type == "text":
-                try:
-                    text = content.text
-                    if "[Response truncated" in text:
-                        text = text.split("[Response truncated")[0].strip()
-                    return json.loads(text)
-                except json.JSONDecodeError as e:
-                    return {"error": f"JSON parse error: {e}"}
-        return {"error": "No content in response"}
-
-
 # Workflow nodes
 async def search_node(
     state: ExplorationState, mcp_client: CKANMCPClient
@@ -105,7 +79,7 @@ async def search_node(
     print(f"\n[SEARCH] Query: '{state['query']}'")
 
     try:
-        response = await mcp_client.search_packages(state["query"])
+        response = await mcp_client.search_packages(state["query"], rows=SEARCH_ROWS)
 
         if "error" in response:
             state["error"] = response["error"]
@@ -113,7 +87,10 @@ async def search_node(
             return state
 
         if "results" in response:
-            datasets = response["results"]
+            store = RawStore(RAW_STORE_PATH) if RAW_STORE_PATH else None
+            datasets = [DatasetRecord.from_dict(ds, store) for ds in response["results"]]
+            if store is not None:
+                store.close()
             state["datasets"] = datasets
             print(
                 f"   ✓ Found {response.get('count', len(datasets))} total, showing {len(datasets)}"
@@ -192,6 +169,11 @@ async def analyze_datastore_node(
     if state.get("error"):
         return state
 
+    if DATASTORE_MODE == "sql":
+        return await _profile_datastore_sql(state, mcp_client)
+    if DATASTORE_MODE == "full":
+        return await _profile_datastore(state, mcp_client)
+
     try:
         resource_id = state["selected_resource"]["id"]
         result = await mcp_client.datastore_search(resource_id, limit=3)
@@ -224,26 +206,151 @@ async def analyze_datastore_node(
     return state
 
 
-async def analyze_csv_node(state: ExplorationState) -> ExplorationState:
-    """Analyze CSV resource (placeholder)."""
+async def _profile_datastore_sql(
+    state: ExplorationState, mcp_client: CKANMCPClient
+) -> ExplorationState:
+    """Profile the DataStore table server-side; stream records if SQL is refused."""
+    try:
+        resource_id = state["selected_resource"]["id"]
+        profile = await profile_datastore_sql(mcp_client, resource_id)
+
+        state["analysis_result"] = {
+            "type": "datastore",
+            "record_count": profile["rows"],
+            "fields": [c["name"] for c in profile["columns"]],
+            "profile": profile,
+        }
+
+        print(f"   ✓ Profiled {profile['rows']} records with SQL aggregates")
+        for column in profile["columns"][:8]:
+            print(
+                f"   - {column['name']}: {column['type']}, "
+                f"{column['null_rate']:.0%} null, {column['distinct']} distinct"
+            )
+    except SQLProfileError as e:
+        print(f"   → SQL profiling unavailable ({e}), streaming records")
+        return await _profile_datastore(state, mcp_client)
+    except Exception as e:
+        # Deadlines, transport failures, results of an unexpected shape
+        state["error"] = str(e)
+        print(f"   ✗ Error: {e}")
+
+    return state
+
+
+async def _profile_datastore(
+    state: ExplorationState, mcp_client: CKANMCPClient
+) -> ExplorationState:
+    """Stream the whole DataStore table into per-column statistics."""
+    try:
+        resource_id = state["selected_resource"]["id"]
+        table = None
+        async for records in mcp_client.iter_datastore(
+            resource_id, concurrency=DATASTORE_CONCURRENCY
+        ):
+            if table is None:
+                total = mcp_client.last_datastore_total
+                print(f"   → Streaming {total} records")
+                # Skip DataStore internals such as _id and _full_text
+                table = TableProfile(
+                    [
+                        f["id"]
+                        for f in mcp_client.last_datastore_fields
+                        if not f["id"].startswith("_")
+                    ]
+                )
+            table.add_records(records)
+
+        if table is None:
+            state["error"] = "DataStore table is empty"
+            return state
+
+        profile = table.to_dict()
+        state["analysis_result"] = {
+            "type": "datastore",
+            "record_count": profile["rows"],
+            "fields": [c["name"] for c in profile["columns"]],
+            "profile": profile,
+            "skipped_records": mcp_client.last_datastore_skipped,
+        }
+
+        print(f"   ✓ Profiled {profile['rows']} records")
+        if mcp_client.last_datastore_skipped:
+            print(
+                f"   ⚠ Skipped {mcp_client.last_datastore_skipped} records "
+                "truncated on every attempt"
+            )
+        for column in profile["columns"][:8]:
+            print(
+                f"   - {column['name']}: {column['type']}, "
+                f"{column['null_rate']:.0%} null, ~{column['distinct']} distinct"
+            )
+
+    except Exception as e:
+        state["error"] = str(e)
+        print(f"   ✗ Error: {e}")
+
+    return state
+
+
+async def analyze_csv_node(
+    state: ExplorationState, resource_cache: ResourceCache | None = None
+) -> ExplorationState:
+    """Profile CSV resource (streamed, bounded memory)."""
     print("\n[ANALYZE CSV]")
 
     if state.get("error"):
         return state
 
-    # In real app: download and analyze with pandas/duckdb
-    state["analysis_result"] = {
-        "type": "csv",
-        "url": state["selected_resource"].get("url"),
-        "format": state["selected_resource"].get("format"),
-    }
+    url = state["selected_resource"].get("url")
+    if not url:
+        state["error"] = "CSV resource has no URL"
+        return state
 
-    print(f"   → URL: {state['analysis_result']['url']}")
-    print("   (Download and analyze with DuckDB/pandas)")
+    try:
+        if resource_cache is not None:
+            resource = await resource_cache.fetch(url)
+            print(f"   → {resource.status.capitalize()}: {resource.size / 2**20:.1f} MB")
+            profile = await asyncio.to_thread(_profile_cached, resource)
+        else:
+            print(f"   → Streaming {url}")
+            profile = await asyncio.to_thread(
+                profile_csv, url, max_bytes=CSV_PROFILE_MAX_BYTES
+            )
+
+        state["analysis_result"] = {
+            "type": "csv",
+            "url": url,
+            "format": state["selected_resource"].get("format"),
+            "record_count": profile["rows"],
+            "fields": [c["name"] for c in profile["columns"]],
+            "profile": profile,
+        }
+
+        print(
+            f"   ✓ {profile['rows']} rows, {len(profile['columns'])} columns "
+            f"({profile['encoding']}, delimiter {profile['delimiter']!r})"
+        )
+        for column in profile["columns"][:8]:
+            print(
+                f"   - {column['name']}: {column['type']}, "
+                f"{column['null_rate']:.0%} null, ~{column['distinct']} distinct"
+            )
+
+    except Exception as e:
+        state["error"] = f"CSV profiling failed: {e}"
+        print(f"   ✗ Error: {e}")
 
     return state
 
 
+def _profile_cached(resource) -> dict:
+    """Profile a cached download through a memory map."""
+    with resource.mmap() as data:
+        profile = profile_stream(data, max_bytes=CSV_PROFILE_MAX_BYTES)
+    return {"source": resource.url, **profile}
+
+
 async def skip_analysis_node(state: ExplorationState) -> ExplorationState:
     """Skip analysis for unknown formats."""
     print("\n[SKIP ANALYSIS] Unknown format, cannot analyze")
@@ -267,7 +374,11 @@ def route_by_resource_type(state: ExplorationState) -> str:
 
 
 # Build workflow
-async def build_workflow(mcp_client: CKANMCPClient) -> StateGraph:
+async def build_workflow(
+    mcp_client: CKANMCPClient,
+    resource_cache: ResourceCache | None = None,
+    checkpointer: SQLiteCheckpointer | None = None,
+) -> StateGraph:
     """Build exploration workflow with conditional branching."""
     graph = StateGraph(ExplorationState)
 
@@ -278,12 +389,15 @@ async def build_workflow(mcp_client: CKANMCPClient) -> StateGraph:
     async def analyze_wrapper(state: ExplorationState) -> ExplorationState:
         return await analyze_datastore_node(state, mcp_client)
 
-    graph.add_node("search", search_wrapper)
-    graph.add_node("select_dataset", select_dataset_node)
-    graph.add_node("select_resource", select_resource_node)
-    graph.add_node("analyze_datastore", analyze_wrapper)
-    graph.add_node("analyze_csv", analyze_csv_node)
-    graph.add_node("skip_analysis", skip_analysis_node)
+    async def analyze_csv_wrapper(state: ExplorationState) -> ExplorationState:
+        return await analyze_csv_node(state, resource_cache)
+
+    graph.add_node("search", traced_node(search_wrapper, "search"))
+    graph.add_node("select_dataset", traced_node(select_dataset_node, "select_dataset"))
+    graph.add_node("select_resource", traced_node(select_resource_node, "select_resource"))
+    graph.add_node("analyze_datastore", traced_node(analyze_wrapper, "analyze_datastore"))
+    graph.add_node("analyze_csv", traced_node(analyze_csv_wrapper, "analyze_csv"))
+    graph.add_node("skip_analysis", traced_node(skip_analysis_node, "skip_analysis"))
 
     # Define edges
     graph.add_edge(START, "search")
@@ -307,10 +421,10 @@ async def build_workflow(mcp_client: CKANMCPClient) -> StateGraph:
     graph.add_edge("analyze_csv", END)
     graph.add_edge("skip_analysis", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
 
 
-async def main():
+async def main(resume: str | None = None):
     """Run exploration workflow."""
     print("=" * 60)
     print("LangGraph + CKAN MCP - Data Exploration Workflow")
@@ -323,8 +437,24 @@ async def main():
             await session.initialize()
             print("\n✓ Connected to CKAN MCP Server")
 
-            mcp_client = CKANMCPClient(session)
-            workflow = await build_workflow(mcp_client)
+            cache = ToolCallCache(disk_path=TOOL_CACHE_PATH)
+            tracer = Tracer()
+            run_id = resume or new_run_id()
+            checkpointer = SQLiteCheckpointer(CHECKPOINT_PATH) if CHECKPOINT_PATH else None
+            # Concurrent identical calls (e.g. repeated DataStore pages) share one
+            # request; slow ones are hedged and failed ones retried within a budget
+            tools = CachedSession(CoalescingSession(HedgedSession(session)), cache)
+            journal = None
+            if checkpointer is not None:
+                # Replays this run's tool results when it is resumed
+                journal = run_journal(CHECKPOINT_PATH, run_id)
+                tools = CachedSession(tools, journal)
+                print(f"✓ Run id: {run_id} (resume with --resume {run_id})")
+            mcp_client = CKANMCPClient(TracedSession(tools), server_url=CKAN_SERVER)
+            resource_cache = (
+                ResourceCache(RESOURCE_CACHE_DIR) if RESOURCE_CACHE_DIR else None
+            )
+            workflow = await build_workflow(mcp_client, resource_cache, checkpointer)
 
             # Execute workflow
             initial_state: ExplorationState = {
@@ -338,7 +468,16 @@ async def main():
                 "error": None,
             }
 
-            result = await workflow.ainvoke(initial_state)
+            with tracer.activate():
+                if checkpointer is None:
+                    result = await workflow.ainvoke(initial_state)
+                else:
+                    result = await run_or_resume(
+                        workflow, initial_state, run_id, resume=resume is not None
+                    )
+                    journal.close()
+                    finish_run(CHECKPOINT_PATH, run_id)
+                    checkpointer.close()
 
             # Display results
             print("\n" + "=" * 60)
@@ -353,14 +492,36 @@ async def main():
 
                 if analysis["type"] == "datastore":
                     print(f"Fields: {', '.join(analysis['fields'][:5])}")
-                    print(f"Records sampled: {analysis['record_count']}")
+                    print(f"Records analysed: {analysis['record_count']}")
+                    if analysis.get("skipped_records"):
+                        print(f"Records skipped: {analysis['skipped_records']} (truncated)")
                 elif analysis["type"] == "csv":
                     print(f"URL: {analysis['url']}")
+                    print(f"Fields: {', '.join(analysis['fields'][:5])}")
+                    print(f"Rows profiled: {analysis['record_count']}")
                 else:
                     print("Skipped (unknown format)")
 
+            cache.close()
+            if resource_cache is not None:
+                stats = resource_cache.stats()
+                print(
+                    f"\nResource cache: {stats['hits']} hits, "
+                    f"{stats['revalidated']} revalidated, {stats['downloads']} downloads"
+                )
+
+            print("\nTimings:")
+            print(tracer.format_summary())
+            if TRACE_PATH:
+                tracer.export(TRACE_PATH)
+                print(f"✓ Trace written to {TRACE_PATH}")
             print("\n" + "=" * 60)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue an interrupted run")
+    args = parser.parse_args()
+    if args.resume and not CHECKPOINT_PATH:
+        parser.error("--resume needs CHECKPOINT_PATH to be set")
+    asyncio.run(main(args.resume))
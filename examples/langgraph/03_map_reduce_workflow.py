@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Map-Reduce Workflow with Send Fan-Out
+
+Variant of the basic workflow that processes every dataset in its own
+branch instead of looping inside one node:
+
+1. Search datasets by keyword
+2. Map: one `process_dataset` branch per dataset (LangGraph `Send`),
+   at most MAP_CONCURRENCY at a time. Each branch scores the metadata and,
+   for datasets that pass, runs the I/O-bound checks concurrently:
+   MQA lookup, CSV URL checks, DataStore probes
+3. Reduce: collect the branch results back into state, in search order
+
+With checkpoints enabled, a resumed run only re-runs the branches that had
+not finished.
+
+Run:
+    python 03_map_reduce_workflow.py
+    python 03_map_reduce_workflow.py --resume <run-id>  # With CHECKPOINT_PATH set, after a crash or Ctrl-C
+"""
+
+import argparse
+import asyncio
+import operator
+import os
+import urllib.error
+import urllib.request
+from typing import Annotated, Any, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from langgraph.types import Send
+from mcp import StdioServerParameters
+
+from adaptive_limiter import LimitedSession, PortalLimiters
+from catalog_index import CatalogIndex, CatalogStore
+from checkpoints import (
+    SQLiteCheckpointer,
+    finish_run,
+    new_run_id,
+    run_journal,
+    run_or_resume,
+)
+from ckan_client import CKANMCPClient
+from ckan_records import DatasetRecord, RawStore
+from hedging import HedgedSession
+from metadata_quality import MetadataQualityScorer
+from resource_cache import USER_AGENT
+from session_pool import open_session
+from tool_cache import CachedSession, CoalescingSession, ToolCallCache
+from tracing import TracedSession, Tracer, traced_node
+
+# Configuration
+CKAN_SERVER = "https://www.dati.gov.it/opendata"
+MCP_SERVER_PATH = os.path.join(os.path.dirname(__file__), "../../dist/index.js")
+QUALITY_THRESHOLD = 40  # Minimum quality score (0-100)
+MAX_RESULTS = 100  # Upper bound on datasets collected by the search node
+MAP_CONCURRENCY = 8  # Dataset branches running at once
+SESSION_POOL_SIZE = 1  # >1: spread tool calls over that many server subprocesses
+MQA_LOOKUP = True  # data.europa.eu MQA scores (dati.gov.it only)
+CHECK_URLS = True  # HEAD request per CSV resource
+URL_TIMEOUT = 10  # Seconds
+PROBE_DATASTORE = True  # Record count and fields of DataStore resources
+TOOL_CACHE_PATH = None  # Set to e.g. "tool_cache.sqlite" to cache across runs
+TRACE_PATH = None  # Set to e.g. "trace.json" or "metrics.prom" to export spans
+CHECKPOINT_PATH = None  # e.g. "checkpoints/checkpoints.sqlite": checkpoint runs, allow --resume
+RAW_STORE_PATH = None  # e.g. "raw_packages.sqlite": keep full package JSON for DatasetRecord.raw()
+SEARCH_INDEX_STORE = None  # e.g. "catalog_store": search a catalog_harvester.py copy locally
+
+
+# State definition
+class MapReduceState(TypedDict):
+    """State tracked through workflow."""
+
+    messages: Annotated[list, add_messages]
+    query: str
+    datasets: list[DatasetRecord]
+    results: Annotated[list[dict], operator.add]  # One entry per dataset branch
+    filtered_datasets: list[DatasetRecord]
+    csv_resources: list[dict]
+    datastore_resources: list[dict]
+    error: str | None
+
+
+class DatasetTask(TypedDict):
+    """Input of one map branch."""
+
+    index: int  # Position in the search results, to restore order
+    dataset: DatasetRecord
+
+
+# Workflow nodes
+async def search_datasets_node(
+    state: MapReduceState, mcp_client: CKANMCPClient, index: CatalogIndex | None = None
+) -> dict:
+    """Search datasets (in the local index, if one is given)."""
+    print(f"\n[SEARCH] Query: '{state['query']}'")
+
+    try:
+        if index is not None:
+            result = index.search(state["query"], limit=MAX_RESULTS)
+            datasets, total = result.records, result.count
+            skipped = 0
+        else:
+            store = RawStore(RAW_STORE_PATH) if RAW_STORE_PATH else None
+            datasets = []
+            try:
+                async for dataset in mcp_client.iter_packages(
+                    state["query"], max_results=MAX_RESULTS
+                ):
+                    datasets.append(DatasetRecord.from_dict(dataset, store))
+            finally:
+                if store is not None:
+                    store.close()
+            total = mcp_client.last_search_count
+            skipped = mcp_client.last_search_skipped
+    except Exception as e:
+        print(f"   ✗ Error: {e}")
+        return {"error": str(e)}
+
+    print(
+        f"   ✓ Found {total if total is not None else len(datasets)} total, fetched {len(datasets)}"
+    )
+    if skipped:
+        print(f"   ⚠ Skipped {skipped} datasets truncated on every attempt")
+    return {
+        "datasets": datasets,
+        "messages": [{"role": "assistant", "content": f"Found {len(datasets)} datasets"}],
+    }
+
+
+def fan_out(state: MapReduceState) -> list[Send] | str:
+    """Map step: one process_dataset branch per dataset."""
+    if state.get("error") or not state["datasets"]:
+        return "reduce"
+    print(f"\n[MAP] Processing {len(state['datasets'])} datasets")
+    return [
+        Send("process_dataset", {"index": i, "dataset": ds})
+        for i, ds in enumerate(state["datasets"])
+    ]
+
+
+def check_url(url: str) -> int | str:
+    """HTTP status of a resource URL (HEAD, falling back to a 1-byte GET)."""
+    for method, headers in (("HEAD", {}), ("GET", {"Range": "bytes=0-0"})):
+        try:
+            request = urllib.request.Request(
+                url, method=method, headers={"User-Agent": USER_AGENT, **headers}
+            )
+            with urllib.request.urlopen(request, timeout=URL_TIMEOUT) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            if method == "HEAD" and e.code in (403, 405, 501):
+                continue  # Some servers refuse HEAD
+            return e.code
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            return f"error: {getattr(e, 'reason', e)}"
+    return "error: no response"
+
+
+async def _csv_resource(dataset: DatasetRecord, resource) -> dict:
+    entry = {
+        "dataset_name": dataset["name"],
+        "dataset_title": dataset["title"],
+        "resource_name": resource.get("name", "Untitled"),
+        "url": resource.get("url"),
+    }
+    if CHECK_URLS and entry["url"]:
+        entry["status"] = await asyncio.to_thread(check_url, entry["url"])
+    return entry
+
+
+async def _probe_datastore(mcp_client: CKANMCPClient, resource) -> dict:
+    response = await mcp_client.datastore_search(resource["id"], limit=1)
+    return {
+        "resource_id": resource["id"],
+        "resource_name": resource.get("name", "Untitled"),
+        "total": response.get("total"),
+        "fields": [
+            f["id"] for f in response.get("fields", []) if not f["id"].startswith("_")
+        ],
+        "error": response.get("error"),
+    }
+
+
+async def process_dataset_node(task: DatasetTask, mcp_client: CKANMCPClient) -> dict:
+    """Map branch: score one dataset, then check its resources concurrently."""
+    dataset = task["dataset"]
+    quality = MetadataQualityScorer.score_at_least(dataset, QUALITY_THRESHOLD)
+    if quality is not None:
+        dataset["_quality"] = quality
+    result: dict[str, Any] = {
+        "index": task["index"],
+        "dataset": dataset,
+        "passed": quality is not None,
+        "mqa": None,
+        "csv_resources": [],
+        "datastore_resources": [],
+    }
+    if not result["passed"]:
+        print(f"   ✗ {dataset['title'][:50]}: below {QUALITY_THRESHOLD}/100 (rejected)")
+        return {"results": [result]}
+
+    resources = dataset.get("resources", [])
+    csv_jobs = [
+        _csv_resource(dataset, r)
+        for r in resources
+        if r.get("format", "").lower() == "csv"
+    ]
+    probe_jobs = [
+        _probe_datastore(mcp_client, r)
+        for r in resources
+        if PROBE_DATASTORE and r.get("datastore_active") and r.get("id")
+    ]
+    mqa_job = mcp_client.mqa_quality(dataset["name"]) if MQA_LOOKUP else None
+
+    outcomes = await asyncio.gather(
+        *csv_jobs, *probe_jobs, *([mqa_job] if mqa_job else []), return_exceptions=True
+    )
+    csv_outcomes = outcomes[: len(csv_jobs)]
+    probe_outcomes = outcomes[len(csv_jobs) : len(csv_jobs) + len(probe_jobs)]
+    result["csv_resources"] = [o for o in csv_outcomes if isinstance(o, dict)]
+    result["datastore_resources"] = [o for o in probe_outcomes if isinstance(o, dict)]
+    if mqa_job:
+        mqa = outcomes[-1]
+        if isinstance(mqa, dict) and "error" not in mqa:
+            result["mqa"] = mqa.get("breakdown", {}).get("scores", {}).get("total")
+
+    reachable = sum(1 for r in result["csv_resources"] if r.get("status") in (200, 206))
+    details = [f"{len(result['csv_resources'])} CSV"]
+    if CHECK_URLS and result["csv_resources"]:
+        details[-1] += f" ({reachable} reachable)"
+    if result["datastore_resources"]:
+        details.append(f"{len(result['datastore_resources'])} DataStore")
+    if result["mqa"] is not None:
+        details.append(f"MQA {result['mqa']}")
+    print(
+        f"   ✓ {dataset['title'][:50]}: {quality['score']}/100 ({quality['level']}), "
+        + ", ".join(details)
+    )
+    return {"results": [result]}
+
+
+async def reduce_node(state: MapReduceState) -> dict:
+    """Reduce step: merge branch results in search order."""
+    print("\n[REDUCE] Collecting results")
+
+    if state.get("error"):
+        return {}
+
+    results = sorted(state["results"], key=lambda r: r["index"])
+    passed = [r for r in results if r["passed"]]
+    csv_resources = [c for r in passed for c in r["csv_resources"]]
+    datastore_resources = [d for r in passed for d in r["datastore_resources"]]
+
+    print(
+        f"   → {len(passed)}/{len(results)} datasets pass quality threshold ({QUALITY_THRESHOLD})"
+    )
+    print(
+        f"   ✓ {len(csv_resources)} CSV resources, "
+        f"{len(datastore_resources)} DataStore resources"
+    )
+    return {
+        "filtered_datasets": [r["dataset"] for r in passed],
+        "csv_resources": csv_resources,
+        "datastore_resources": datastore_resources,
+        "messages": [
+            {
+                "role": "assistant",
+                "content": f"Filtered to {len(passed)} quality datasets, "
+                f"extracted {len(csv_resources)} CSV resources",
+            }
+        ],
+    }
+
+
+# Build graph
+async def build_workflow(
+    mcp_client: CKANMCPClient,
+    checkpointer: SQLiteCheckpointer | None = None,
+    index: CatalogIndex | None = None,
+) -> StateGraph:
+    """Build map-reduce workflow."""
+    graph = StateGraph(MapReduceState)
+
+    async def search_wrapper(state: MapReduceState) -> dict:
+        return await search_datasets_node(state, mcp_client, index)
+
+    async def process_wrapper(task: DatasetTask) -> dict:
+        return await process_dataset_node(task, mcp_client)
+
+    graph.add_node("search", traced_node(search_wrapper, "search"))
+    graph.add_node("process_dataset", traced_node(process_wrapper, "process_dataset"))
+    graph.add_node("reduce", traced_node(reduce_node, "reduce"))
+
+    graph.add_edge(START, "search")
+    graph.add_conditional_edges("search", fan_out, ["process_dataset", "reduce"])
+    graph.add_edge("process_dataset", "reduce")
+    graph.add_edge("reduce", END)
+
+    return graph.compile(checkpointer=checkpointer)
+
+
+async def main(resume: str | None = None):
+    """Run workflow."""
+    print("=" * 60)
+    print("LangGraph + CKAN MCP Server - Map-Reduce Workflow")
+    print("=" * 60)
+
+    server_params = StdioServerParameters(command="node", args=[MCP_SERVER_PATH])
+
+    async with open_session(server_params, SESSION_POOL_SIZE) as session:
+        pooled = f" ({SESSION_POOL_SIZE} sessions)" if SESSION_POOL_SIZE > 1 else ""
+        print(f"\n✓ Connected to CKAN MCP Server{pooled}")
+
+        cache = ToolCallCache(disk_path=TOOL_CACHE_PATH)
+        tracer = Tracer()
+        run_id = resume or new_run_id()
+        checkpointer = SQLiteCheckpointer(CHECKPOINT_PATH) if CHECKPOINT_PATH else None
+        # Cache misses are coalesced with identical calls in flight, get a
+        # deadline, hedging and budgeted retries, and each attempt waits for
+        # a slot under its portal's AIMD concurrency limit
+        limiters = PortalLimiters()
+        limited = LimitedSession(session, limiters, CKAN_SERVER)
+        hedged = HedgedSession(limited)
+        coalescer = CoalescingSession(hedged)
+        tools = CachedSession(coalescer, cache)
+        journal = None
+        if checkpointer is not None:
+            # Replays this run's tool results when it is resumed
+            journal = run_journal(CHECKPOINT_PATH, run_id)
+            tools = CachedSession(tools, journal)
+            print(f"✓ Run id: {run_id} (resume with --resume {run_id})")
+        mcp_client = CKANMCPClient(TracedSession(tools), server_url=CKAN_SERVER)
+        index = None
+        if SEARCH_INDEX_STORE:
+            index = CatalogIndex.from_store(CatalogStore(SEARCH_INDEX_STORE, CKAN_SERVER))
+            print(f"✓ Local search index: {len(index)} packages")
+        workflow = await build_workflow(mcp_client, checkpointer, index)
+
+        initial_state: MapReduceState = {
+            "messages": [],
+            "query": "mobilità urbana",
+            "datasets": [],
+            "results": [],
+            "filtered_datasets": [],
+            "csv_resources": [],
+            "datastore_resources": [],
+            "error": None,
+        }
+
+        with tracer.activate():
+            if checkpointer is None:
+                result = await workflow.ainvoke(
+                    initial_state, {"max_concurrency": MAP_CONCURRENCY}
+                )
+            else:
+                result = await run_or_resume(
+                    workflow,
+                    initial_state,
+                    run_id,
+                    resume=resume is not None,
+                    max_concurrency=MAP_CONCURRENCY,
+                )
+                journal.close()
+                finish_run(CHECKPOINT_PATH, run_id)
+                checkpointer.close()
+
+        # Display results
+        print("\n" + "=" * 60)
+        print("RESULTS")
+        print("=" * 60)
+
+        if result["error"]:
+            print(f"\n✗ Workflow failed: {result['error']}")
+        else:
+            print(f"\nQuery: {result['query']}")
+            print(f"Total datasets found: {len(result['datasets'])}")
+            print(f"Quality datasets: {len(result['filtered_datasets'])}")
+            print(f"CSV resources: {len(result['csv_resources'])}")
+            print(f"DataStore resources: {len(result['datastore_resources'])}")
+
+            if result["csv_resources"]:
+                print("\nFirst 3 CSV resources:")
+                for i, res in enumerate(result["csv_resources"][:3], 1):
+                    print(f"\n{i}. {res['resource_name']}")
+                    print(f"   Dataset: {res['dataset_title']}")
+                    print(f"   URL: {res['url']} ({res.get('status', 'not checked')})")
+
+        stats = cache.stats()
+        print(
+            f"\nTool cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{coalescer.coalesced} coalesced"
+        )
+        print(
+            f"Hedged calls: {hedged.hedges} ({hedged.hedge_wins} won), "
+            f"{hedged.retries} retries"
+        )
+        for portal, limiter in limiters.stats().items():
+            print(
+                f"Portal {portal}: concurrency limit {limiter['limit']}, "
+                f"{limiter['overloads']} overloaded responses"
+            )
+        cache.close()
+
+        print("\nTimings:")
+        print(tracer.format_summary())
+        if TRACE_PATH:
+            tracer.export(TRACE_PATH)
+            print(f"✓ Trace written to {TRACE_PATH}")
+
+        print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue an interrupted run")
+    args = parser.parse_args()
+    if args.resume and not CHECKPOINT_PATH:
+        parser.error("--resume needs CHECKPOINT_PATH to be set")
+    asyncio.run(main(args.resume))
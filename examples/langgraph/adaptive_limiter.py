@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Adaptive Per-Portal Concurrency Limits
+
+Fan-out (map-reduce branches, portal fan-out, concurrent DataStore paging)
+can push more requests at a portal than it tolerates. LimitedSession puts
+an AdaptiveLimiter per portal in front of call_tool:
+
+- AIMD: the limit grows by one per limit's worth of successful calls
+  while it is the bottleneck, and is halved when calls come back with
+  429/5xx or timeouts, or when latency stays above LATENCY_TOLERANCE
+  times the best latency seen for OVERLOAD_STREAK calls in a row (at most
+  once per round trip, so one burst of failures counts once). Latency
+  baselines are kept per tool: a fast search page does not make a slow
+  MQA lookup look like overload
+- Optional token bucket (requests per second plus burst) per portal
+- Calls waiting for a slot form a bounded queue. When it holds MAX_QUEUE
+  calls, further callers wait before joining it (backpressure), or get
+  LimiterFull with acquire(wait=False)
+- stats() and to_prometheus() report limit, in-flight, queue depth,
+  latency and overload counts while a run is going
+
+Usage:
+    limiters = PortalLimiters()
+    tools = CachedSession(LimitedSession(session, limiters, CKAN_SERVER), cache)
+    mcp_client = CKANMCPClient(TracedSession(tools), server_url=CKAN_SERVER)
+    ...
+    print(limiters.stats())
+"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlparse
+
+from mcp.types import CallToolResult
+
+from tool_cache import is_error
+from tracing import current_span, label_value
+
+# Configuration
+INITIAL_LIMIT = 4  # Concurrent calls per portal before any feedback
+MIN_LIMIT = 1
+MAX_LIMIT = 32
+BACKOFF = 0.5  # Multiplicative decrease on overload
+LATENCY_TOLERANCE = 1.5  # Smoothed latency over best latency that counts as overload
+LATENCY_SMOOTHING = 0.2  # EWMA weight of each new latency sample
+BASELINE_DRIFT = 0.01  # How fast the best-latency baseline follows slower samples
+OVERLOAD_STREAK = 3  # Consecutive slow calls of one tool that count as overload
+MAX_QUEUE = 64  # Calls waiting for a slot, per portal
+RATE_LIMIT: float | None = None  # Requests per second per portal; None = no cap
+BURST = 4  # Token bucket size when RATE_LIMIT is set
+
+# Overrides by portal host, e.g. {"www.dati.gov.it": {"max_limit": 8, "rate": 5}}
+PORTAL_LIMITS: dict[str, dict[str, Any]] = {}
+
+# "CKAN API error (429): ..." from the Node server, "(HTTP 503)" from the stand-in
+OVERLOAD_STATUS = re.compile(r"\((?:HTTP )?(429|5\d\d)\)")
+OVERLOAD_TEXT = ("timeout", "timed out", "too many requests")
+# Cancel message of calls abandoned at their deadline (hedging.py), also overload
+DEADLINE_EXCEEDED = "tool deadline exceeded"
+
+
+class LimiterFull(RuntimeError):
+    """The portal's queue is full and the caller asked not to wait."""
+
+
+def is_overload(result: CallToolResult) -> bool:
+    """True for tool errors that mean the portal is shedding load."""
+    if not is_error(result):
+        return False
+    text = " ".join(c.text for c in result.content if c.type == "text")
+    return bool(OVERLOAD_STATUS.search(text)) or any(t in text.lower() for t in OVERLOAD_TEXT)
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def portal_key(server_url: str | None) -> str:
+    """Limiter key for a portal URL: its host."""
+    return (urlparse(server_url).netloc if server_url else "") or "default"
+
+
+@dataclass(slots=True)
+class _ToolLatency:
+    """Latency baseline of one tool at one portal."""
+
+    baseline: float | None = None  # Best recent latency, seconds
+    latency: float | None = None  # EWMA, seconds
+    slow: int = 0  # Consecutive calls over the tolerance
+
+    def observe(self, latency: float) -> bool:
+        """Feed one successful call; True once latency has stayed high."""
+        self.baseline = (
+            latency
+            if self.baseline is None or latency < self.baseline
+            else self.baseline + (latency - self.baseline) * BASELINE_DRIFT
+        )
+        self.latency = (
+            latency
+            if self.latency is None
+            else self.latency + (latency - self.latency) * LATENCY_SMOOTHING
+        )
+        # Both the sample and the average, for several calls in a row: neither a
+        # cold start nor one outlier (which lifts the average for a while) trips it
+        threshold = LATENCY_TOLERANCE * self.baseline
+        if latency > threshold and self.latency > threshold:
+            self.slow += 1
+        else:
+            self.slow = 0
+        return self.slow >= OVERLOAD_STREAK
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit, token bucket and bounded queue for one portal."""
+
+    def __init__(
+        self,
+        name: str = "default",
+        initial_limit: float = INITIAL_LIMIT,
+        min_limit: int = MIN_LIMIT,
+        max_limit: int = MAX_LIMIT,
+        rate: float | None = RATE_LIMIT,
+        burst: int = BURST,
+        max_queue: int = MAX_QUEUE,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+
+        self.in_flight = 0
+        self.queued = 0  # Waiting for a slot
+        self.blocked = 0  # Waiting for room in the queue
+        self.completed = 0  # Calls whose outcome fed the limit
+        self.overloads = 0
+        self.decreases = 0
+        self.waiting_for_tokens = 0
+        self.latency: float | None = None  # EWMA over all tools, seconds
+        self._tools: dict[str, _ToolLatency] = {}
+
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+
+    @property
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self, wait: bool = True) -> float:
+        """Wait for a slot (and a token); return seconds spent waiting."""
+        started = time.monotonic()
+        async with self._condition:
+            if self.queued >= self.max_queue:
+                if not wait:
+                    raise LimiterFull(f"{self.name}: {self.queued} calls queued")
+                self.blocked += 1
+                try:
+                    await self._condition.wait_for(lambda: self.queued < self.max_queue)
+                finally:
+                    self.blocked -= 1
+
+            self.queued += 1
+            try:
+                await self._condition.wait_for(lambda: self.in_flight < self.capacity)
+            finally:
+                self.queued -= 1
+                # Room in the queue for a blocked producer
+                self._condition.notify_all()
+            self.in_flight += 1
+
+        try:
+            await self._take_token()
+        except BaseException:
+            await self.release(None)
+            raise
+        return time.monotonic() - started
+
+    async def release(self, latency: float | None, overloaded: bool = False, tool: str = ""):
+        """Free the slot and feed the call's outcome into the limit."""
+        async with self._condition:
+            # Only grow when the limit, not the rate cap, is holding calls back
+            saturated = (
+                self.in_flight >= self.capacity or self.queued > 0
+            ) and not self.waiting_for_tokens
+            self.in_flight -= 1
+            if latency is not None:
+                self.completed += 1
+                self._adjust(latency, overloaded, saturated, tool)
+            self._condition.notify_all()
+
+    def _adjust(self, latency: float, overloaded: bool, saturated: bool, tool: str):
+        if overloaded:
+            self.overloads += 1
+        else:
+            self.latency = (
+                latency
+                if self.latency is None
+                else self.latency + (latency - self.latency) * LATENCY_SMOOTHING
+            )
+            overloaded = self._tools.setdefault(tool, _ToolLatency()).observe(latency)
+
+        now = time.monotonic()
+        if overloaded:
+            # One decrease per round trip: calls already in flight saw the old limit
+            if now - self._last_decrease >= (self.latency or latency):
+                self.limit = max(float(self.min_limit), self.limit * BACKOFF)
+                self._last_decrease = now
+                self.decreases += 1
+        elif saturated:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    async def _take_token(self):
+        if self.rate is None:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            self.waiting_for_tokens += 1
+            try:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+            finally:
+                self.waiting_for_tokens -= 1
+
+    def stats(self) -> dict[str, Any]:
+        """Current limit, load and latency."""
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "blocked": self.blocked,
+            "completed": self.completed,
+            "overloads": self.overloads,
+            "decreases": self.decreases,
+            "latency_ms": _ms(self.latency),
+            "tools": {
+                tool: {"latency_ms": _ms(t.latency), "baseline_ms": _ms(t.baseline)}
+                for tool, t in self._tools.items()
+            },
+        }
+
+
+class PortalLimiters:
+    """One AdaptiveLimiter per portal host, created on first use."""
+
+    def __init__(self, overrides: dict[str, dict[str, Any]] | None = None, **defaults):
+        self.overrides = PORTAL_LIMITS if overrides is None else overrides
+        self.defaults = defaults
+        self._limiters: dict[str, AdaptiveLimiter] = {}
+
+    def get(self, server_url: str | None) -> AdaptiveLimiter:
+        key = portal_key(server_url)
+        if key not in self._limiters:
+            options = {**self.defaults, **self.overrides.get(key, {})}
+            self._limiters[key] = AdaptiveLimiter(key, **options)
+        return self._limiters[key]
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Per-portal limiter stats."""
+        return {key: limiter.stats() for key, limiter in self._limiters.items()}
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition of the current limiter state."""
+        lines = []
+        for metric, key, kind, help_text in (
+            ("ckan_portal_concurrency_limit", "limit", "gauge", "Adaptive concurrency limit"),
+            ("ckan_portal_in_flight", "in_flight", "gauge", "Calls in flight"),
+            ("ckan_portal_queue_depth", "queued", "gauge", "Calls waiting for a slot"),
+            ("ckan_portal_blocked", "blocked", "gauge", "Callers waiting for queue space"),
+            ("ckan_portal_calls_total", "completed", "counter", "Completed calls"),
+            ("ckan_portal_overloads_total", "overloads", "counter", "429/5xx/timeout results"),
+            ("ckan_portal_limit_decreases_total", "decreases", "counter", "Limit decreases"),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            for portal, stats in self.stats().items():
+                lines.append(f'{metric}{{portal="{label_value(portal)}"}} {stats[key]}')
+        return "\n".join(lines) + "\n"
+
+
+class LimitedSession:
+    """Wraps a ClientSession so each call_tool waits for its portal's limiter."""
+
+    def __init__(self, session, limiters: PortalLimiters | None = None, server_url: str | None = None):
+        self.session = session
+        self.limiters = limiters or PortalLimiters()
+        self.server_url = server_url  # For calls without a server_url argument
+
+    async def call_tool(
+        self, name: str, arguments: dict[str, Any] | None = None, **kwargs
+    ) -> CallToolResult:
+        """Forward the call once the portal has a free slot."""
+        limiter = self.limiters.get((arguments or {}).get("server_url") or self.server_url)
+        waited = await limiter.acquire()
+        span = current_span()
+        if span is not None:
+            span.attrs["queue_s"] = round(waited, 6)
+
+        started = time.monotonic()
+        try:
+            result = await self.session.call_tool(name, arguments=arguments, **kwargs)
+        except asyncio.TimeoutError:
+            await limiter.release(time.monotonic() - started, overloaded=True, tool=name)
+            raise
+        except asyncio.CancelledError as e:
+            if e.args == (DEADLINE_EXCEEDED,):
+                await limiter.release(time.monotonic() - started, overloaded=True, tool=name)
+            else:
+                # A hedge that lost, or a caller that went away
+                await limiter.release(None)
+            raise
+        except BaseException:
+            # Transport failures say nothing about the portal
+            await limiter.release(None)
+            raise
+        if is_overload(result):
+            await limiter.release(time.monotonic() - started, overloaded=True, tool=name)
+        elif is_error(result):
+            # e.g. a 404: fast, but says nothing about the portal's capacity
+            await limiter.release(None)
+        else:
+            await limiter.release(time.monotonic() - started, tool=name)
+        return result
+
+    def __getattr__(self, name: str):
+        # Delegate everything else (initialize, list_tools, ...) to the session
+        return getattr(self.session, name)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Offline Benchmarks for the LangGraph Examples
+
+Measures the hot paths against seeded synthetic data (synthetic.py) and a
+local stand-in MCP server (standin_server.py), so results do not depend on
+live portal latency:
+
+- MetadataQualityScorer.score_dataset / score_batch / score_tables, pruned
+  filter_datasets / top_k
+- Response decoding (full and truncated pages) and DatasetRecord building
+- extract_csv_node
+- End-to-end 01_basic_workflow graph runs over stdio
+
+Results are written as JSON; pass --compare to flag regressions against a
+previous run.
+
+Run:
+    python benchmarks.py --output bench.json
+    python benchmarks.py --quick --compare bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+import ckan_client
+from ckan_records import DatasetRecord
+from metadata_quality import MetadataQualityScorer
+from synthetic import generate_packages, render_response, search_result
+from truncated_json import decode_partial
+
+# Configuration
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEED = 42
+REGRESSION_THRESHOLD = 0.10  # Relative slowdown reported by --compare
+
+
+def load_workflow_module(filename: str):
+    """Import a numbered workflow script (not importable by name)."""
+    path = os.path.join(HERE, filename)
+    name = "wf_" + os.path.splitext(filename)[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(fn: Callable[[], Any], items: int, repeat: int) -> dict[str, float]:
+    """Run fn `repeat` times; report per-run and per-item timings."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        "items": items,
+        "repeat": repeat,
+        "min_s": best,
+        "median_s": statistics.median(times),
+        "items_per_s": items / best if best else 0.0,
+    }
+
+
+def _text_result(text: str) -> SimpleNamespace:
+    """Minimal stand-in for a CallToolResult with one text block."""
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)])
+
+
+def bench_scorer(packages: list[dict], repeat: int) -> dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    results = {
+        "score_dataset": measure(
+            lambda: [MetadataQualityScorer.score_dataset(p, now) for p in packages],
+            len(packages),
+            repeat,
+        ),
+        "score_at_least_60": measure(
+            lambda: list(MetadataQualityScorer.filter_datasets(packages, 60, now)),
+            len(packages),
+            repeat,
+        ),
+        "top_k_100": measure(
+            lambda: MetadataQualityScorer.top_k(packages, 100, now=now), len(packages), repeat
+        ),
+    }
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return results
+    results["score_batch"] = measure(
+        lambda: MetadataQualityScorer.score_batch(packages, now), len(packages), repeat
+    )
+
+    try:
+        import pyarrow as pa
+        from catalog_harvester import PACKAGE_SCHEMA, RESOURCE_SCHEMA, _package_row, _resource_rows
+    except ImportError:
+        return results
+    package_table = pa.Table.from_pylist([_package_row(p) for p in packages], schema=PACKAGE_SCHEMA)
+    resource_table = pa.Table.from_pylist(
+        [row for p in packages for row in _resource_rows(p)], schema=RESOURCE_SCHEMA
+    )
+    results["score_tables"] = measure(
+        lambda: MetadataQualityScorer.score_tables(package_table, resource_table, now),
+        len(packages),
+        repeat,
+    )
+    return results
+
+
+def bench_decode(packages: list[dict], repeat: int) -> dict[str, Any]:
+    page_size = 50
+    pages = [
+        render_response(search_result(packages, start, page_size), limit=10**9)
+        for start in range(0, len(packages), page_size)
+    ]
+    truncated = [
+        render_response(search_result(packages, start, page_size))
+        for start in range(0, len(packages), page_size)
+    ]
+    full_results = [_text_result(text) for text in pages]
+
+    return {
+        f"decode_full_{ckan_client.JSON_BACKEND}": measure(
+            lambda: [ckan_client.decode_response(r, "results") for r in full_results],
+            len(packages),
+            repeat,
+        ),
+        "decode_partial_truncated": measure(
+            lambda: [decode_partial(text, "results") for text in truncated],
+            len(truncated),
+            repeat,
+        ),
+        "dataset_record_from_dict": measure(
+            lambda: [DatasetRecord.from_dict(p) for p in packages],
+            len(packages),
+            repeat,
+        ),
+    }
+
+
+def bench_extract_csv(packages: list[dict], repeat: int) -> dict[str, Any]:
+    workflow = load_workflow_module("01_basic_workflow.py")
+    records = [DatasetRecord.from_dict(p) for p in packages]
+
+    def run():
+        state = {"messages": [], "filtered_datasets": records, "error": None}
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(workflow.extract_csv_node(state))
+
+    return {"extract_csv_node": measure(run, len(records), repeat)}
+
+
+async def _run_graph(packages: int, runs: int) -> dict[str, Any]:
+    workflow = load_workflow_module("01_basic_workflow.py")
+    workflow.RAW_STORE_PATH = os.path.join(tempfile.mkdtemp(), "raw.sqlite")
+
+    server_params = StdioServerParameters(
+        command=sys.executable,
+        args=[
+            os.path.join(HERE, "standin_server.py"),
+            "--packages",
+            str(packages),
+            "--seed",
+            str(SEED),
+        ],
+    )
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            mcp_client = ckan_client.CKANMCPClient(session)
+            graph = await workflow.build_workflow(mcp_client)
+
+            latencies = []
+            datasets = 0
+            for _ in range(runs):
+                state = {
+                    "messages": [],
+                    "query": "dati",
+                    "datasets": [],
+                    "filtered_datasets": [],
+                    "csv_resources": [],
+                    "error": None,
+                }
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = await graph.ainvoke(state)
+                latencies.append(time.perf_counter() - start)
+                datasets += len(result["datasets"])
+
+    total = sum(latencies)
+    return {
+        "runs": runs,
+        "datasets": datasets,
+        "median_s": statistics.median(latencies),
+        "max_s": max(latencies),
+        "runs_per_s": runs / total if total else 0.0,
+        "datasets_per_s": datasets / total if total else 0.0,
+    }
+
+
+def bench_graph(packages: int, runs: int) -> dict[str, Any]:
+    return {"graph_01_basic_workflow": asyncio.run(_run_graph(packages, runs))}
+
+
+def run_benchmarks(quick: bool = False) -> dict[str, Any]:
+    """Run the suite and return machine-readable results."""
+    count = 500 if quick else 5000
+    repeat = 3 if quick else 5
+    packages = generate_packages(count, SEED)
+
+    results: dict[str, Any] = {}
+    results.update(bench_scorer(packages, repeat))
+    results.update(bench_decode(packages, repeat))
+    results.update(bench_extract_csv(packages, repeat))
+    results.update(bench_graph(packages=count, runs=2 if quick else 5))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "json_backend": ckan_client.JSON_BACKEND,
+            "seed": SEED,
+            "packages": count,
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Benchmarks whose median time grew by more than `threshold`."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or "median_s" not in before or not before["median_s"]:
+            continue
+        change = result["median_s"] / before["median_s"] - 1
+        if change > threshold:
+            regressions.append(
+                f"{name}: {before['median_s']:.4f}s -> {result['median_s']:.4f}s (+{change:.0%})"
+            )
+    return regressions
+
+
+def main():
+    """Run benchmarks, print a summary, optionally compare with a baseline."""
+    parser = argparse.ArgumentParser(description="Offline benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Smaller, faster run")
+    parser.add_argument("--output", "-o", default=None, help="Write results JSON")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    report = run_benchmarks(quick=args.quick)
+
+    print("=" * 60)
+    print("Benchmarks")
+    print("=" * 60)
+    for name, result in report["results"].items():
+        rate = result.get("items_per_s") or result.get("datasets_per_s", 0.0)
+        print(f"  {name:36} median {result['median_s']:.4f}s  {rate:12.0f}/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regressions (>{args.threshold:.0%}):")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n✓ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Catalog Harvester with a Local Parquet Store
+
+Pages the whole ckan_package_search result set of a portal into Parquet
+files (packages and resources as separate tables), so scoring, filtering
+and search can run locally instead of one MCP round trip per page.
+
+Later runs sync incrementally: packages are requested sorted by
+metadata_modified ascending with a `metadata_modified:[<high water> TO *]`
+filter, so only packages changed since the last sync are fetched.
+
+- Every BATCH_SIZE packages are written as one part file and the high
+  water mark is saved, so an interrupted harvest resumes where it stopped
+- Updated packages are appended; readers keep the newest version of each
+  package, and parts are compacted once there are more than MAX_PARTS
+- Deleted packages are not visible to incremental syncs; run --full
+  now and then to rebuild the store
+- Packages the client has to skip (truncated even as a single row) leave
+  the sync incomplete: the high water mark stays before the first one,
+  so the next sync requests them again
+
+Requires pyarrow (pip install pyarrow).
+
+Usage:
+    store = CatalogStore("catalog_store", server_url)
+    await store.sync(mcp_client)
+    datasets = store.datasets()  # DatasetRecord list, no MCP calls
+
+Run:
+    python catalog_harvester.py sync --server https://www.dati.gov.it/opendata
+    python catalog_harvester.py stats --server https://www.dati.gov.it/opendata
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Any
+from urllib.parse import urlparse
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from ckan_client import CKAN_SERVER, CKANMCPClient
+from ckan_records import CompactResource, DatasetRecord
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+# Configuration
+STORE_DIR = "catalog_store"
+MCP_SERVER_PATH = os.path.join(os.path.dirname(__file__), "../../dist/index.js")
+BATCH_SIZE = 5000  # Packages per part file (and per high-water checkpoint)
+MAX_PARTS = 16  # Compact when a table has more part files than this
+SYNC_SORT = "metadata_modified asc"
+
+if pa is not None:
+    PACKAGE_SCHEMA = pa.schema(
+        [
+            ("id", pa.string()),
+            ("name", pa.string()),
+            ("title", pa.string()),
+            ("notes", pa.string()),
+            ("license_id", pa.string()),
+            ("author", pa.string()),
+            ("maintainer", pa.string()),
+            ("author_email", pa.string()),
+            ("maintainer_email", pa.string()),
+            ("organization_name", pa.string()),
+            ("organization_title", pa.string()),
+            ("tags", pa.list_(pa.string())),
+            ("extras", pa.list_(pa.list_(pa.string()))),  # [key, value] pairs
+            ("num_resources", pa.int32()),
+            ("metadata_created", pa.string()),
+            ("metadata_modified", pa.string()),
+        ]
+    )
+    RESOURCE_SCHEMA = pa.schema(
+        [
+            ("package_id", pa.string()),
+            ("position", pa.int32()),
+            ("id", pa.string()),
+            ("name", pa.string()),
+            ("format", pa.string()),
+            ("url", pa.string()),
+            ("datastore_active", pa.bool_()),
+            ("has_description", pa.bool_()),
+        ]
+    )
+
+
+def solr_date(timestamp: str) -> str:
+    """CKAN metadata_modified as a Solr date, truncated to milliseconds (UTC)."""
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return f"{parsed:%Y-%m-%dT%H:%M:%S}.{parsed.microsecond // 1000:03d}Z"
+
+
+def _sort_key(timestamp: str) -> datetime:
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def portal_slug(server_url: str) -> str:
+    """Directory name for a portal, e.g. www.dati.gov.it-1a2b3c4d."""
+    digest = hashlib.sha256(server_url.encode("utf-8")).hexdigest()[:8]
+    return f"{urlparse(server_url).netloc or 'portal'}-{digest}"
+
+
+def _package_row(package: dict[str, Any]) -> dict[str, Any]:
+    record = DatasetRecord.from_dict(package)
+    return {
+        "id": record.id,
+        "name": record.name,
+        "title": record.title,
+        "notes": record.notes,
+        "license_id": record.license_id,
+        "author": record.author,
+        "maintainer": record.maintainer,
+        "author_email": record.author_email,
+        "maintainer_email": record.maintainer_email,
+        "organization_name": record.organization_name,
+        "organization_title": record.organization_title,
+        "tags": [t for t in record.tags if t is not None],
+        "extras": [[str(k), None if v is None else str(v)] for k, v in record.extras],
+        "num_resources": record.num_resources,
+        "metadata_created": package.get("metadata_created"),
+        "metadata_modified": record.metadata_modified,
+    }
+
+
+def _resource_rows(package: dict[str, Any]) -> list[dict[str, Any]]:
+    rows = []
+    for position, raw in enumerate(package.get("resources") or []):
+        resource = CompactResource.from_dict(raw)
+        rows.append(
+            {
+                "package_id": package.get("id"),
+                "position": position,
+                "id": resource.id,
+                "name": resource.name,
+                "format": resource.format,
+                "url": resource.url,
+                "datastore_active": resource.datastore_active,
+                "has_description": resource.has_description,
+            }
+        )
+    return rows
+
+
+class CatalogStore:
+    """Parquet copy of one portal's catalog, kept current by sync()."""
+
+    def __init__(self, root: str, server_url: str = CKAN_SERVER):
+        if pa is None:
+            raise ImportError("CatalogStore requires pyarrow: pip install pyarrow")
+        self.server_url = server_url
+        self.path = os.path.join(root, portal_slug(server_url))
+        for table in ("packages", "resources"):
+            os.makedirs(os.path.join(self.path, table), exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    # Manifest
+
+    def _read_manifest(self) -> dict[str, Any]:
+        path = os.path.join(self.path, "manifest.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"server_url": self.server_url, "high_water": None, "next_part": 0, "syncs": []}
+
+    def _write_manifest(self):
+        path = os.path.join(self.path, "manifest.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    # Parts
+
+    def _parts(self, table: str) -> list[str]:
+        """Part files of a table, oldest first."""
+        directory = os.path.join(self.path, table)
+        return [
+            os.path.join(directory, name)
+            for name in sorted(os.listdir(directory))
+            if name.endswith(".parquet")
+        ]
+
+    def _write_part(self, packages: list[dict[str, Any]], advance: bool = True):
+        """Write one batch as a part file in each table, then move the high water mark."""
+        part = self.manifest["next_part"]
+        resources = [row for p in packages for row in _resource_rows(p)]
+        for table, rows, schema in (
+            ("packages", [_package_row(p) for p in packages], PACKAGE_SCHEMA),
+            ("resources", resources, RESOURCE_SCHEMA),
+        ):
+            path = os.path.join(self.path, table, f"part-{part:06d}.parquet")
+            pq.write_table(pa.Table.from_pylist(rows, schema=schema), path + ".tmp")
+            os.replace(path + ".tmp", path)
+
+        # Sorted ascending: everything up to the last package is stored
+        modified = [p["metadata_modified"] for p in packages if p.get("metadata_modified")]
+        if modified and advance:
+            self.manifest["high_water"] = max(modified, key=_sort_key)
+        self.manifest["next_part"] = part + 1
+        self._write_manifest()
+
+    # Sync
+
+    async def sync(self, mcp_client: CKANMCPClient, full: bool = False) -> dict[str, Any]:
+        """Fetch packages modified since the last sync (or all, if `full`)."""
+        if full:
+            for table in ("packages", "resources"):
+                shutil.rmtree(os.path.join(self.path, table))
+                os.makedirs(os.path.join(self.path, table))
+            self.manifest.update(high_water=None, next_part=0)
+            self._write_manifest()
+
+        high_water = self.manifest["high_water"]
+        fq = f"metadata_modified:[{solr_date(high_water)} TO *]" if high_water else None
+        started = time.perf_counter()
+        fetched = skipped = 0
+        held = False  # High water frozen before a skipped package
+        batch: list[dict[str, Any]] = []
+
+        async for package in mcp_client.iter_packages(
+            "*:*", server_url=self.server_url, fq=fq, sort=SYNC_SORT
+        ):
+            if mcp_client.last_search_skipped > skipped and not held:
+                # Store what came before the skip, then stop moving the high water
+                # mark, or incremental syncs would never request the package again
+                if batch:
+                    self._write_part(batch)
+                    fetched += len(batch)
+                    batch = []
+                held = True
+            skipped = mcp_client.last_search_skipped
+            batch.append(package)
+            if len(batch) >= BATCH_SIZE:
+                self._write_part(batch, advance=not held)
+                fetched += len(batch)
+                batch = []
+        if batch:
+            self._write_part(batch, advance=not held)
+            fetched += len(batch)
+        skipped = mcp_client.last_search_skipped
+        expected = mcp_client.last_search_count
+
+        if len(self._parts("packages")) > MAX_PARTS:
+            self.compact()
+
+        summary = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "mode": "full" if full or high_water is None else "incremental",
+            "fetched": fetched,
+            "expected": expected,
+            "skipped": skipped,
+            "complete": skipped == 0 and (expected is None or fetched >= expected),
+            "seconds": round(time.perf_counter() - started, 3),
+            "high_water": self.manifest["high_water"],
+        }
+        self.manifest["syncs"] = (self.manifest["syncs"] + [summary])[-20:]
+        self._write_manifest()
+        return summary
+
+    # Reading
+
+    def tables(self) -> tuple["pa.Table", "pa.Table"]:
+        """(packages, resources) with only the newest version of each package."""
+        package_parts = self._parts("packages")
+        resource_parts = {os.path.basename(p): p for p in self._parts("resources")}
+        seen: set[str] = set()
+        packages, resources = [], []
+
+        # Newest part first: a package id seen once is superseded in older parts
+        for path in reversed(package_parts):
+            table = pq.read_table(path, schema=PACKAGE_SCHEMA)
+            ids = table.column("id").to_pylist()
+            keep = [i not in seen and not seen.add(i) for i in ids]
+            kept = table.filter(pa.array(keep, pa.bool_()))
+            packages.append(kept)
+
+            resource_path = resource_parts.get(os.path.basename(path))
+            if resource_path and kept.num_rows:
+                part_resources = pq.read_table(resource_path, schema=RESOURCE_SCHEMA)
+                mask = pc.is_in(part_resources.column("package_id"), value_set=kept.column("id"))
+                resources.append(part_resources.filter(mask))
+
+        return (
+            pa.concat_tables(packages) if packages else PACKAGE_SCHEMA.empty_table(),
+            pa.concat_tables(resources) if resources else RESOURCE_SCHEMA.empty_table(),
+        )
+
+    def datasets(self, portal: str | None = None) -> list[DatasetRecord]:
+        """Stored packages as DatasetRecords, e.g. for MetadataQualityScorer."""
+        packages, resources = self.tables()
+        by_package: dict[str, list[CompactResource]] = {}
+        for row in resources.sort_by([("package_id", "ascending"), ("position", "ascending")]).to_pylist():
+            by_package.setdefault(row.pop("package_id"), []).append(
+                CompactResource(
+                    id=row["id"],
+                    name=row["name"],
+                    format=row["format"],
+                    url=row["url"],
+                    datastore_active=row["datastore_active"],
+                    has_description=row["has_description"],
+                )
+            )
+
+        records = []
+        for row in packages.to_pylist():
+            del row["metadata_created"]
+            records.append(
+                DatasetRecord(
+                    **row,
+                    resources=by_package.get(row["id"], []),
+                    portal=portal,
+                )
+            )
+        return records
+
+    def compact(self):
+        """Rewrite each table as a single part holding only current packages."""
+        packages, resources = self.tables()
+        part = self.manifest["next_part"]
+        old = self._parts("packages") + self._parts("resources")
+        for table, data in (("packages", packages), ("resources", resources)):
+            path = os.path.join(self.path, table, f"part-{part:06d}.parquet")
+            pq.write_table(data, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        self.manifest["next_part"] = part + 1
+        self._write_manifest()
+        for path in old:
+            os.remove(path)
+
+    def stats(self) -> dict[str, Any]:
+        """Package/resource counts, part files and bytes on disk."""
+        packages, resources = self.tables()
+        parts = self._parts("packages") + self._parts("resources")
+        return {
+            "server_url": self.server_url,
+            "packages": packages.num_rows,
+            "resources": resources.num_rows,
+            "parts": len(parts),
+            "bytes": sum(os.path.getsize(p) for p in parts),
+            "high_water": self.manifest["high_water"],
+            "last_sync": self.manifest["syncs"][-1] if self.manifest["syncs"] else None,
+        }
+
+
+async def _sync(args):
+    command, *command_args = shlex.split(args.mcp_command) if args.mcp_command else (
+        "node",
+        MCP_SERVER_PATH,
+    )
+    server_params = StdioServerParameters(command=command, args=command_args)
+    store = CatalogStore(args.store, args.server)
+
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            mcp_client = CKANMCPClient(session, server_url=args.server)
+            summary = await store.sync(mcp_client, full=args.full)
+
+    mark = "✓" if summary["complete"] else "⚠"
+    print(
+        f"{mark} {summary['mode'].capitalize()} sync: {summary['fetched']} of "
+        f"{summary['expected']} packages in {summary['seconds']:.1f}s "
+        f"(high water {summary['high_water']})"
+    )
+    if not summary["complete"]:
+        print(
+            f"⚠ Incomplete: {summary['skipped']} packages skipped (truncated on every "
+            "attempt); the next sync requests them again from the high water mark"
+        )
+    print(json.dumps(store.stats(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("command", choices=("sync", "stats", "compact"))
+    parser.add_argument("--server", default=CKAN_SERVER, help="CKAN portal URL")
+    parser.add_argument("--store", default=STORE_DIR, help="Store directory")
+    parser.add_argument("--full", action="store_true", help="Rebuild instead of syncing")
+    parser.add_argument(
+        "--mcp-command",
+        default=None,
+        help='MCP server command, e.g. "python standin_server.py" (default: node dist/index.js)',
+    )
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        asyncio.run(_sync(args))
+        return
+
+    store = CatalogStore(args.store, args.server)
+    if args.command == "compact":
+        store.compact()
+    print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
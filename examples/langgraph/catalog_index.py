@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Local BM25 Search over a Harvested Catalog
+
+An in-memory inverted index over the packages in a CatalogStore (see
+catalog_harvester.py): title, notes, tags, organization and resource
+names, ranked with BM25. The search node can query it instead of the
+portal, so exploratory searches cost no MCP round trips.
+
+- Tokens are accent-folded, Italian and English stopwords are dropped
+  and a light stemmer conflates plurals and final vowels
+  (trasporti/trasporto, cities/city)
+- Facets: organization, tags, res_format and license_id, given as
+  `filters` or inline as in CKAN queries (`trasporti res_format:CSV`)
+- Query terms must mostly match, with CKAN's default minimum-match rule
+  (mm "2<-1 5<80%"): all of 1-2 terms, all but one of 3-5, 80% of more.
+  Counts are comparable with package_search, not identical: Solr's
+  analyzers and indexed fields (extras, resource descriptions, ...)
+  differ from this index
+- Results are ranked by score, then metadata_modified, as in CKAN
+- update()/remove() change single packages; refresh() applies what a
+  CatalogStore.sync() changed
+
+Usage:
+    index = CatalogIndex.from_store(CatalogStore("catalog_store", server_url))
+    result = index.search("mobilità urbana", filters={"res_format": "CSV"})
+    result.count, result.records, result.facets
+
+Run:
+    python catalog_index.py "trasporto pubblico" --facets
+"""
+
+import argparse
+import heapq
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+from catalog_harvester import STORE_DIR, CatalogStore
+from ckan_client import CKAN_SERVER
+from ckan_records import DatasetRecord
+
+# Configuration
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "organization": 1.5,
+    "resources": 1.0,
+    "notes": 1.0,
+}
+FACET_FIELDS = ("organization", "tags", "res_format", "license_id")
+FACET_LIMIT = 50  # Values per facet, as CKAN's facet.limit
+SEARCH_LIMIT = 100
+
+# Accent-folded, so "è" and "e" are the same stopword
+STOPWORDS = frozenset(
+    """
+    a ad agli ai al alla alle allo anche che chi ci con da dai dal dalla dalle
+    degli dei del della delle dello di e gli ha i il in la le lo ma ne negli
+    nei nel nella nelle nello non o per piu quale quali se si sono su sui sul
+    sulla sulle tra fra un una uno
+    an and are as at be by for from has in into is it its of on or that the
+    their this to was were which with
+    """.split()
+)
+TOKEN = re.compile(r"[^\W_]+")
+FIELD_QUERY = re.compile(r'(\w+):("[^"]*"|\S+)')
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents (mobilità -> mobilita)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    """Light Italian/English stemmer: plurals and final vowels."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies"):
+        token = token[:-3] + "y"
+    elif token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    if len(token) > 4 and token[-1] in "aeio":
+        token = token[:-1]
+    return token
+
+
+@lru_cache(maxsize=200_000)
+def _term(word: str) -> str | None:
+    # Catalog vocabularies are small, so folding and stemming are cached per word
+    folded = fold(word)
+    if folded in STOPWORDS or (len(folded) < 2 and not folded.isdigit()):
+        return None
+    return stem(folded)
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Index terms of a text, in order."""
+    if not text:
+        return []
+    if not text.isascii():
+        text = unicodedata.normalize("NFC", text)
+    terms = [_term(w) for w in TOKEN.findall(text.lower())]
+    return [t for t in terms if t is not None]
+
+
+def parse_query(query: str | None) -> tuple[list[str], dict[str, list[str]]]:
+    """Split a CKAN-style query into search terms and facet filters."""
+    filters: dict[str, list[str]] = {}
+
+    def take(match: re.Match) -> str:
+        name, value = match.group(1), match.group(2).strip('"')
+        if name not in FACET_FIELDS:
+            return match.group(0)
+        filters.setdefault(name, []).append(value)
+        return " "
+
+    text = FIELD_QUERY.sub(take, query or "").replace("*:*", " ")
+    return tokenize(text), filters
+
+
+def min_should_match(terms: int) -> int:
+    """Query terms a package must match, as CKAN's default mm "2<-1 5<80%"."""
+    if terms <= 2:
+        return terms
+    if terms <= 5:
+        return terms - 1
+    return terms * 4 // 5  # Solr rounds percentages down
+
+
+def _field_texts(record: DatasetRecord) -> dict[str, str]:
+    return {
+        "title": record.title or "",
+        "notes": record.notes or "",
+        "tags": " ".join(record.tags),
+        "organization": f"{record.organization_title or ''} {record.organization_name or ''}",
+        "resources": " ".join(r.name or "" for r in record.resources),
+    }
+
+
+def _facet_values(record: DatasetRecord) -> dict[str, set[str]]:
+    return {
+        "organization": {record.organization_name} if record.organization_name else set(),
+        "tags": {t for t in record.tags if t},
+        "res_format": {r.format.strip().upper() for r in record.resources if r.format},
+        "license_id": {record.license_id} if record.license_id else set(),
+    }
+
+
+def _normalize_facet(name: str, value: str) -> str:
+    return value.strip().upper() if name == "res_format" else value
+
+
+def _record_key(record: DatasetRecord) -> str | None:
+    return record.id or record.name
+
+
+@dataclass(slots=True)
+class SearchResult:
+    """Matches of one query, like a package_search response."""
+
+    count: int
+    records: list[DatasetRecord]
+    scores: list[float]
+    facets: dict[str, dict[str, int]] = field(default_factory=dict)
+
+
+class CatalogIndex:
+    """BM25 inverted index over DatasetRecords, updatable in place."""
+
+    def __init__(self):
+        self._records: list[DatasetRecord | None] = []
+        self._docnos: dict[str, int] = {}
+        self._terms: list[dict[str, float] | None] = []  # docno -> weighted tf
+        self._lengths: list[float] = []
+        self._total_length = 0.0
+        self._norms: list[float] | None = None  # BM25 length norms, rebuilt after changes
+        self._doc_facets: list[dict[str, set[str]] | None] = []
+        self._postings: dict[str, dict[int, float]] = {}
+        self._facets: dict[str, dict[str, set[int]]] = {f: {} for f in FACET_FIELDS}
+
+    @classmethod
+    def from_store(cls, store: CatalogStore, portal: str | None = None) -> "CatalogIndex":
+        """Index every package currently in a CatalogStore."""
+        index = cls()
+        index.update(store.datasets(portal))
+        return index
+
+    def __len__(self) -> int:
+        return len(self._docnos)
+
+    # Updates
+
+    def update(self, records: Iterable[DatasetRecord]) -> int:
+        """Add packages, replacing any indexed version with the same id."""
+        count = 0
+        for record in records:
+            key = _record_key(record)
+            if key is None:
+                continue
+            if key in self._docnos:
+                self._remove(self._docnos.pop(key))
+            self._docnos[key] = self._add(record)
+            count += 1
+        return count
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """Drop packages by id (or name, for packages without one)."""
+        count = 0
+        for key in ids:
+            docno = self._docnos.pop(key, None)
+            if docno is not None:
+                self._remove(docno)
+                count += 1
+        return count
+
+    def refresh(self, store: CatalogStore, portal: str | None = None) -> dict[str, int]:
+        """Re-index packages whose metadata_modified changed; drop deleted ones."""
+        current = {_record_key(r): r for r in store.datasets(portal)}
+        changed = []
+        for key, record in current.items():
+            docno = self._docnos.get(key)
+            if docno is None or self._records[docno].metadata_modified != record.metadata_modified:
+                changed.append(record)
+        added = sum(1 for r in changed if _record_key(r) not in self._docnos)
+        updated = self.update(changed) - added
+        removed = self.remove([k for k in self._docnos if k not in current])
+        return {"added": added, "updated": updated, "removed": removed}
+
+    def _add(self, record: DatasetRecord) -> int:
+        docno = len(self._records)
+        terms: dict[str, float] = {}
+        for name, text in _field_texts(record).items():
+            weight = FIELD_WEIGHTS[name]
+            for term in tokenize(text):
+                terms[term] = terms.get(term, 0.0) + weight
+        length = sum(terms.values())
+        facets = _facet_values(record)
+
+        self._records.append(record)
+        self._terms.append(terms)
+        self._lengths.append(length)
+        self._doc_facets.append(facets)
+        self._total_length += length
+        self._norms = None
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[docno] = tf
+        for name, values in facets.items():
+            for value in values:
+                self._facets[name].setdefault(value, set()).add(docno)
+        return docno
+
+    def _remove(self, docno: int):
+        terms = self._terms[docno]
+        for term in terms:
+            postings = self._postings[term]
+            del postings[docno]
+            if not postings:
+                del self._postings[term]
+        for name, values in self._doc_facets[docno].items():
+            for value in values:
+                docs = self._facets[name][value]
+                docs.discard(docno)
+                if not docs:
+                    del self._facets[name][value]
+        self._total_length -= self._lengths[docno]
+        self._norms = None
+        # Slots are not reused; docnos stay valid for the postings above
+        self._records[docno] = None
+        self._terms[docno] = None
+        self._lengths[docno] = 0.0
+        self._doc_facets[docno] = None
+
+    def _length_norms(self) -> list[float]:
+        if self._norms is None:
+            count = len(self._docnos)
+            average = self._total_length / count if count and self._total_length else 1.0
+            self._norms = [
+                BM25_K1 * (1 - BM25_B + BM25_B * length / average) for length in self._lengths
+            ]
+        return self._norms
+
+    # Search
+
+    def _filtered(self, filters: dict[str, Any]) -> set[int] | None:
+        """Docnos matching every facet (any of its values); None = no filter."""
+        allowed = None
+        for name, values in filters.items():
+            if name not in self._facets:
+                raise ValueError(f"Unknown facet: {name} (expected one of {FACET_FIELDS})")
+            if isinstance(values, str):
+                values = [values]
+            docs: set[int] = set()
+            for value in values:
+                docs |= self._facets[name].get(_normalize_facet(name, value), set())
+            allowed = docs if allowed is None else allowed & docs
+        return allowed
+
+    def search(
+        self,
+        query: str | None,
+        filters: dict[str, Any] | None = None,
+        limit: int = SEARCH_LIMIT,
+        facet_fields: Iterable[str] = (),
+    ) -> SearchResult:
+        """
+        Rank packages matching enough query terms (min_should_match) with BM25.
+
+        An empty query (or *:*) matches everything, newest first. Inline
+        field:value terms for facet fields are treated as filters.
+        """
+        terms, inline = parse_query(query)
+        merged: dict[str, list[str]] = {k: list(v) for k, v in inline.items()}
+        for name, values in (filters or {}).items():
+            merged.setdefault(name, []).extend([values] if isinstance(values, str) else values)
+        allowed = self._filtered(merged)
+
+        scores: dict[int, float] = {}
+        if terms:
+            count = len(self._docnos)
+            norms = self._length_norms()
+            unique = set(terms)
+            matched: Counter[int] = Counter()
+            for term in unique:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for docno, tf in postings.items():
+                    if allowed is not None and docno not in allowed:
+                        continue
+                    scores[docno] = scores.get(docno, 0.0) + idf * tf * (BM25_K1 + 1) / (
+                        tf + norms[docno]
+                    )
+                    matched[docno] += 1
+            required = min_should_match(len(unique))
+            if required > 1:
+                scores = {d: score for d, score in scores.items() if matched[d] >= required}
+        else:
+            docs = allowed if allowed is not None else self._docnos.values()
+            scores = dict.fromkeys(docs, 0.0)
+
+        top = heapq.nlargest(
+            limit,
+            scores,
+            key=lambda d: (scores[d], self._records[d].metadata_modified or ""),
+        )
+        facets = {}
+        for name in facet_fields:
+            counts = Counter()
+            for docno in scores:
+                counts.update(self._doc_facets[docno][name])
+            facets[name] = dict(counts.most_common(FACET_LIMIT))
+
+        return SearchResult(
+            count=len(scores),
+            records=[self._records[d] for d in top],
+            scores=[scores[d] for d in top],
+            facets=facets,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search a harvested catalog locally")
+    parser.add_argument("query", help='e.g. "trasporti res_format:CSV"')
+    parser.add_argument("--server", default=CKAN_SERVER, help="CKAN portal URL")
+    parser.add_argument("--store", default=STORE_DIR, help="catalog_harvester.py store")
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--facets", action="store_true", help="Show facet counts")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = CatalogIndex.from_store(CatalogStore(args.store, args.server))
+    print(f"✓ Indexed {len(index)} packages in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    result = index.search(
+        args.query, limit=args.rows, facet_fields=FACET_FIELDS if args.facets else ()
+    )
+    print(f"✓ {result.count} matches in {(time.perf_counter() - started) * 1000:.2f} ms\n")
+    for record, score in zip(result.records, result.scores):
+        print(f"{score:6.2f}  {record.title}  [{record.organization_name}]")
+    for name, counts in result.facets.items():
+        top = ", ".join(f"{value} ({n})" for value, n in list(counts.items())[:8])
+        print(f"\n{name}: {top}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+SQLite Checkpointer and Resumable Runs
+
+Persists LangGraph checkpoints to a local SQLite file so a crashed or
+interrupted run can be resumed by run id instead of starting over:
+
+- Completed nodes are not run again; a resumed run continues from the
+  last checkpoint (writes of nodes that finished in a failed step are kept)
+- Tool results of a run are journaled to disk (see run_journal), so a node
+  that is re-run after a crash replays the pages it already fetched
+- Channel values and pending writes are stored by reference in a
+  content-addressed payload table: a large list that nodes pass along
+  unchanged is written once per run, not once per step
+- DatasetRecord / CompactResource state round-trips through the msgpack
+  serializer (see SERIALIZABLE_TYPES)
+
+Usage:
+    checkpointer = SQLiteCheckpointer("checkpoints/checkpoints.sqlite")
+    workflow = graph.compile(checkpointer=checkpointer)
+    result = await run_or_resume(workflow, initial_state, run_id, resume=False)
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from tool_cache import ToolCallCache
+
+# Configuration
+SERIALIZABLE_TYPES = [
+    ("ckan_records", "DatasetRecord"),
+    ("ckan_records", "CompactResource"),
+]
+JOURNAL_TTL = 7 * 86400  # Seconds a run's tool results stay replayable
+
+
+def new_run_id() -> str:
+    """Sortable, unique run id, e.g. 20260118-143012-3f9a1c."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    """Checkpoint saver backed by one SQLite file, payloads stored by hash."""
+
+    def __init__(self, path: str):
+        super().__init__(
+            serde=JsonPlusSerializer(allowed_msgpack_modules=SERIALIZABLE_TYPES)
+        )
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Async graphs call from the event loop, sync ones from worker threads
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                parent_id TEXT,
+                checkpoint TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS channels (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                payload TEXT,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                task_path TEXT NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS payloads (
+                sha256 TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                data BLOB NOT NULL
+            );
+            """
+        )
+        self.conn.commit()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock, self.conn:
+            yield self.conn
+
+    # Payloads
+
+    def _store(self, conn: sqlite3.Connection, value: Any) -> str:
+        """Serialize `value` into the payload table; return its hash."""
+        type_, data = self.serde.dumps_typed(value)
+        digest = hashlib.sha256(type_.encode("utf-8") + b"\0" + data).hexdigest()
+        conn.execute(
+            "INSERT OR IGNORE INTO payloads VALUES (?, ?, ?)", (digest, type_, data)
+        )
+        return digest
+
+    def _load(self, conn: sqlite3.Connection, digest: str) -> Any:
+        type_, data = conn.execute(
+            "SELECT type, data FROM payloads WHERE sha256 = ?", (digest,)
+        ).fetchone()
+        return self.serde.loads_typed((type_, data))
+
+    # BaseCheckpointSaver
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Checkpoint named by the config, or the thread's latest one."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = (
+            "SELECT checkpoint_id, parent_id, checkpoint, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: list[Any] = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+
+        with self._lock:
+            row = self.conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            return self._tuple(thread_id, checkpoint_ns, *row)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Checkpoints newest first, optionally filtered by metadata."""
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, "
+            "metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params: list[Any] = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        for thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata in rows:
+            if limit is not None and limit <= 0:
+                break
+            with self._lock:
+                if filter:
+                    values = self._load(self.conn, metadata)
+                    if not all(values.get(k) == v for k, v in filter.items()):
+                        continue
+                item = self._tuple(
+                    thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata
+                )
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def _tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_id: str | None,
+        checkpoint_ref: str,
+        metadata_ref: str,
+    ) -> CheckpointTuple:
+        """Rebuild a CheckpointTuple, resolving channel and write references."""
+        checkpoint = self._load(self.conn, checkpoint_ref)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            row = self.conn.execute(
+                "SELECT payload FROM channels WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row and row[0] is not None:
+                channel_values[channel] = self._load(self.conn, row[0])
+
+        writes = self.conn.execute(
+            "SELECT task_id, idx, channel, payload, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[4], w[0], w[1]))
+
+        def config_for(cid: str) -> RunnableConfig:
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": cid,
+                }
+            }
+
+        return CheckpointTuple(
+            config=config_for(checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self._load(self.conn, metadata_ref),
+            parent_config=config_for(parent_id) if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self._load(self.conn, payload))
+                for task_id, _, channel, payload, _ in writes
+            ],
+        )
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint; only channels with a new version are written."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+
+        with self._transaction() as conn:
+            for channel, version in new_versions.items():
+                payload = self._store(conn, values[channel]) if channel in values else None
+                conn.execute(
+                    "INSERT OR REPLACE INTO channels VALUES (?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, channel, str(version), payload),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),  # Parent
+                    self._store(conn, c),
+                    self._store(conn, get_checkpoint_metadata(config, metadata)),
+                ),
+            )
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save the writes of one task against the current checkpoint."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self._transaction() as conn:
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                # Special writes (errors, interrupts) are replaced, regular ones kept
+                verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+                conn.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint_id,
+                        task_id,
+                        idx,
+                        channel,
+                        self._store(conn, value),
+                        task_path,
+                    ),
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete a run's checkpoints and any payloads no longer referenced."""
+        with self._transaction() as conn:
+            for table in ("checkpoints", "channels", "writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            conn.execute(
+                """
+                DELETE FROM payloads WHERE sha256 NOT IN (
+                    SELECT checkpoint FROM checkpoints
+                    UNION SELECT metadata FROM checkpoints
+                    UNION SELECT payload FROM channels WHERE payload IS NOT NULL
+                    UNION SELECT payload FROM writes
+                )
+                """
+            )
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        # Same format as InMemorySaver: zero-padded counter plus a random suffix
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # Async API: SQLite calls are short, run them inline like InMemorySaver
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    def stats(self) -> dict[str, Any]:
+        """Row counts and payload bytes on disk."""
+        with self._lock:
+            checkpoints, threads = self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT thread_id) FROM checkpoints"
+            ).fetchone()
+            payloads, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM payloads"
+            ).fetchone()
+        return {
+            "runs": threads,
+            "checkpoints": checkpoints,
+            "payloads": payloads,
+            "bytes": size,
+        }
+
+    def close(self):
+        """Close the database."""
+        self.conn.close()
+
+
+def journal_path(checkpoint_path: str, run_id: str) -> str:
+    """Tool journal file of a run, next to the checkpoint database."""
+    return os.path.join(os.path.dirname(checkpoint_path), f"{run_id}.tools.sqlite")
+
+
+def run_journal(checkpoint_path: str, run_id: str) -> ToolCallCache:
+    """Tool result cache for one run, replayed when the run is resumed."""
+    return ToolCallCache(
+        ttls={"ckan_status_show": 0},
+        default_ttl=JOURNAL_TTL,
+        disk_path=journal_path(checkpoint_path, run_id),
+        max_disk_entries=None,  # A resumed run must find every result; dropped by finish_run
+    )
+
+
+async def run_or_resume(
+    workflow, initial_state: dict, run_id: str, resume: bool = False, **config: Any
+) -> dict:
+    """Start run `run_id`, or continue it from its last checkpoint.
+
+    Extra keyword arguments go into the run config (e.g. max_concurrency).
+    """
+    config = {**config, "configurable": {"thread_id": run_id}}
+    if not resume:
+        return await workflow.ainvoke(initial_state, config)
+
+    snapshot = await workflow.aget_state(config)
+    if not snapshot.values:
+        raise ValueError(f"No checkpoints for run {run_id!r}")
+    if not snapshot.next:
+        return snapshot.values  # Already finished
+    print(f"\n↻ Resuming run {run_id} at: {', '.join(snapshot.next)}")
+    return await workflow.ainvoke(None, config)
+
+
+def finish_run(checkpoint_path: str, run_id: str):
+    """Drop a completed run's tool journal; its checkpoints are kept."""
+    path = journal_path(checkpoint_path, run_id)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
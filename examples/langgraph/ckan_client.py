@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Shared CKAN MCP Client
+
+Single implementation of the client used by every workflow in this
+directory. Responses are decoded with the fastest JSON backend available
+(orjson, then msgspec, then the stdlib), truncated responses are salvaged
+with truncated_json.decode_partial, and results can optionally be wrapped
+in slot-based Package records (see ckan_records.py).
+
+Usage:
+    mcp_client = CKANMCPClient(session, server_url="https://www.dati.gov.it/opendata")
+    async for dataset in mcp_client.iter_packages("mobilità urbana", max_results=500):
+        ...
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import Any
+
+from mcp import ClientSession
+
+from ckan_records import Package
+from tool_cache import is_error
+from tracing import span
+from truncated_json import TRUNCATION_MARKER, decode_partial
+
+# Fast JSON backend (optional)
+try:
+    import orjson
+
+    loads = orjson.loads
+    DECODE_ERRORS: tuple[type[Exception], ...] = (orjson.JSONDecodeError,)
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import msgspec
+
+        loads = msgspec.json.decode
+        DECODE_ERRORS = (msgspec.DecodeError,)
+        JSON_BACKEND = "msgspec"
+    except ImportError:
+        loads = json.loads
+        DECODE_ERRORS = (json.JSONDecodeError,)
+        JSON_BACKEND = "json"
+
+# Configuration
+CKAN_SERVER = "https://www.dati.gov.it/opendata"
+SEARCH_ROWS = 5  # Initial page size, adapted by iter_packages()
+MAX_SEARCH_ROWS = 1000  # Server-side cap on ckan_package_search rows
+CHARACTER_LIMIT = 50000  # Mirrors CHARACTER_LIMIT in src/types.ts
+PAGE_FILL_RATIO = 0.7  # Target fraction of CHARACTER_LIMIT per page
+MAX_DATASTORE_ROWS = 32000  # Server-side cap on ckan_datastore_search limit
+DATASTORE_PROBE_ROWS = 10  # First page, used to learn total, fields and row size
+DATASTORE_CONCURRENCY = 4  # Pages in flight while streaming a table
+
+
+def decode_response(result, array_key: str) -> tuple[dict, int, bool]:
+    """
+    Decode the text content of a tool result.
+
+    Returns (response, text size, truncated). Truncated responses keep
+    every complete `array_key` item and are marked with "_truncated" and
+    "_recovered" (the number of items salvaged), so callers can tell them
+    from full responses; the span records the same.
+    """
+    with span("json_decode", "decode") as s:
+        response, size, truncated = _decode_text(result, array_key)
+        if s is not None:
+            items = response.get(array_key)
+            s.bytes = size
+            s.items = len(items) if isinstance(items, list) else 0
+            s.attrs["truncated"] = truncated
+            if truncated:
+                s.attrs["recovered"] = response.get("_recovered", 0)
+        return response, size, truncated
+
+
+def _decode_text(result, array_key: str) -> tuple[dict, int, bool]:
+    for content in result.content:
+        if content.type == "text":
+            text = content.text
+            if is_error(result):
+                return {"error": text}, len(text), False
+            if TRUNCATION_MARKER in text:
+                # Keep every complete item before the cut
+                response, recovered, complete = decode_partial(text, array_key)
+                if not complete:
+                    response["_truncated"] = True
+                    response["_recovered"] = recovered
+                return response, len(text), not complete
+            try:
+                return loads(text), len(text), False
+            except DECODE_ERRORS as e:
+                return {"error": f"JSON parse error: {e}"}, len(text), False
+
+    return {"error": "No content in response"}, 0, False
+
+
+class CKANMCPClient:
+    """Helper for calling CKAN MCP Server tools."""
+
+    def __init__(self, session: ClientSession, server_url: str = CKAN_SERVER):
+        self.session = session
+        self.server_url = server_url
+        self.last_search_count: int | None = None
+        self.last_search_skipped = 0
+        self.last_datastore_total: int | None = None
+        self.last_datastore_fields: list[dict] = []
+        self.last_datastore_skipped = 0
+
+    async def search_packages(
+        self,
+        query: str,
+        rows: int = SEARCH_ROWS,
+        start: int = 0,
+        server_url: str | None = None,
+    ) -> dict:
+        """Search CKAN packages."""
+        response, _, _ = await self._search_page(query, rows, start, server_url)
+        return response
+
+    async def iter_packages(
+        self,
+        query: str,
+        max_results: int | None = None,
+        rows: int = SEARCH_ROWS,
+        server_url: str | None = None,
+        typed: bool = False,
+        fq: str | None = None,
+        sort: str | None = None,
+    ):
+        """
+        Walk ckan_package_search page by page, yielding datasets.
+
+        The next page is requested before the current one is yielded, so
+        consumers work on page N while page N+1 is in flight. Page size is
+        adapted from the observed bytes per dataset to stay under the
+        server's CHARACTER_LIMIT. Complete datasets are salvaged from
+        truncated pages and the walk resumes after the last one; pages with
+        nothing salvageable are retried with fewer rows. A single dataset
+        still truncated on a second try is skipped and counted in
+        last_search_skipped; skipped datasets do not count toward
+        `max_results`.
+
+        With `typed=True`, datasets are yielded as Package records. `fq` and
+        `sort` are passed through to package_search, e.g. a metadata_modified
+        range sorted ascending for incremental harvesting.
+        """
+        start = 0  # Server offset of the next page
+        yielded = 0
+        retried = False
+        total = None
+        self.last_search_skipped = 0
+        pending = asyncio.create_task(
+            self._search_page(query, rows, start, server_url, fq, sort)
+        )
+
+        try:
+            while True:
+                response, size, truncated = await pending
+                pending = None
+
+                if truncated and not response.get("results"):
+                    if rows > 1:
+                        rows = max(1, rows // 2)
+                    elif not retried:
+                        retried = True  # Truncation may be transient: try once more
+                    else:
+                        start += 1  # Single oversized dataset: skip it
+                        retried = False
+                        self.last_search_skipped += 1
+                    pending = asyncio.create_task(
+                        self._search_page(query, rows, start, server_url, fq, sort)
+                    )
+                    continue
+                retried = False
+
+                if "error" in response:
+                    raise RuntimeError(response["error"])
+
+                datasets = response.get("results", [])
+                total = response.get("count", total)
+                self.last_search_count = total
+                start += len(datasets)
+                if max_results is not None:
+                    datasets = datasets[: max_results - yielded]
+                yielded += len(datasets)
+
+                if total is not None:
+                    remaining = total - start
+                    if max_results is not None:
+                        remaining = min(remaining, max_results - yielded)
+                elif max_results is not None:
+                    remaining = max_results - yielded
+                else:
+                    remaining = MAX_SEARCH_ROWS  # Count unknown: page until one comes back empty
+                if datasets and remaining:
+                    per_item = size / len(datasets)
+                    rows = int(CHARACTER_LIMIT * PAGE_FILL_RATIO / per_item)
+                    rows = max(1, min(rows, MAX_SEARCH_ROWS, remaining))
+                    pending = asyncio.create_task(
+                        self._search_page(query, rows, start, server_url, fq, sort)
+                    )
+
+                for dataset in datasets:
+                    yield Package(dataset) if typed else dataset
+
+                if pending is None:
+                    return
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def _search_page(
+        self,
+        query: str,
+        rows: int,
+        start: int,
+        server_url: str | None = None,
+        fq: str | None = None,
+        sort: str | None = None,
+    ) -> tuple[dict, int, bool]:
+        """Fetch one search page; return (response, text size, truncated)."""
+        arguments = {
+            "server_url": server_url or self.server_url,
+            "q": query,
+            "rows": rows,
+            "start": start,
+            "response_format": "json",
+        }
+        # Only sent when set, so plain searches keep their cache keys
+        if fq:
+            arguments["fq"] = fq
+        if sort:
+            arguments["sort"] = sort
+        result = await self.session.call_tool("ckan_package_search", arguments=arguments)
+        return decode_response(result, "results")
+
+    async def datastore_search(
+        self,
+        resource_id: str,
+        limit: int = 3,
+        offset: int = 0,
+        server_url: str | None = None,
+    ) -> dict:
+        """Query DataStore."""
+        result = await self.session.call_tool(
+            "ckan_datastore_search",
+            arguments={
+                "server_url": server_url or self.server_url,
+                "resource_id": resource_id,
+                "limit": limit,
+                "offset": offset,
+                "response_format": "json",
+            },
+        )
+        response, _, _ = decode_response(result, "records")
+        return response
+
+    async def mqa_quality(self, dataset_id: str, server_url: str | None = None) -> dict:
+        """MQA score breakdown from data.europa.eu (dati.gov.it datasets only)."""
+        result = await self.session.call_tool(
+            "ckan_get_mqa_quality",
+            arguments={
+                "server_url": server_url or self.server_url,
+                "dataset_id": dataset_id,
+                "response_format": "json",
+            },
+        )
+        text = next((c.text for c in result.content if c.type == "text"), "")
+        if text.startswith("Error"):
+            # The tool reports unsupported portals and lookup failures as text
+            return {"error": text}
+        response, _, _ = decode_response(result, "mqa")
+        return response
+
+    async def datastore_search_sql(
+        self, sql: str, server_url: str | None = None
+    ) -> dict:
+        """Run a datastore_search_sql query; {"error": ...} if the portal refuses it."""
+        result = await self.session.call_tool(
+            "ckan_datastore_search_sql",
+            arguments={
+                "server_url": server_url or self.server_url,
+                "sql": sql,
+                "response_format": "json",
+            },
+        )
+        response, _, _ = decode_response(result, "records")
+        return response
+
+    async def iter_datastore(
+        self,
+        resource_id: str,
+        concurrency: int = DATASTORE_CONCURRENCY,
+        page_size: int | None = None,
+        server_url: str | None = None,
+    ):
+        """
+        Stream a whole DataStore table, yielding pages of records in order.
+
+        A small probe page gives the total, the fields (stored in
+        last_datastore_total / last_datastore_fields) and the size of a
+        record, from which the page size is chosen to stay under
+        CHARACTER_LIMIT. The remaining offset ranges are then fetched with
+        up to `concurrency` pages in flight (plus one while filling a gap)
+        and yielded in offset order.
+        Records missing from truncated pages are fetched before moving on,
+        and later pages shrink accordingly (growing back once pages arrive
+        whole). A single record still truncated on a second try is skipped
+        and counted in last_datastore_skipped. Pages are sorted by _id so
+        offsets stay stable.
+        """
+        probe_rows = DATASTORE_PROBE_ROWS
+        while True:
+            # total and fields follow the records in the response, so the
+            # probe must not be truncated
+            first, size, truncated = await self._datastore_page(
+                resource_id, probe_rows, 0, server_url
+            )
+            if not truncated or probe_rows == 1:
+                break
+            probe_rows = max(1, probe_rows // 2)
+
+        if "error" in first:
+            raise RuntimeError(first["error"])
+        if truncated:
+            raise RuntimeError("A single DataStore record exceeds the response limit")
+
+        records = first.get("records", [])
+        total = first.get("total", len(records))
+        self.last_datastore_total = total
+        self.last_datastore_fields = first.get("fields", [])
+
+        if page_size is None:
+            per_record = size / max(1, len(records))
+            page_size = int(CHARACTER_LIMIT * PAGE_FILL_RATIO / per_record)
+        page_size = max(1, min(page_size, MAX_DATASTORE_ROWS))
+        target_size = page_size
+        self.last_datastore_skipped = 0
+
+        if records:
+            yield records
+        next_offset = len(records)
+        pending: deque[tuple[int, int, asyncio.Task]] = deque()
+
+        def schedule():
+            nonlocal next_offset
+            while len(pending) < concurrency and next_offset < total:
+                rows = min(page_size, total - next_offset)
+                task = asyncio.create_task(
+                    self._datastore_page(resource_id, rows, next_offset, server_url)
+                )
+                pending.append((next_offset, rows, task))
+                next_offset += rows
+
+        try:
+            schedule()
+            while pending:
+                offset, rows, task = pending.popleft()
+                response, _, truncated = await task
+                schedule()
+
+                if "error" in response:
+                    raise RuntimeError(response["error"])
+                records = response.get("records", [])
+                if records:
+                    yield records
+
+                if truncated and len(records) < rows:
+                    # Shrink later pages, then fill the gap before moving on
+                    got = len(records)
+                    page_size = max(1, got or page_size // 2)
+                    async for records in self._fill_datastore(
+                        resource_id, offset + got, rows - got, page_size, server_url
+                    ):
+                        yield records
+                else:
+                    page_size = min(target_size, page_size * 2)
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+
+    async def _fill_datastore(
+        self,
+        resource_id: str,
+        offset: int,
+        count: int,
+        rows: int,
+        server_url: str | None = None,
+    ):
+        """Fetch `count` records from `offset` sequentially, halving on truncation."""
+        retried = False
+        while count > 0:
+            response, _, truncated = await self._datastore_page(
+                resource_id, min(rows, count), offset, server_url
+            )
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            records = response.get("records", [])
+            if not records:
+                if not truncated:
+                    return  # Table ended early
+                if rows > 1:
+                    rows = max(1, rows // 2)
+                elif not retried:
+                    retried = True  # Truncation may be transient: try once more
+                else:
+                    offset += 1  # Single oversized record: skip it
+                    count -= 1
+                    retried = False
+                    self.last_datastore_skipped += 1
+                continue
+            retried = False
+            yield records
+            offset += len(records)
+            count -= len(records)
+
+    async def _datastore_page(
+        self, resource_id: str, limit: int, offset: int, server_url: str | None = None
+    ) -> tuple[dict, int, bool]:
+        """Fetch one DataStore page sorted by _id; return (response, size, truncated)."""
+        result = await self.session.call_tool(
+            "ckan_datastore_search",
+            arguments={
+                "server_url": server_url or self.server_url,
+                "resource_id": resource_id,
+                "limit": limit,
+                "offset": offset,
+                "sort": "_id",
+                "response_format": "json",
+            },
+        )
+        return decode_response(result, "records")
+
+    async def call_tool_json(
+        self, name: str, arguments: dict[str, Any], array_key: str = "results"
+    ) -> dict:
+        """Call any tool with response_format=json and decode the result."""
+        arguments = {
+            "server_url": self.server_url,
+            **arguments,
+            "response_format": "json",
+        }
+        result = await self.session.call_tool(name, arguments=arguments)
+        response, _, _ = decode_response(result, array_key)
+        return response
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Typed Records for CKAN Packages and Resources
+
+Slot-based wrappers around decoded CKAN JSON. Frequently read fields are
+copied into slots on construction; everything else (extras, contacts,
+tags, ...) is looked up lazily in the raw dict on first access.
+Resources are wrapped only when `resources` is first read.
+
+Records also support `get()` and `[]`, so code written for plain dicts,
+such as MetadataQualityScorer, accepts them unchanged.
+
+DatasetRecord is the compact form carried through LangGraph state: it
+keeps only the fields the workflow nodes and the scorer read, and can
+spill the full package JSON to a RawStore for on-demand loading.
+"""
+
+import json
+import sqlite3
+from dataclasses import dataclass
+from typing import Any
+
+# Extras keys read by MetadataQualityScorer
+SCORED_EXTRAS = (
+    "spatial",
+    "geographic_coverage",
+    "temporal_start",
+    "temporal_end",
+    "frequency",
+    "update_frequency",
+)
+
+
+class Resource:
+    """A CKAN resource."""
+
+    __slots__ = ("id", "name", "format", "url", "datastore_active", "_raw")
+
+    def __init__(self, raw: dict[str, Any]):
+        self.id = raw.get("id")
+        self.name = raw.get("name")
+        self.format = raw.get("format")
+        self.url = raw.get("url")
+        self.datastore_active = bool(raw.get("datastore_active"))
+        self._raw = raw
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access to any field."""
+        return self._raw.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._raw[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._raw
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for fields not held in slots
+        try:
+            return self._raw[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def to_dict(self) -> dict[str, Any]:
+        """The underlying CKAN dict."""
+        return self._raw
+
+    def __repr__(self) -> str:
+        return f"Resource(name={self.name!r}, format={self.format!r})"
+
+
+class Package:
+    """A CKAN package (dataset)."""
+
+    __slots__ = ("id", "name", "title", "notes", "metadata_modified", "_resources", "_raw")
+
+    def __init__(self, raw: dict[str, Any]):
+        self.id = raw.get("id")
+        self.name = raw.get("name")
+        self.title = raw.get("title")
+        self.notes = raw.get("notes")
+        self.metadata_modified = raw.get("metadata_modified")
+        self._resources: list[Resource] | None = None
+        self._raw = raw
+
+    @property
+    def resources(self) -> list[Resource]:
+        """Resources, wrapped on first access."""
+        if self._resources is None:
+            self._resources = [Resource(r) for r in self._raw.get("resources") or []]
+        return self._resources
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access to any field."""
+        if key == "resources":
+            return self.resources if "resources" in self._raw else default
+        return self._raw.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "resources":
+            return self.resources
+        return self._raw[key]
+
+    def __setitem__(self, key: str, value: Any):
+        # Annotations such as _quality or _portal go to the raw dict
+        self._raw[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._raw
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for fields not held in slots
+        try:
+            return self._raw[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def to_dict(self) -> dict[str, Any]:
+        """The underlying CKAN dict."""
+        return self._raw
+
+    def __repr__(self) -> str:
+        return f"Package(name={self.name!r})"
+
+
+class RawStore:
+    """SQLite side store for full package JSON, keyed by package id."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS raw_packages "
+            "(key TEXT PRIMARY KEY, json TEXT NOT NULL)"
+        )
+
+    def __enter__(self) -> "RawStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, key: str, raw: dict[str, Any]):
+        """Store (or replace) one package."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO raw_packages VALUES (?, ?)",
+            (key, json.dumps(raw, ensure_ascii=False)),
+        )
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Load one package, or None if unknown."""
+        row = self.conn.execute(
+            "SELECT json FROM raw_packages WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def commit(self):
+        """Flush pending writes."""
+        self.conn.commit()
+
+    def close(self):
+        """Commit pending writes and close the database."""
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+
+@dataclass(slots=True)
+class CompactResource:
+    """Resource fields read by the workflows and the scorer."""
+
+    id: str | None
+    name: str | None
+    format: str | None
+    url: str | None
+    datastore_active: bool
+    has_description: bool
+
+    @classmethod
+    def from_dict(cls, raw: dict[str, Any]) -> "CompactResource":
+        return cls(
+            id=raw.get("id"),
+            name=raw.get("name"),
+            format=raw.get("format"),
+            url=raw.get("url"),
+            datastore_active=bool(raw.get("datastore_active")),
+            has_description=bool(raw.get("description")),
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access; "description" is only reported as present/absent."""
+        if key == "description":
+            return True if self.has_description else default
+        if key in self.__slots__:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+
+@dataclass(slots=True)
+class DatasetRecord:
+    """
+    Compact dataset for LangGraph state.
+
+    Holds the fields read by the workflow nodes and MetadataQualityScorer;
+    the full package is available through raw() when it was spilled.
+    """
+
+    id: str | None
+    name: str | None
+    title: str | None
+    notes: str
+    license_id: str | None
+    author: str | None
+    maintainer: str | None
+    author_email: str | None
+    maintainer_email: str | None
+    organization_name: str | None
+    organization_title: str | None
+    tags: list[str]
+    extras: list[list]  # [key, value] pairs for SCORED_EXTRAS only
+    resources: list[CompactResource]
+    num_resources: int
+    metadata_modified: str | None
+    portal: str | None = None
+    quality: dict | None = None
+    raw_path: str | None = None
+    raw_key: str | None = None
+
+    @classmethod
+    def from_dict(
+        cls, raw: dict[str, Any], store: RawStore | None = None
+    ) -> "DatasetRecord":
+        """Build a record, spilling the full package to `store` if given."""
+        organization = raw.get("organization") or {}
+        resources = raw.get("resources") or []
+        raw_key = raw.get("id") or raw.get("name")
+        if store is not None and raw_key:
+            store.put(raw_key, raw)
+
+        return cls(
+            id=raw.get("id"),
+            name=raw.get("name"),
+            title=raw.get("title"),
+            notes=raw.get("notes") or "",
+            license_id=raw.get("license_id"),
+            author=raw.get("author"),
+            maintainer=raw.get("maintainer"),
+            author_email=raw.get("author_email"),
+            maintainer_email=raw.get("maintainer_email"),
+            organization_name=organization.get("name"),
+            organization_title=organization.get("title"),
+            tags=[t.get("name") for t in raw.get("tags") or []],
+            extras=[
+                [e.get("key"), e.get("value")]
+                for e in raw.get("extras") or []
+                if e.get("key") in SCORED_EXTRAS
+            ],
+            resources=[CompactResource.from_dict(r) for r in resources],
+            num_resources=raw.get("num_resources", len(resources)),
+            metadata_modified=raw.get("metadata_modified"),
+            portal=raw.get("_portal"),
+            raw_path=store.path if store is not None and raw_key else None,
+            raw_key=raw_key if store is not None else None,
+        )
+
+    def raw(self) -> dict[str, Any] | None:
+        """Load the full package JSON from the side store."""
+        if not self.raw_path or not self.raw_key:
+            return None
+        with RawStore(self.raw_path) as store:
+            return store.get(self.raw_key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access to the fields read by the nodes and the scorer."""
+        if key == "organization":
+            if self.organization_name is None and self.organization_title is None:
+                return default
+            return {"name": self.organization_name, "title": self.organization_title}
+        if key == "tags":
+            return [{"name": name} for name in self.tags]
+        if key == "extras":
+            return [{"key": k, "value": v} for k, v in self.extras]
+        if key == "_quality":
+            return default if self.quality is None else self.quality
+        if key == "_portal":
+            return default if self.portal is None else self.portal
+        if key in self.__slots__:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        # Annotations attached by the workflow nodes
+        if key == "_quality":
+            self.quality = value
+        elif key == "_portal":
+            self.portal = value
+        else:
+            raise KeyError(f"DatasetRecord does not store {key!r}")
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Streaming CSV Profiler
+
+Profiles CSV resources of any size in bounded memory. The file is read in
+chunks (http(s), file:// URLs or local paths), the encoding and dialect
+are sniffed from the first chunk, and every column is summarised
+incrementally:
+
+- Type inference (integer, number, boolean, date, string); once a
+  column holds free text, later values are no longer classified
+- Null rate (empty cells and common placeholders such as "n.d.")
+- Min/max (numbers and dates) and string lengths
+- Approximate distinct counts (exact up to DISTINCT_EXACT_LIMIT values,
+  then HyperLogLog)
+- Approximate quantiles from a fixed-size reservoir sample
+
+Italian open data conventions are recognised: ";" delimiters, decimal
+commas ("1.234,56") and dd/mm/yyyy dates.
+
+Run:
+    python csv_profiler.py https://example.org/data.csv
+    python csv_profiler.py data.csv --max-rows 100000
+"""
+
+import argparse
+import codecs
+import csv
+import hashlib
+import io
+import json
+import math
+import random
+import re
+import urllib.request
+from typing import Any, BinaryIO
+
+# Configuration
+CHUNK_SIZE = 1 << 20  # Bytes per read from the source
+SNIFF_BYTES = 64 * 1024  # Head of the file used to sniff encoding and dialect
+DELIMITERS = ",;\t|"
+DISTINCT_EXACT_LIMIT = 10000  # Distinct values tracked exactly per column
+HLL_PRECISION = 14  # 2^14 registers, ~0.8% standard error
+RESERVOIR_SIZE = 8192  # Numeric sample per column for quantiles
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+REQUEST_TIMEOUT = 60  # Seconds
+USER_AGENT = "ckan-mcp-langgraph-examples/1.0"
+
+NULL_VALUES = frozenset(
+    {"", "na", "n/a", "n.a.", "nd", "n.d.", "null", "none", "nan", "-", "--"}
+)
+BOOLEAN_VALUES = frozenset({"true", "false", "vero", "falso", "yes", "si", "sì", "no"})
+
+_NUMBER_START = frozenset("+-.0123456789")
+_DECIMAL_COMMA = re.compile(r"^[+-]?(\d{1,3}(\.\d{3})+|\d+),\d+$")
+_ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})([T ][\d:.]+(Z|[+-]\d{2}:?\d{2})?)?$")
+_DMY_DATE = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})$")
+
+
+def parse_number(text: str) -> int | float | None:
+    """Parse an integer or decimal, accepting decimal commas; None if not numeric."""
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        value = float(text)
+        return value if math.isfinite(value) else None
+    except ValueError:
+        pass
+    if _DECIMAL_COMMA.match(text):
+        return float(text.replace(".", "").replace(",", "."))
+    return None
+
+
+def parse_date(text: str) -> str | None:
+    """Normalise yyyy-mm-dd[Thh:mm...] or dd/mm/yyyy to ISO yyyy-mm-dd."""
+    match = _ISO_DATE.match(text)
+    if match:
+        year, month, day = match.group(1), match.group(2), match.group(3)
+    else:
+        match = _DMY_DATE.match(text)
+        if not match:
+            return None
+        day, month, year = match.group(1), match.group(2), match.group(3)
+    if not (1 <= int(month) <= 12 and 1 <= int(day) <= 31):
+        return None
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+class HyperLogLog:
+    """Cardinality sketch with 2^precision one-byte registers."""
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str):
+        h = int.from_bytes(
+            hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small sets
+        return round(estimate)
+
+
+class ColumnStats:
+    """Incremental statistics for one column."""
+
+    __slots__ = (
+        "name",
+        "count",
+        "nulls",
+        "kinds",
+        "min",
+        "max",
+        "total",
+        "min_date",
+        "max_date",
+        "min_length",
+        "max_length",
+        "_distinct",
+        "_hll",
+        "_sample",
+        "_numeric",
+        "_random",
+    )
+
+    def __init__(self, name: str, seed: int = 0):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.kinds = {"integer": 0, "number": 0, "boolean": 0, "date": 0, "string": 0}
+        self.min: float | None = None
+        self.max: float | None = None
+        self.total = 0.0
+        self.min_date: str | None = None
+        self.max_date: str | None = None
+        self.min_length: int | None = None
+        self.max_length: int | None = None
+        self._distinct: set[str] | None = set()
+        self._hll: HyperLogLog | None = None
+        self._sample: list[float] = []
+        self._numeric = 0
+        self._random = random.Random(f"{seed}:{name}")
+
+    def add(self, value: Any):
+        """Add one cell (CSV text or an already typed JSON value)."""
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if isinstance(value, bool):
+            self._add_distinct(str(value).lower())
+            self.kinds["boolean"] += 1
+            return
+        if isinstance(value, (int, float)):
+            self._add_distinct(repr(value))
+            if isinstance(value, float) and not math.isfinite(value):
+                self.kinds["string"] += 1
+                return
+            self._add_number(value)
+            return
+
+        text = str(value).strip()
+        short = len(text) <= 5 and text.lower()
+        if short in NULL_VALUES:
+            self.nulls += 1
+            return
+        self._add_distinct(text)
+
+        # Once a column holds free text its type is settled: skip parsing
+        if not self.kinds["string"]:
+            if text[0] in _NUMBER_START:
+                number = parse_number(text)
+                if number is not None:
+                    self._add_number(number)
+                    return
+                date = parse_date(text)
+                if date is not None:
+                    self.kinds["date"] += 1
+                    if self.min_date is None or date < self.min_date:
+                        self.min_date = date
+                    if self.max_date is None or date > self.max_date:
+                        self.max_date = date
+                    return
+            elif short in BOOLEAN_VALUES:
+                self.kinds["boolean"] += 1
+                return
+
+        self.kinds["string"] += 1
+        length = len(text)
+        if self.min_length is None or length < self.min_length:
+            self.min_length = length
+        if self.max_length is None or length > self.max_length:
+            self.max_length = length
+
+    def _add_number(self, number: int | float):
+        self.kinds["integer" if isinstance(number, int) else "number"] += 1
+        if self.min is None or number < self.min:
+            self.min = number
+        if self.max is None or number > self.max:
+            self.max = number
+        self.total += number
+
+        # Reservoir sampling (Algorithm R) for quantiles
+        self._numeric += 1
+        if len(self._sample) < RESERVOIR_SIZE:
+            self._sample.append(number)
+        else:
+            j = self._random.randrange(self._numeric)
+            if j < RESERVOIR_SIZE:
+                self._sample[j] = number
+
+    def _add_distinct(self, text: str):
+        if self._distinct is not None:
+            self._distinct.add(text)
+            if len(self._distinct) > DISTINCT_EXACT_LIMIT:
+                # Switch to the sketch once exact tracking gets expensive
+                self._hll = HyperLogLog()
+                for seen in self._distinct:
+                    self._hll.add(seen)
+                self._distinct = None
+        else:
+            self._hll.add(text)
+
+    @property
+    def inferred_type(self) -> str:
+        """Most specific type that fits every non-null value."""
+        present = {kind for kind, n in self.kinds.items() if n}
+        if not present:
+            return "empty"
+        if present == {"integer"}:
+            return "integer"
+        if present <= {"integer", "number"}:
+            return "number"
+        if len(present) == 1:
+            return present.pop()
+        return "string"
+
+    def quantiles(self) -> dict[str, float]:
+        """Approximate quantiles of the numeric values (exact below RESERVOIR_SIZE)."""
+        if not self._sample:
+            return {}
+        ordered = sorted(self._sample)
+        last = len(ordered) - 1
+        result = {}
+        for q in QUANTILES:
+            position = q * last
+            lower = math.floor(position)
+            upper = min(lower + 1, last)
+            fraction = position - lower
+            result[f"p{round(q * 100)}"] = (
+                ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+            )
+        return result
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serializable summary."""
+        inferred = self.inferred_type
+        summary: dict[str, Any] = {
+            "name": self.name,
+            "type": inferred,
+            "count": self.count,
+            "nulls": self.nulls,
+            "null_rate": self.nulls / self.count if self.count else 0.0,
+            "distinct": len(self._distinct) if self._distinct is not None else self._hll.count(),
+            "distinct_exact": self._distinct is not None,
+            "kinds": {kind: n for kind, n in self.kinds.items() if n},
+        }
+        if inferred in ("integer", "number"):
+            summary["min"] = self.min
+            summary["max"] = self.max
+            summary["mean"] = self.total / self._numeric
+            summary["quantiles"] = self.quantiles()
+        elif inferred == "date":
+            summary["min"] = self.min_date
+            summary["max"] = self.max_date
+        elif inferred == "string":
+            summary["min_length"] = self.min_length
+            summary["max_length"] = self.max_length
+        return summary
+
+
+class TableProfile:
+    """Column statistics over a stream of CSV rows or DataStore records."""
+
+    def __init__(self, names: list[str], seed: int = 0):
+        self.columns = [ColumnStats(name, seed) for name in names]
+        self.rows = 0
+
+    def add_row(self, row: list[Any]):
+        """Add one positional row (extra or missing cells are ignored)."""
+        for stats, value in zip(self.columns, row):
+            stats.add(value)
+        self.rows += 1
+
+    def add_records(self, records: list[dict[str, Any]]):
+        """Add a page of records keyed by column name."""
+        for record in records:
+            for stats in self.columns:
+                stats.add(record.get(stats.name))
+        self.rows += len(records)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Row count plus per-column summaries."""
+        return {"rows": self.rows, "columns": [stats.to_dict() for stats in self.columns]}
+
+
+def sniff_encoding(head: bytes) -> str:
+    """BOM, then strict UTF-8, then cp1252 (common in Windows exports)."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # final=False tolerates a multi-byte character cut at the chunk end
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def sniff_dialect(sample: str) -> type[csv.Dialect]:
+    """Detect delimiter and quoting, falling back to the most frequent delimiter."""
+    # Only complete lines, so a cut record does not confuse the sniffer
+    if "\n" in sample:
+        sample = sample[: sample.rindex("\n") + 1]
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS)
+    except csv.Error:
+        first_line = sample.split("\n", 1)[0]
+
+        class Fallback(csv.excel):
+            delimiter = max(DELIMITERS, key=first_line.count)
+
+        return Fallback
+
+
+class _PrefixedStream(io.RawIOBase):
+    """Replays the sniffed head, then continues reading the source."""
+
+    def __init__(self, head: bytes, stream: BinaryIO, max_bytes: int | None = None):
+        self._head = memoryview(head)
+        self._stream = stream
+        self._remaining = max_bytes
+        self.bytes_read = 0
+        self.exhausted = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = len(buffer)
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+            if size <= 0:
+                return 0
+        if self._head:
+            data = self._head[:size]
+            self._head = self._head[len(data) :]
+        else:
+            data = self._stream.read(size)
+            if not data:
+                self.exhausted = True
+        n = len(data)
+        buffer[:n] = data
+        self.bytes_read += n
+        if self._remaining is not None:
+            self._remaining -= n
+        return n
+
+
+def open_source(source: str) -> BinaryIO:
+    """Binary stream for an http(s)/file URL or a local path."""
+    if "://" not in source:
+        return open(source, "rb")
+    request = urllib.request.Request(source, headers={"User-Agent": USER_AGENT})
+    return urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT)
+
+
+def profile_stream(
+    stream: BinaryIO,
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Profile CSV data read from a binary stream; the first row is the header."""
+    head = stream.read(SNIFF_BYTES)
+    encoding = sniff_encoding(head)
+    dialect = sniff_dialect(head.decode(encoding, errors="replace"))
+
+    if max_bytes is not None:
+        head = head[:max_bytes]
+    raw = _PrefixedStream(head, stream, max_bytes)
+    text = io.TextIOWrapper(
+        io.BufferedReader(raw, CHUNK_SIZE), encoding=encoding, errors="replace", newline=""
+    )
+    reader = csv.reader(text, dialect)
+
+    header = next(reader, [])
+    names = [
+        name.strip() or f"column_{i + 1}" for i, name in enumerate(header)
+    ]
+    table = TableProfile(names, seed)
+    width = len(names)
+
+    ragged = 0
+    previous: list[str] | None = None
+    complete = True
+    for row in reader:
+        # One row of lag, so a row cut by max_bytes can be dropped
+        if previous is not None:
+            if len(previous) != width:
+                ragged += 1
+            table.add_row(previous)
+            if max_rows is not None and table.rows >= max_rows:
+                previous = None
+                complete = False
+                break
+        previous = row if row else None
+
+    if previous is not None:
+        if raw.exhausted or max_bytes is None:
+            if len(previous) != width:
+                ragged += 1
+            table.add_row(previous)
+        else:
+            complete = False  # Last row was cut at max_bytes
+    if max_bytes is not None and not raw.exhausted:
+        complete = False
+
+    return {
+        "encoding": encoding,
+        "delimiter": dialect.delimiter,
+        "quotechar": dialect.quotechar,
+        "bytes_read": raw.bytes_read,
+        "complete": complete,
+        "ragged_rows": ragged,
+        **table.to_dict(),
+    }
+
+
+def profile_csv(
+    source: str,
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Download (streaming) and profile a CSV from a URL or local path."""
+    with open_source(source) as stream:
+        profile = profile_stream(stream, max_rows=max_rows, max_bytes=max_bytes, seed=seed)
+    return {"source": source, **profile}
+
+
+def main():
+    """Profile one CSV and print the profile as JSON."""
+    parser = argparse.ArgumentParser(description="Streaming CSV profiler")
+    parser.add_argument("source", help="http(s)/file URL or local path")
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--max-bytes", type=int, default=None)
+    args = parser.parse_args()
+
+    profile = profile_csv(args.source, max_rows=args.max_rows, max_bytes=args.max_bytes)
+    print(json.dumps(profile, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
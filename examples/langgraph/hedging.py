@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Deadlines, Hedged Requests and Retry Budgets for Tool Calls
+
+A few slow portal responses set the workflows' p99: a node awaiting one
+call_tool stalls until the portal answers, however long that takes.
+HedgedSession wraps a session with:
+
+- A deadline per tool (TOOL_DEADLINES); a call that exceeds it raises
+  ToolDeadlineExceeded instead of hanging the graph
+- Hedging: once a tool has MIN_SAMPLES latencies, a call still running
+  after that tool's p95 gets a duplicate request, and whichever answers
+  first wins (CKAN tools are read-only, so duplicates are safe)
+- Retries of transport failures and 429/5xx/timeout results, with full
+  jitter exponential backoff
+- A global RetryBudget: every call deposits RETRY_RATIO of a token,
+  every retry spends one. During an outage retries stop at roughly
+  RETRY_RATIO of the traffic instead of multiplying it. Hedges draw on a
+  separate budget (HEDGE_RATIO), so they never take a retry's token
+- A call abandoned at its deadline is cancelled with DEADLINE_EXCEEDED,
+  which LimitedSession counts as overload
+
+Usage:
+    hedged = HedgedSession(LimitedSession(session, limiters, CKAN_SERVER))
+    tools = CachedSession(CoalescingSession(hedged), cache)
+    ...
+    print(hedged.stats())
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any
+
+from mcp.types import CallToolResult
+
+from adaptive_limiter import DEADLINE_EXCEEDED, is_overload
+from session_pool import is_transport_error
+from tool_cache import is_error
+from tracing import current_span, percentile
+
+# Configuration
+DEFAULT_DEADLINE = 60.0  # Seconds, for tools not listed in TOOL_DEADLINES
+TOOL_DEADLINES = {
+    "ckan_package_search": 30.0,
+    "ckan_package_show": 15.0,
+    "ckan_datastore_search": 30.0,
+    "ckan_datastore_search_sql": 60.0,
+    "ckan_status_show": 10.0,
+}
+HEDGE_PERCENTILE = 95
+MIN_SAMPLES = 20  # Latencies per tool before hedging starts
+MIN_HEDGE_DELAY = 0.05  # Seconds; never hedge sooner than this
+LATENCY_WINDOW = 256  # Recent latencies kept per tool
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5  # Seconds; attempt n sleeps uniform(0, BACKOFF_BASE * 2**n)
+BACKOFF_MAX = 8.0
+RETRY_RATIO = 0.1  # Retry tokens earned per call
+RETRY_BUDGET_MAX = 10.0  # Token cap (and initial balance)
+HEDGE_RATIO = 0.05  # Hedge tokens earned per call
+HEDGE_BUDGET_MAX = 5.0
+
+
+class ToolDeadlineExceeded(TimeoutError):
+    """A tool call did not finish within its deadline."""
+
+
+class RetryBudget:
+    """Token bucket shared by all retries (or all hedges) of a session."""
+
+    def __init__(self, ratio: float = RETRY_RATIO, max_tokens: float = RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.spent = 0
+        self.denied = 0
+
+    def deposit(self):
+        """Credit one original call."""
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend a token on a retry or hedge; False when the budget is empty."""
+        if self.tokens < 1:
+            self.denied += 1
+            return False
+        self.tokens -= 1
+        self.spent += 1
+        return True
+
+
+def _retryable(outcome: CallToolResult | BaseException) -> bool:
+    if isinstance(outcome, BaseException):
+        return isinstance(outcome, TimeoutError) or is_transport_error(outcome)
+    return is_overload(outcome)
+
+
+class HedgedSession:
+    """Wraps a ClientSession with per-tool deadlines, hedging and budgeted retries."""
+
+    def __init__(
+        self,
+        session,
+        budget: RetryBudget | None = None,
+        hedge_budget: RetryBudget | None = None,
+        deadlines: dict[str, float] | None = None,
+        hedging: bool = True,
+    ):
+        self.session = session
+        self.budget = budget or RetryBudget()
+        self.hedge_budget = hedge_budget or RetryBudget(HEDGE_RATIO, HEDGE_BUDGET_MAX)
+        self.deadlines = TOOL_DEADLINES if deadlines is None else deadlines
+        self.hedging = hedging
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.deadline_misses = 0
+        self._latencies: dict[str, deque[float]] = {}
+
+    def hedge_delay(self, name: str) -> float | None:
+        """Seconds before a call to `name` is hedged; None until enough samples."""
+        samples = self._latencies.get(name)
+        if not self.hedging or samples is None or len(samples) < MIN_SAMPLES:
+            return None
+        return max(MIN_HEDGE_DELAY, percentile(sorted(samples), HEDGE_PERCENTILE))
+
+    async def call_tool(
+        self, name: str, arguments: dict[str, Any] | None = None, **kwargs
+    ) -> CallToolResult:
+        """Call with a deadline, hedging slow attempts and retrying failed ones."""
+        timeout = self.deadlines.get(name, DEFAULT_DEADLINE)
+        deadline = time.monotonic() + timeout
+        self.calls += 1
+        self.budget.deposit()
+        self.hedge_budget.deposit()
+
+        attempt = 0
+        while True:
+            try:
+                outcome = await self._hedged(name, arguments, kwargs, deadline)
+            except ToolDeadlineExceeded:
+                self.deadline_misses += 1
+                raise ToolDeadlineExceeded(f"{name} exceeded its {timeout:g}s deadline") from None
+            except Exception as e:
+                outcome = e
+
+            if not _retryable(outcome):
+                break
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+            if (
+                attempt >= MAX_RETRIES
+                or time.monotonic() + delay >= deadline
+                or not self.budget.withdraw()
+            ):
+                break
+            attempt += 1
+            self.retries += 1
+            span = current_span()
+            if span is not None:
+                span.retries += 1
+            await asyncio.sleep(delay)
+
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    async def _hedged(
+        self,
+        name: str,
+        arguments: dict[str, Any] | None,
+        kwargs: dict[str, Any],
+        deadline: float,
+    ) -> CallToolResult:
+        """One attempt, plus a duplicate if it is slower than the tool's p95."""
+        attempts = {asyncio.ensure_future(self._timed(name, arguments, kwargs))}
+        hedge = None
+        reason = None
+        try:
+            delay = self.hedge_delay(name)
+            if delay is not None and time.monotonic() + delay < deadline:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and self.hedge_budget.withdraw():
+                    self.hedges += 1
+                    span = current_span()
+                    if span is not None:
+                        span.attrs["hedged"] = True
+                    hedge = asyncio.ensure_future(self._timed(name, arguments, kwargs))
+                    attempts.add(hedge)
+
+            while True:
+                done, _ = await asyncio.wait(
+                    attempts,
+                    timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Tells the limiter below that the portal was too slow, not that we lost interest
+                    reason = DEADLINE_EXCEEDED
+                    raise ToolDeadlineExceeded(name)
+                for task in done:
+                    attempts.discard(task)
+                    failed = task.exception() is not None or is_overload(task.result())
+                    # A failed attempt only counts if no other attempt is left
+                    if not failed or not attempts:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+        finally:
+            for task in attempts:
+                task.cancel(reason)
+
+    async def _timed(
+        self, name: str, arguments: dict[str, Any] | None, kwargs: dict[str, Any]
+    ) -> CallToolResult:
+        started = time.monotonic()
+        # Cancelled losers are not recorded: their elapsed time is only when the winner
+        # answered, and counting it would ratchet the p95 (and the hedge delay) upwards
+        result = await self.session.call_tool(name, arguments=arguments, **kwargs)
+        if not is_error(result):
+            self._record(name, time.monotonic() - started)
+        return result
+
+    def _record(self, name: str, seconds: float):
+        self._latencies.setdefault(name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def stats(self) -> dict[str, Any]:
+        """Calls, hedges, retries and the current hedge delay per tool."""
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "deadline_misses": self.deadline_misses,
+            "budget_tokens": round(self.budget.tokens, 2),
+            "budget_denied": self.budget.denied,
+            "hedge_budget_tokens": round(self.hedge_budget.tokens, 2),
+            "hedge_budget_denied": self.hedge_budget.denied,
+            "hedge_delay_s": {
+                name: round(delay, 4)
+                for name in self._latencies
+                if (delay := self.hedge_delay(name)) is not None
+            },
+        }
+
+    def __getattr__(self, name: str):
+        # Delegate everything else (initialize, list_tools, ...) to the session
+        return getattr(self.session, name)
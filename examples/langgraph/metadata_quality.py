@@ -11,9 +11,24 @@ Advanced quality scoring system based on:
 Score: 0-100 points
 """
 
-from datetime import datetime
+import heapq
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
+try:
+    import numpy as np
+except ImportError:  # Optional: only needed for score_batch() and score_tables()
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # Optional: only needed for score_tables()
+    pa = pc = None
+
+OPEN_FORMATS = {"CSV", "JSON", "GEOJSON", "XML", "RDF", "JSONLD"}
+
 
 class MetadataQualityScorer:
     """Calculate metadata quality score for CKAN datasets."""
@@ -24,19 +39,58 @@ class MetadataQualityScorer:
     ACCEPTABLE = 40
     POOR = 0
 
+    # Highest value each sub-score can actually reach (bounds for score_at_least)
+    MAX_SUBSCORES = {"completeness": 30, "richness": 25, "resources": 32, "freshness": 10}
+
+    # Scoring rules, read by the per-dataset helpers and by the vectorised
+    # score_batch()/score_tables() alike, so the two cannot drift apart.
+    # Completeness: (fields, any of which must be set, points, issue)
+    COMPLETENESS_FIELDS = (
+        (("title",), 5, "Missing title"),
+        (("notes",), 5, "Missing description"),
+        (("name",), 5, "Missing identifier"),
+        (("license_id",), 3, "Missing license"),
+        (("author", "maintainer"), 3, "Missing author/maintainer"),
+        (("author_email", "maintainer_email"), 3, "Missing contact email"),
+        (("organization",), 3, "Not assigned to organization"),
+    )
+    GEO_KEYS = ("spatial", "geographic_coverage")  # Extras keys
+    GEO_POINTS = 3
+    # Richness: (minimum, points) tiers, best first
+    NOTES_TIERS = ((201, 10), (101, 5), (1, 2))  # Description length
+    TAG_TIERS = ((5, 10), (3, 6), (1, 3))
+    TEMPORAL_KEYS = ("temporal_start", "temporal_end")
+    TEMPORAL_POINTS = 3
+    FREQUENCY_KEYS = ("frequency", "update_frequency")
+    FREQUENCY_POINTS = 2
+    # Resources
+    RESOURCE_POINTS = 5  # At least one resource
+    OPEN_FORMAT_POINTS = 10
+    CSV_POINTS = 2
+    DATASTORE_POINTS = 5
+    ALL_RESOURCES_POINTS = 5  # Descriptions or valid URLs on every resource
+    SOME_RESOURCES_POINTS = 2  # ... on some of them
+    # Freshness: (days old below, points) tiers, newest first; older gets STALE_POINTS
+    FRESHNESS_TIERS = ((90, 10), (180, 7), (365, 5), (730, 3))
+    STALE_POINTS = 1
+
     @classmethod
-    def score_dataset(cls, dataset: dict[str, Any]) -> dict[str, Any]:
+    def score_dataset(
+        cls, dataset: dict[str, Any], now: datetime | None = None
+    ) -> dict[str, Any]:
         """
         Calculate comprehensive quality score.
 
+        `now` is the reference time for freshness (defaults to current time).
+
         Returns:
             {
                 "score": 75,              # Total score 0-100
                 "level": "good",          # excellent/good/acceptable/poor
                 "breakdown": {
                     "completeness": 20,   # out of 30
-                    "richness": 15,       # out of 30
-                    "resources": 25,      # out of 30
+                    "richness": 15,       # out of 25
+                    "resources": 25,      # out of 32
                     "freshness": 8        # out of 10
                 },
                 "issues": ["Missing license", ...]
@@ -47,7 +101,7 @@ class MetadataQualityScorer:
             "completeness": cls._score_completeness(dataset, issues),
             "richness": cls._score_richness(dataset, issues),
             "resources": cls._score_resources(dataset, issues),
-            "freshness": cls._score_freshness(dataset, issues),
+            "freshness": cls._score_freshness(dataset, issues, now),
         }
 
         total_score = sum(breakdown.values())
@@ -61,179 +115,568 @@ class MetadataQualityScorer:
         }
 
     @classmethod
-    def _score_completeness(cls, dataset: dict, issues: list) -> int:
-        """Score 0-30: Required and recommended fields."""
-        score = 0
+    def score_at_least(
+        cls, dataset: dict[str, Any], threshold: int, now: datetime | None = None
+    ) -> dict[str, Any] | None:
+        """
+        Score a dataset, giving up once it can no longer reach `threshold`.
+
+        Sub-scores are computed cheapest first (one date parse, field checks,
+        tags/extras, then the passes over resources); after each one, the score so
+        far plus the maximum of the remaining sub-scores is an upper bound,
+        and the dataset is rejected (None) as soon as that bound drops below
+        the threshold. Otherwise returns score_dataset()'s score, level and
+        breakdown; issues are not collected (see explain()).
+        """
+        bound = sum(cls.MAX_SUBSCORES.values())
+        if bound < threshold:
+            return None
+
+        freshness = cls._score_freshness(dataset, None, now)
+        bound -= cls.MAX_SUBSCORES["freshness"] - freshness
+        if bound < threshold:
+            return None
+        completeness = cls._score_completeness(dataset, None)
+        bound -= cls.MAX_SUBSCORES["completeness"] - completeness
+        if bound < threshold:
+            return None
+        richness = cls._score_richness(dataset, None)
+        bound -= cls.MAX_SUBSCORES["richness"] - richness
+        if bound < threshold:
+            return None
+        resources = cls._score_resources(dataset, None)
+        total = freshness + completeness + richness + resources
+        if total < threshold:
+            return None
 
-        # Required fields (15 points)
-        if dataset.get("title"):
-            score += 5
-        else:
-            issues.append("Missing title")
+        return {
+            "score": total,
+            "level": cls._get_level(total),
+            "breakdown": {
+                "completeness": completeness,
+                "richness": richness,
+                "resources": resources,
+                "freshness": freshness,
+            },
+        }
 
-        if dataset.get("notes"):  # Description
-            score += 5
-        else:
-            issues.append("Missing description")
+    @classmethod
+    def explain(cls, dataset: dict[str, Any], now: datetime | None = None) -> list[str]:
+        """Issues of one dataset, for callers of the pruned paths that need them."""
+        return cls.score_dataset(dataset, now)["issues"]
 
-        if dataset.get("name"):  # Identifier
-            score += 5
-        else:
-            issues.append("Missing identifier")
+    @classmethod
+    def filter_datasets(
+        cls,
+        datasets: Iterable[dict[str, Any]],
+        threshold: int,
+        now: datetime | None = None,
+    ) -> Iterator[tuple[dict[str, Any], dict[str, Any]]]:
+        """Yield (dataset, quality) for datasets scoring at least `threshold`."""
+        for dataset in datasets:
+            quality = cls.score_at_least(dataset, threshold, now)
+            if quality is not None:
+                yield dataset, quality
 
-        # Recommended fields (15 points)
-        if dataset.get("license_id"):
-            score += 3
-        else:
-            issues.append("Missing license")
+    @classmethod
+    def top_k(
+        cls,
+        datasets: Iterable[dict[str, Any]],
+        k: int,
+        threshold: int = 0,
+        now: datetime | None = None,
+    ) -> list[tuple[dict[str, Any], dict[str, Any]]]:
+        """
+        Best `k` datasets scoring at least `threshold`, highest first.
 
-        if dataset.get("author") or dataset.get("maintainer"):
-            score += 3
-        else:
-            issues.append("Missing author/maintainer")
+        A min-heap holds the best k so far; once it is full, its lowest
+        score raises the pruning threshold, so most datasets are rejected
+        after one or two sub-scores. Ties keep input order, as a stable
+        sort by score would.
+        """
+        if k <= 0:
+            return []
+        heap: list[tuple[int, int, dict[str, Any], dict[str, Any]]] = []
+        for index, dataset in enumerate(datasets):
+            # A later dataset must beat the heap's minimum outright to replace it
+            bound = max(threshold, heap[0][0] + 1) if len(heap) == k else threshold
+            quality = cls.score_at_least(dataset, bound, now)
+            if quality is None:
+                continue
+            entry = (quality["score"], -index, quality, dataset)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heapreplace(heap, entry)
 
-        if dataset.get("author_email") or dataset.get("maintainer_email"):
-            score += 3
-        else:
-            issues.append("Missing contact email")
+        return [(dataset, quality) for _, _, quality, dataset in sorted(heap, reverse=True)]
 
-        # Organization
-        if dataset.get("organization"):
-            score += 3
-        else:
-            issues.append("Not assigned to organization")
+    # The sub-scores append to `issues` unless it is None (the pruned paths skip them)
+
+    @classmethod
+    def _score_completeness(cls, dataset: dict, issues: list | None) -> int:
+        """Score 0-30: Required and recommended fields."""
+        score = 0
+
+        # Required fields (15 points), recommended fields and organization (12 points)
+        get = dataset.get
+        for fields, points, issue in cls.COMPLETENESS_FIELDS:
+            for field in fields:
+                if get(field):
+                    score += points
+                    break
+            else:
+                if issues is not None:
+                    issues.append(issue)
 
         # Geographical coverage
-        if dataset.get("extras"):
-            has_geo = any(
-                e.get("key") in ["spatial", "geographic_coverage"]
-                for e in dataset.get("extras", [])
-            )
-            if has_geo:
-                score += 3
+        for e in dataset.get("extras") or ():
+            if e.get("key") in cls.GEO_KEYS:
+                score += cls.GEO_POINTS
+                break
 
         return score
 
     @classmethod
-    def _score_richness(cls, dataset: dict, issues: list) -> int:
-        """Score 0-30: Richness of metadata."""
+    def _score_richness(cls, dataset: dict, issues: list | None) -> int:
+        """Score 0-25: Richness of metadata."""
         score = 0
 
         # Description quality (10 points)
-        notes = dataset.get("notes", "")
-        if len(notes) > 200:
-            score += 10
-        elif len(notes) > 100:
-            score += 5
-        elif len(notes) > 0:
-            score += 2
+        notes_len = len(dataset.get("notes", ""))
+        for minimum, points in cls.NOTES_TIERS:
+            if notes_len >= minimum:
+                score += points
+                break
         else:
-            issues.append("Very short or missing description")
+            if issues is not None:
+                issues.append("Very short or missing description")
 
         # Tags (10 points)
-        tags = dataset.get("tags", [])
-        num_tags = len(tags)
-        if num_tags >= 5:
-            score += 10
-        elif num_tags >= 3:
-            score += 6
-        elif num_tags >= 1:
-            score += 3
+        num_tags = len(dataset.get("tags", []))
+        for minimum, points in cls.TAG_TIERS:
+            if num_tags >= minimum:
+                score += points
+                break
         else:
-            issues.append("No tags")
+            if issues is not None:
+                issues.append("No tags")
 
-        # Temporal coverage (5 points)
+        # Temporal coverage and update frequency
         extras = {e.get("key"): e.get("value") for e in dataset.get("extras", [])}
-        if "temporal_start" in extras or "temporal_end" in extras:
-            score += 3
-
-        # Frequency/update schedule (5 points)
-        if extras.get("frequency") or extras.get("update_frequency"):
-            score += 2
+        for key in cls.TEMPORAL_KEYS:
+            if key in extras:
+                score += cls.TEMPORAL_POINTS
+                break
+        for key in cls.FREQUENCY_KEYS:
+            if extras.get(key):
+                score += cls.FREQUENCY_POINTS
+                break
 
         return score
 
     @classmethod
-    def _score_resources(cls, dataset: dict, issues: list) -> int:
-        """Score 0-30: Resources quality."""
-        score = 0
+    def _score_resources(cls, dataset: dict, issues: list | None) -> int:
+        """Score 0-32: Resources quality."""
         resources = dataset.get("resources", [])
 
         if not resources:
-            issues.append("No resources")
+            if issues is not None:
+                issues.append("No resources")
             return 0
 
-        # At least one resource (5 points)
-        score += 5
+        # At least one resource
+        score = cls.RESOURCE_POINTS
 
-        # Check formats (10 points)
+        # Open formats, with a bonus for CSV
         formats = {r.get("format", "").upper() for r in resources}
-        open_formats = {"CSV", "JSON", "GEOJSON", "XML", "RDF", "JSONLD"}
-        if formats & open_formats:
-            score += 10
+        if formats & OPEN_FORMATS:
+            score += cls.OPEN_FORMAT_POINTS
             if "CSV" in formats:
-                score += 2  # Bonus for CSV
-        else:
+                score += cls.CSV_POINTS
+        elif issues is not None:
             issues.append("No open formats (CSV/JSON/XML)")
 
-        # Resource descriptions (5 points)
+        # Resource descriptions
         described = sum(1 for r in resources if r.get("description"))
         if described == len(resources):
-            score += 5
+            score += cls.ALL_RESOURCES_POINTS
         elif described > 0:
-            score += 2
+            score += cls.SOME_RESOURCES_POINTS
 
-        # DataStore availability (5 points)
-        has_datastore = any(r.get("datastore_active") for r in resources)
-        if has_datastore:
-            score += 5
+        # DataStore availability
+        if any(r.get("datastore_active") for r in resources):
+            score += cls.DATASTORE_POINTS
 
-        # URLs validity (5 points)
+        # URLs validity
         valid_urls = sum(
             1 for r in resources if r.get("url") and r["url"].startswith("http")
         )
         if valid_urls == len(resources):
-            score += 5
+            score += cls.ALL_RESOURCES_POINTS
         elif valid_urls > 0:
-            score += 2
-        else:
+            score += cls.SOME_RESOURCES_POINTS
+        elif issues is not None:
             issues.append("Invalid or missing resource URLs")
 
         return score
 
     @classmethod
-    def _score_freshness(cls, dataset: dict, issues: list) -> int:
+    def _score_freshness(
+        cls, dataset: dict, issues: list | None, now: datetime | None = None
+    ) -> int:
         """Score 0-10: Temporal freshness."""
         score = 0
 
         # Check metadata_modified
         modified_str = dataset.get("metadata_modified")
         if not modified_str:
-            issues.append("No last modified date")
+            if issues is not None:
+                issues.append("No last modified date")
             return 0
 
         try:
-            modified = datetime.fromisoformat(modified_str.replace("Z", "+00:00"))
-            now = datetime.now(modified.tzinfo)
-            days_old = (now - modified).days
-
-            if days_old < 90:  # < 3 months
-                score = 10
-            elif days_old < 180:  # < 6 months
-                score = 7
-            elif days_old < 365:  # < 1 year
-                score = 5
-            elif days_old < 730:  # < 2 years
-                score = 3
+            days_old = cls._days_since(modified_str, now)
+
+            for max_days, points in cls.FRESHNESS_TIERS:
+                if days_old < max_days:
+                    score = points
+                    break
             else:
-                score = 1
-                issues.append(f"Last updated {days_old} days ago")
+                score = cls.STALE_POINTS
+                if issues is not None:
+                    issues.append(f"Last updated {days_old} days ago")
 
         except (ValueError, AttributeError):
-            issues.append("Invalid date format")
+            if issues is not None:
+                issues.append("Invalid date format")
 
         return score
 
+    @staticmethod
+    def _days_since(modified_str: str, now: datetime | None = None) -> int:
+        """Whole days between metadata_modified and the reference time."""
+        modified = datetime.fromisoformat(modified_str.replace("Z", "+00:00"))
+        if now is None:
+            now = datetime.now(modified.tzinfo)
+        elif modified.tzinfo is None and now.tzinfo is not None:
+            now = now.astimezone().replace(tzinfo=None)  # Compare in local time
+        elif modified.tzinfo is not None and now.tzinfo is None:
+            now = now.astimezone()
+        return (now - modified).days
+
+    @classmethod
+    def score_batch(
+        cls, datasets: list[dict[str, Any]], now: datetime | None = None
+    ) -> dict[str, Any]:
+        """
+        Score many datasets at once with NumPy.
+
+        Datasets are flattened into columnar arrays in a single pass, then the
+        four sub-scores are computed as array operations. Totals and levels
+        match score_dataset(); issues are not collected.
+
+        Reading the fields out of nested dicts is still a Python loop and
+        takes most of the time, so it is 1.1-1.8x faster than score_dataset()
+        depending on the machine. For a harvested catalog, score_tables()
+        reads the Parquet tables' columns directly and skips that loop.
+
+        Returns:
+            {
+                "score": ndarray,          # Total score per dataset
+                "level": [...],            # Quality level per dataset
+                "breakdown": {
+                    "completeness": ndarray,
+                    "richness": ndarray,
+                    "resources": ndarray,
+                    "freshness": ndarray
+                }
+            }
+        """
+        if np is None:
+            raise ImportError("score_batch() requires numpy: pip install numpy")
+
+        if now is None:
+            now = datetime.now()
+        return cls._score_columns(cls._to_columns(datasets, now))
+
+    @classmethod
+    def score_tables(
+        cls, packages: "pa.Table", resources: "pa.Table", now: datetime | None = None
+    ) -> dict[str, Any]:
+        """
+        Score a harvested catalog straight from its Arrow tables.
+
+        `packages` and `resources` are CatalogStore.tables() (see
+        catalog_harvester.py). The columns are read with Arrow compute and
+        NumPy, with no Python loop per package, and scored like score_batch().
+        Results are in `packages` row order and match score_dataset() on
+        CatalogStore.datasets().
+        """
+        if np is None or pa is None:
+            raise ImportError("score_tables() requires numpy and pyarrow: pip install numpy pyarrow")
+
+        if now is None:
+            now = datetime.now()
+        n = packages.num_rows
+
+        def field_present(field: str) -> "np.ndarray":
+            if field == "organization":
+                # DatasetRecord.get("organization") is a dict once either part is set
+                return _to_numpy(
+                    pc.or_(
+                        pc.is_valid(packages.column("organization_name")),
+                        pc.is_valid(packages.column("organization_title")),
+                    )
+                )
+            return _to_numpy(pc.not_equal(packages.column(field), ""), False)
+
+        fields = np.column_stack(
+            [
+                np.any([field_present(f) for f in names], axis=0)
+                for names, _, _ in cls.COMPLETENESS_FIELDS
+            ]
+        ).reshape(n, len(cls.COMPLETENESS_FIELDS))
+
+        # Extras as flat (package, key, value) columns
+        extras = packages.column("extras").combine_chunks()
+        owner = _to_numpy(pc.list_parent_indices(extras))
+        pairs = pc.list_flatten(extras)
+        keys = pc.list_element(pairs, 0)
+        values = pc.list_element(pairs, 1)
+        value_set = _to_numpy(pc.not_equal(values, ""), False)
+
+        def any_key(names: tuple[str, ...]) -> "np.ndarray":
+            found = np.zeros(n, dtype=bool)
+            found[owner[_to_numpy(pc.is_in(keys, value_set=pa.array(names)))]] = True
+            return found
+
+        has_frequency = np.zeros(n, dtype=bool)
+        for name in cls.FREQUENCY_KEYS:
+            # Like the dict built by _score_richness, the last value of a repeated key wins
+            mask = _to_numpy(pc.equal(keys, name), False)
+            last = np.zeros(n, dtype=bool)
+            last[owner[mask]] = value_set[mask]
+            has_frequency |= last
+
+        # Resources, counted per package row
+        package = _to_numpy(
+            pc.index_in(resources.column("package_id"), value_set=packages.column("id")), -1
+        )
+        known = package >= 0
+        package = package[known]
+        formats = pc.utf8_upper(pc.fill_null(resources.column("format"), ""))
+        open_formats = pa.array(sorted(OPEN_FORMATS))
+
+        def per_package(flags) -> "np.ndarray":
+            return np.bincount(package, weights=_to_numpy(flags)[known], minlength=n).astype(np.int64)
+
+        modified = packages.column("metadata_modified")
+        has_date, days_old = cls._days_column(modified, now)
+
+        return cls._score_columns(
+            {
+                "fields": fields,
+                "has_geo": any_key(cls.GEO_KEYS),
+                "has_temporal": any_key(cls.TEMPORAL_KEYS),
+                "has_frequency": has_frequency,
+                "notes_len": _to_numpy(pc.utf8_length(packages.column("notes")), 0),
+                "num_tags": _to_numpy(pc.list_value_length(packages.column("tags")), 0),
+                "num_resources": np.bincount(package, minlength=n),
+                "has_open_format": per_package(pc.is_in(formats, value_set=open_formats)) > 0,
+                "has_csv": per_package(pc.equal(formats, "CSV")) > 0,
+                "described": per_package(pc.fill_null(resources.column("has_description"), False)),
+                "has_datastore": per_package(pc.fill_null(resources.column("datastore_active"), False)) > 0,
+                "valid_urls": per_package(
+                    pc.starts_with(pc.fill_null(resources.column("url"), ""), "http")
+                ),
+                "has_date": has_date,
+                "days_old": days_old,
+            }
+        )
+
+    @classmethod
+    def _days_column(cls, modified: "pa.ChunkedArray", now: datetime) -> tuple:
+        """(has_date, days_old) arrays for a column of metadata_modified strings."""
+        modified = pc.if_else(pc.equal(modified, ""), None, modified)
+        has_date = _to_numpy(pc.is_valid(modified))
+        days_old = np.zeros(len(modified), dtype=np.int64)
+        if not has_date.any():
+            return has_date, days_old
+
+        # Fast path: all naive (compared in local time, as _days_since does) or all
+        # with an offset. Otherwise, or for other formats, parse each distinct value
+        if now.tzinfo is not None:
+            naive_now, aware_now = now.astimezone().replace(tzinfo=None), now
+        else:
+            naive_now, aware_now = now, now.astimezone()
+        for unit, reference in ((pa.timestamp("us"), naive_now), (pa.timestamp("us", "UTC"), aware_now)):
+            try:
+                stamps = pc.cast(modified, unit)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                continue
+            if reference.tzinfo is not None:
+                reference = reference.astimezone(timezone.utc).replace(tzinfo=None)
+            elapsed = (reference - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+            micros = _to_numpy(pc.cast(stamps, pa.int64()), elapsed)
+            # timedelta.days rounds down, as does floor division
+            return has_date, (elapsed - micros) // 86_400_000_000
+
+        encoded = modified.combine_chunks().dictionary_encode()
+        days = []
+        valid = []
+        for value in encoded.dictionary.to_pylist():
+            try:
+                days.append(cls._days_since(value, now))
+                valid.append(True)
+            except (ValueError, AttributeError):
+                days.append(0)
+                valid.append(False)
+        indices = _to_numpy(encoded.indices, 0)
+        has_date &= np.array(valid, dtype=bool)[indices]
+        days_old = np.where(has_date, np.array(days, dtype=np.int64)[indices], 0)
+        return has_date, days_old
+
+    @classmethod
+    def _score_columns(cls, cols: dict[str, Any]) -> dict[str, Any]:
+        """Sub-scores, totals and levels from the columns of _to_columns()/score_tables()."""
+
+        def tiers(values, table):
+            return np.select([values >= minimum for minimum, _ in table], [p for _, p in table], 0)
+
+        def share(count, total):
+            return np.select(
+                [count == total, count > 0],
+                [cls.ALL_RESOURCES_POINTS, cls.SOME_RESOURCES_POINTS],
+                0,
+            )
+
+        points = np.array([p for _, p, _ in cls.COMPLETENESS_FIELDS], dtype=np.int64)
+        completeness = cols["fields"].astype(np.int64) @ points + cls.GEO_POINTS * cols["has_geo"]
+
+        richness = (
+            tiers(cols["notes_len"], cls.NOTES_TIERS)
+            + tiers(cols["num_tags"], cls.TAG_TIERS)
+            + cls.TEMPORAL_POINTS * cols["has_temporal"]
+            + cls.FREQUENCY_POINTS * cols["has_frequency"]
+        )
+
+        num_res = cols["num_resources"]
+        open_fmt = cols["has_open_format"]
+        resources = np.where(
+            num_res == 0,
+            0,
+            cls.RESOURCE_POINTS
+            + cls.OPEN_FORMAT_POINTS * open_fmt
+            + cls.CSV_POINTS * (open_fmt & cols["has_csv"])
+            + share(cols["described"], num_res)
+            + cls.DATASTORE_POINTS * cols["has_datastore"]
+            + share(cols["valid_urls"], num_res),
+        )
+
+        days = cols["days_old"]
+        freshness = np.where(
+            cols["has_date"],
+            np.select(
+                [days < max_days for max_days, _ in cls.FRESHNESS_TIERS],
+                [p for _, p in cls.FRESHNESS_TIERS],
+                cls.STALE_POINTS,
+            ),
+            0,
+        )
+
+        score = completeness + richness + resources + freshness
+        level = np.select(
+            [score >= cls.EXCELLENT, score >= cls.GOOD, score >= cls.ACCEPTABLE],
+            ["excellent", "good", "acceptable"],
+            "poor",
+        )
+
+        return {
+            "score": score,
+            "level": level.tolist(),
+            "breakdown": {
+                "completeness": completeness,
+                "richness": richness,
+                "resources": resources,
+                "freshness": freshness,
+            },
+        }
+
+    # Columns produced by _to_columns() besides the COMPLETENESS_FIELDS flags
+    _COLUMNS = (
+        "has_geo", "has_temporal", "has_frequency", "notes_len", "num_tags",
+        "num_resources", "has_open_format", "has_csv", "described",
+        "has_datastore", "valid_urls", "has_date", "days_old",
+    )
+
+    @classmethod
+    def _to_columns(
+        cls, datasets: list[dict[str, Any]], now: datetime
+    ) -> dict[str, Any]:
+        """Extract the fields read by the sub-scores into NumPy arrays."""
+        names = [field for fields, _, _ in cls.COMPLETENESS_FIELDS for field in fields]
+        rows = []
+        for ds in datasets:
+            extras_list = ds.get("extras", [])
+            extras = {e.get("key"): e.get("value") for e in extras_list}
+            resources = ds.get("resources", [])
+
+            # Single pass over resources
+            formats = set()
+            described = valid_urls = 0
+            has_datastore = False
+            for r in resources:
+                formats.add(r.get("format", "").upper())
+                if r.get("description"):
+                    described += 1
+                if r.get("datastore_active"):
+                    has_datastore = True
+                if r.get("url") and r["url"].startswith("http"):
+                    valid_urls += 1
+
+            days_old = 0
+            has_date = False
+            modified_str = ds.get("metadata_modified")
+            if modified_str:
+                try:
+                    days_old = cls._days_since(modified_str, now)
+                    has_date = True
+                except (ValueError, AttributeError):
+                    pass
+
+            rows.append(
+                (
+                    *map(bool, map(ds.get, names)),
+                    any(e.get("key") in cls.GEO_KEYS for e in extras_list or ()),
+                    not extras.keys().isdisjoint(cls.TEMPORAL_KEYS),
+                    any(map(extras.get, cls.FREQUENCY_KEYS)),
+                    len(ds.get("notes", "")),
+                    len(ds.get("tags", [])),
+                    len(resources),
+                    bool(formats & OPEN_FORMATS),
+                    "CSV" in formats,
+                    described,
+                    has_datastore,
+                    valid_urls,
+                    has_date,
+                    days_old,
+                )
+            )
+
+        table = np.array(rows, dtype=np.int64).reshape(len(rows), len(names) + len(cls._COLUMNS))
+        # A rule is met when any of its fields is set
+        present = dict(zip(names, table[:, : len(names)].T.astype(bool)))
+        cols = {
+            "fields": np.column_stack(
+                [np.logical_or.reduce([present[f] for f in fields]) for fields, _, _ in cls.COMPLETENESS_FIELDS]
+            ).reshape(len(rows), len(cls.COMPLETENESS_FIELDS))
+        }
+        for i, name in enumerate(cls._COLUMNS, len(names)):
+            column = table[:, i]
+            cols[name] = column.astype(bool) if name.startswith("has_") else column
+        return cols
+
     @classmethod
     def _get_level(cls, score: int) -> str:
         """Convert score to quality level."""
@@ -247,6 +690,15 @@ class MetadataQualityScorer:
             return "poor"
 
 
+def _to_numpy(values, fill=None) -> "np.ndarray":
+    """Arrow array or chunked array as NumPy, with nulls replaced by `fill`."""
+    if fill is not None:
+        values = pc.fill_null(values, fill)
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    return values.to_numpy(zero_copy_only=False)
+
+
 # Example usage
 if __name__ == "__main__":
     # Sample dataset
@@ -288,11 +740,7 @@ if __name__ == "__main__":
     print(f"Quality Level: {result['level'].upper()}")
     print(f"\nBreakdown:")
     for category, score in result["breakdown"].items():
-        print(
-            f"  {category.capitalize():15} {score:2}/30"
-            if category != "freshness"
-            else f"  {category.capitalize():15} {score:2}/10"
-        )
+        print(f"  {category.capitalize():15} {score:2}/{scorer.MAX_SUBSCORES[category]}")
     if result["issues"]:
         print(f"\nIssues ({len(result['issues'])}):")
         for issue in result["issues"]:
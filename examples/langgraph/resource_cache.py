@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Cache for Resource Downloads
+
+Keeps downloaded resource files on disk so daily workflows do not fetch
+the same multi-GB CSVs again:
+
+- Files are stored by SHA-256 of their content; URLs that serve identical
+  bytes share one file
+- Known URLs are revalidated with If-None-Match / If-Modified-Since; a 304
+  reuses the cached file without transferring it
+- A byte budget is enforced by evicting the least recently used files;
+  files handed out within the last EVICT_GRACE seconds are never evicted,
+  so a caller can still open or mmap the path it was just given
+- Cached files can be memory-mapped for the analysis stages
+- Concurrent fetches of one URL share a single download: in-process via a
+  shared task, across processes via a per-URL file lock (POSIX)
+
+Usage:
+    cache = ResourceCache("resource_cache", max_bytes=20 * 2**30)
+    resource = await cache.fetch(url)
+    with resource.mmap() as data:
+        profile = profile_stream(data)
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import io
+import mmap
+import os
+import sqlite3
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from typing import Any
+
+from tracing import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process single-flight
+    fcntl = None
+
+# Configuration
+MAX_CACHE_BYTES = 10 * 2**30  # 10 GiB
+REVALIDATE_AFTER = 3600  # Seconds a cached URL is trusted without revalidation
+EVICT_GRACE = 300  # Seconds after last use a file is safe from eviction (callers may still open it)
+CHUNK_SIZE = 1 << 20
+REQUEST_TIMEOUT = 60  # Seconds
+USER_AGENT = "ckan-mcp-langgraph-examples/1.0"
+
+
+@dataclass(slots=True)
+class CachedResource:
+    """A resource file held in the cache."""
+
+    url: str
+    path: str
+    sha256: str
+    size: int
+    status: str  # "hit", "revalidated" or "downloaded"
+
+    def open(self):
+        """Binary file object for streaming reads."""
+        return open(self.path, "rb")
+
+    @contextlib.contextmanager
+    def mmap(self):
+        """Read-only memory map of the file (supports read(), slicing, find())."""
+        if self.size == 0:
+            yield io.BytesIO(b"")  # mmap cannot map empty files
+            return
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+
+class ResourceCache:
+    """Disk cache of resource files with revalidation and LRU eviction."""
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = MAX_CACHE_BYTES,
+        revalidate_after: float = REVALIDATE_AFTER,
+        evict_grace: float = EVICT_GRACE,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.evict_grace = evict_grace
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.evictions = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+
+        for sub in ("objects", "locks", "tmp"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS objects (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Short-lived connections: fetch_sync runs in worker threads
+        conn = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30)
+        try:
+            with conn:  # Commit on success
+                yield conn
+        finally:
+            conn.close()
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    async def fetch(self, url: str) -> CachedResource:
+        """Cached file for `url`; concurrent callers share one download."""
+        future = self._inflight.get(url)
+        if future is None:
+            future = asyncio.ensure_future(asyncio.to_thread(self.fetch_sync, url))
+            self._inflight[url] = future
+            future.add_done_callback(lambda _: self._inflight.pop(url, None))
+
+        with span("resource_fetch", "download") as s:
+            resource = await asyncio.shield(future)
+            if s is not None:
+                s.bytes = resource.size if resource.status == "downloaded" else 0
+                s.cache = "miss" if resource.status == "downloaded" else "hit"
+                s.attrs["status"] = resource.status
+            return resource
+
+    def fetch_sync(self, url: str) -> CachedResource:
+        """Blocking fetch; safe to call from several threads or processes."""
+        with self._url_lock(url):
+            with self._connect() as conn:
+                entry = conn.execute(
+                    "SELECT sha256, etag, last_modified, fetched_at FROM urls WHERE url = ?",
+                    (url,),
+                ).fetchone()
+
+            if entry and time.time() - entry[3] < self.revalidate_after:
+                resource = self._touch(url, entry[0], "hit")
+                if resource is not None:
+                    self.hits += 1
+                    return resource
+                entry = None  # Evicted since the lookup
+
+            while True:
+                headers = {"User-Agent": USER_AGENT}
+                if entry and os.path.exists(self._object_path(entry[0])):
+                    if entry[1]:
+                        headers["If-None-Match"] = entry[1]
+                    if entry[2]:
+                        headers["If-Modified-Since"] = entry[2]
+                else:
+                    entry = None
+
+                request = urllib.request.Request(url, headers=headers)
+                try:
+                    response = urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT)
+                except urllib.error.HTTPError as e:
+                    if e.code == 304 and entry:
+                        resource = self._touch(url, entry[0], "revalidated", refreshed=True)
+                        if resource is not None:
+                            self.revalidated += 1
+                            return resource
+                        entry = None  # Evicted while revalidating: fetch it in full
+                        continue
+                    raise
+                break
+
+            with response:
+                tmp_path, sha256, size = self._store(response)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+
+            now = time.time()
+            path = self._object_path(sha256)
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO objects VALUES (?, ?, ?)", (sha256, size, now)
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?)",
+                        (url, sha256, etag, last_modified, now),
+                    )
+                    # Move into place while holding the index write lock, so an
+                    # evict() of identical content cannot unlink it afterwards
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)  # Identical content: same path, same bytes
+            except BaseException:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(tmp_path)
+                raise
+            self.downloads += 1
+            self.evict(keep=sha256)
+            return CachedResource(url, path, sha256, size, "downloaded")
+
+    def _store(self, response) -> tuple[str, str, int]:
+        """Stream the body to a temp file while hashing; returns (tmp_path, sha256, size)."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk := response.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    def _touch(
+        self, url: str, sha256: str, status: str, refreshed: bool = False
+    ) -> CachedResource | None:
+        """Mark a cached file as used (and revalidated, if `refreshed`).
+
+        Returns None if the file was evicted in the meantime.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            touched = conn.execute(
+                "UPDATE objects SET last_access = ? WHERE sha256 = ?", (now, sha256)
+            ).rowcount
+            if not touched:
+                return None
+            if refreshed:
+                conn.execute("UPDATE urls SET fetched_at = ? WHERE url = ?", (now, url))
+            size = conn.execute(
+                "SELECT size FROM objects WHERE sha256 = ?", (sha256,)
+            ).fetchone()[0]
+        # Touched: evict() now leaves the file alone for evict_grace seconds
+        return CachedResource(url, self._object_path(sha256), sha256, size, status)
+
+    @contextlib.contextmanager
+    def _url_lock(self, url: str):
+        # Cross-process single-flight: one fetch per URL at a time
+        if fcntl is None:
+            yield
+            return
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        with open(os.path.join(self.root, "locks", name), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def evict(self, keep: str | None = None):
+        """Delete least recently used files until the cache fits max_bytes.
+
+        Files used within evict_grace seconds are kept even if that leaves
+        the cache over budget: another caller (in this process or another)
+        may have just been given the path and not opened it yet.
+        """
+        cutoff = time.time() - self.evict_grace
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for sha256, size in conn.execute(
+                "SELECT sha256, size FROM objects WHERE last_access < ? ORDER BY last_access",
+                (cutoff,),
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                if sha256 == keep:
+                    continue
+                # Re-check under the write lock: a _touch since the SELECT wins,
+                # and one that comes after waits until the row is gone
+                if not conn.execute(
+                    "DELETE FROM objects WHERE sha256 = ? AND last_access < ?",
+                    (sha256, cutoff),
+                ).rowcount:
+                    continue
+                conn.execute("DELETE FROM urls WHERE sha256 = ?", (sha256,))
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self._object_path(sha256))
+                total -= size
+                self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Counters plus current size on disk."""
+        with self._connect() as conn:
+            files, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "downloads": self.downloads,
+            "evictions": self.evictions,
+            "files": files,
+            "bytes": size,
+        }
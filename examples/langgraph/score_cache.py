@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Incremental Metadata Quality Score Cache
+
+Persists MetadataQualityScorer results in a local SQLite file so unchanged
+packages are not rescored on every run.
+
+Entries are keyed by package id, `metadata_modified` and a hash of the
+scorer's module source: editing the scorer, or module-level tables it
+reads such as OPEN_FORMATS, invalidates every entry. Only the
+sub-scores that depend on the package alone (completeness, richness,
+resources) are stored; freshness depends on "now" and is recomputed on
+every lookup, which costs one date parse.
+
+Usage:
+    with ScoreCache("quality_scores.sqlite") as cache:
+        quality = cache.score_dataset(dataset)   # Same shape as score_dataset()
+        print(cache.hits, cache.misses)
+"""
+
+import hashlib
+import inspect
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any
+
+from metadata_quality import MetadataQualityScorer
+
+# Configuration
+DEFAULT_CACHE_PATH = "quality_scores.sqlite"
+COMMIT_EVERY = 1000  # Pending writes before an automatic commit
+
+
+def scorer_version(scorer: type = MetadataQualityScorer) -> str:
+    """Short hash of the scorer's module source, used to invalidate stale entries."""
+    # The whole module: sub-scores also read module-level constants (OPEN_FORMATS)
+    source = inspect.getsource(inspect.getmodule(scorer))
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+class ScoreCache:
+    """SQLite-backed cache of static quality sub-scores."""
+
+    def __init__(
+        self, path: str = DEFAULT_CACHE_PATH, scorer: type = MetadataQualityScorer
+    ):
+        self.path = path
+        self.scorer = scorer
+        self.version = scorer_version(scorer)
+        self.hits = 0
+        self.misses = 0
+        self._pending_writes = 0
+
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scores (
+                package_id TEXT PRIMARY KEY,
+                metadata_modified TEXT NOT NULL,
+                scorer_version TEXT NOT NULL,
+                completeness INTEGER NOT NULL,
+                richness INTEGER NOT NULL,
+                resources INTEGER NOT NULL,
+                issues TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def score_dataset(
+        self, dataset: dict[str, Any], now: datetime | None = None
+    ) -> dict[str, Any]:
+        """Score a dataset, reusing cached sub-scores when it is unchanged."""
+        package_id = dataset.get("id") or dataset.get("name")
+        modified = dataset.get("metadata_modified")
+        if not package_id or not modified:
+            # Nothing stable to key on
+            self.misses += 1
+            return self.scorer.score_dataset(dataset, now=now)
+
+        row = self.conn.execute(
+            "SELECT completeness, richness, resources, issues FROM scores "
+            "WHERE package_id = ? AND metadata_modified = ? AND scorer_version = ?",
+            (package_id, modified, self.version),
+        ).fetchone()
+
+        if row:
+            self.hits += 1
+            completeness, richness, resources, issues_json = row
+            issues = json.loads(issues_json)
+        else:
+            self.misses += 1
+            issues = []
+            completeness = self.scorer._score_completeness(dataset, issues)
+            richness = self.scorer._score_richness(dataset, issues)
+            resources = self.scorer._score_resources(dataset, issues)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    package_id,
+                    modified,
+                    self.version,
+                    completeness,
+                    richness,
+                    resources,
+                    json.dumps(issues, ensure_ascii=False),
+                ),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= COMMIT_EVERY:
+                self.commit()
+
+        # Freshness issues come last, as in score_dataset()
+        freshness = self.scorer._score_freshness(dataset, issues, now)
+        breakdown = {
+            "completeness": completeness,
+            "richness": richness,
+            "resources": resources,
+            "freshness": freshness,
+        }
+        total_score = sum(breakdown.values())
+
+        return {
+            "score": total_score,
+            "level": self.scorer._get_level(total_score),
+            "breakdown": breakdown,
+            "issues": issues,
+        }
+
+    def commit(self):
+        """Flush pending writes to disk."""
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def close(self):
+        """Commit and close the database."""
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self) -> "ScoreCache":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    sample_dataset = {
+        "id": "sample-id",
+        "name": "sample-dataset",
+        "title": "Sample Dataset",
+        "notes": "A short description",
+        "resources": [{"format": "CSV", "url": "https://example.com/data.csv"}],
+        "metadata_modified": "2025-01-15T10:00:00Z",
+    }
+
+    path = os.path.join(tempfile.mkdtemp(), "scores.sqlite")
+    for run in (1, 2):
+        with ScoreCache(path) as cache:
+            result = cache.score_dataset(sample_dataset)
+            print(
+                f"Run {run}: score={result['score']} "
+                f"hits={cache.hits} misses={cache.misses}"
+            )
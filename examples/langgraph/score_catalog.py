@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Parallel Metadata Quality Scoring for Catalog Dumps
+
+Scores a local dump of CKAN packages with MetadataQualityScorer across a
+process pool and streams one row per package, in input order:
+
+    {"name": ..., "score": ..., "level": ..., "breakdown": {...}, "issues": [...]}
+
+Input can be:
+- NDJSON / JSON Lines (one package per line, .ndjson or .jsonl)
+- A JSON array of packages
+- A package_search response ({"results": [...]} or {"result": {"results": [...]}})
+
+NDJSON lines are shipped to workers undecoded, so JSON parsing is
+parallelised too. The freshness reference time is fixed once per run, so
+the same dump always produces the same output. With --cache, unchanged
+packages reuse sub-scores from a shared SQLite cache (see score_cache.py).
+
+Run:
+    python score_catalog.py packages.ndjson --workers 32 > scores.ndjson
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from metadata_quality import MetadataQualityScorer
+from score_cache import ScoreCache
+
+# Configuration
+CHUNK_SIZE = 500  # Packages per task sent to a worker
+MAX_PENDING_PER_WORKER = 2  # Chunks queued ahead per worker (bounds memory)
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+
+def load_packages(path: str) -> Iterator[str | dict]:
+    """
+    Yield packages from a dump file.
+
+    NDJSON lines (.ndjson/.jsonl) are yielded as raw strings and decoded by
+    the workers; JSON documents are decoded here and yielded as dicts.
+    """
+    if path.endswith(NDJSON_SUFFIXES):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+        return
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        data = data.get("result", data)
+        data = data.get("results", []) if isinstance(data, dict) else data
+    yield from data
+
+
+# Per-process cache handle, opened lazily in each worker
+_worker_cache: ScoreCache | None = None
+
+
+def _score_chunk(
+    items: list[str | dict], now: datetime, cache_path: str | None = None
+) -> list[dict[str, Any]]:
+    """Worker: decode and score one chunk of packages."""
+    global _worker_cache
+    if cache_path and _worker_cache is None:
+        _worker_cache = ScoreCache(cache_path)
+    score = _worker_cache.score_dataset if cache_path else MetadataQualityScorer.score_dataset
+
+    rows = []
+    for item in items:
+        dataset = json.loads(item) if isinstance(item, str) else item
+        quality = score(dataset, now=now)
+        rows.append(
+            {
+                "name": dataset.get("name"),
+                "score": quality["score"],
+                "level": quality["level"],
+                "breakdown": quality["breakdown"],
+                "issues": quality["issues"],
+            }
+        )
+
+    if cache_path:
+        _worker_cache.commit()
+    return rows
+
+
+def _chunks(items: Iterator, size: int) -> Iterator[list]:
+    """Group an iterator into lists of at most `size` items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def score_catalog(
+    path: str,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    now: datetime | None = None,
+    cache_path: str | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Score every package in a dump across a process pool.
+
+    Rows are yielded in input order as soon as their chunk (and every chunk
+    before it) is done. At most MAX_PENDING_PER_WORKER chunks per worker are
+    in flight, so memory stays bounded for arbitrarily large dumps.
+    If `cache_path` is given, workers share a ScoreCache at that path.
+    """
+    workers = workers or os.cpu_count() or 1
+    if now is None:
+        now = datetime.now(timezone.utc)  # Fixed once per run
+
+    pending = deque()
+    max_pending = workers * MAX_PENDING_PER_WORKER
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in _chunks(load_packages(path), chunk_size):
+            pending.append(executor.submit(_score_chunk, chunk, now, cache_path))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main():
+    """Score a catalog dump and write NDJSON rows."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("path", help="JSON or NDJSON package dump")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument(
+        "--now",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Freshness reference time (ISO 8601), defaults to current time",
+    )
+    parser.add_argument("--cache", default=None, help="SQLite score cache path")
+    parser.add_argument("--output", "-o", default=None, help="Output file (default stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        rows = score_catalog(
+            args.path, args.workers, args.chunk_size, args.now, args.cache
+        )
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
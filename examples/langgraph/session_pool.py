@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Pool of MCP Server Sessions
+
+A single stdio pipe serialises every tool call. SessionPool starts N CKAN MCP
+Server subprocesses (or wraps N existing sessions) and dispatches
+`call_tool` across them:
+
+- Least-outstanding-requests routing
+- Bounded total concurrency
+- Crashed workers are replaced automatically and the call is retried once
+  (CKAN tools are read-only, so a retry is safe). A worker that fails to
+  start is retried with exponential backoff when a later call picks a
+  session
+
+The pool exposes `call_tool`, so it can be passed anywhere a ClientSession
+is expected:
+
+    async with SessionPool(server_params, size=4) as pool:
+        mcp_client = CKANMCPClient(pool)
+
+open_session() gives a plain ClientSession for size 1 and a pool otherwise.
+"""
+
+import asyncio
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any
+
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from tracing import current_span
+
+# Configuration
+POOL_SIZE = 4
+PER_SESSION_CONCURRENCY = 4  # In-flight calls per session before queueing
+MAX_RETRIES = 1  # Retries on a fresh worker after a transport failure
+RESTART_BACKOFF = 1.0  # Seconds before retrying a worker that failed to start
+RESTART_BACKOFF_MAX = 60.0  # Doubles per consecutive failure, up to this
+
+# Errors that mean the worker's pipe or process is gone
+TRANSPORT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+)
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """True if the error means the session is dead rather than the call failed."""
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, TRANSPORT_ERRORS)
+
+
+class _Worker:
+    """One MCP session, optionally owning its server subprocess."""
+
+    def __init__(self, index: int, server_params: StdioServerParameters | None):
+        self.index = index
+        self.server_params = server_params
+        self.session: ClientSession | None = None
+        self.outstanding = 0
+        self.alive = False
+        self.failures = 0  # Consecutive failed starts in this slot
+        self.retry_at = 0.0  # Monotonic time after which a dead slot is restarted
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._error: BaseException | None = None
+
+    @classmethod
+    def wrap(cls, index: int, session: ClientSession) -> "_Worker":
+        """Worker around a session managed by the caller (not restartable)."""
+        worker = cls(index, None)
+        worker.session = session
+        worker.alive = True
+        return worker
+
+    async def start(self):
+        """Spawn the server and wait until the session is initialized."""
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self._error:
+            raise self._error
+
+    async def _run(self):
+        # Contexts are entered and exited in this task, as anyio requires
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self.alive = True
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.alive = False
+            self.session = None
+            self._ready.set()
+
+    async def stop(self):
+        """Shut down the session and subprocess, if owned."""
+        self.alive = False
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except Exception:
+            self._task.cancel()
+
+
+class SessionPool:
+    """Dispatch MCP tool calls across several sessions."""
+
+    def __init__(
+        self,
+        server_params: StdioServerParameters | None = None,
+        size: int = POOL_SIZE,
+        max_concurrency: int | None = None,
+        sessions: list[ClientSession] | None = None,
+    ):
+        if server_params is None and not sessions:
+            raise ValueError("SessionPool needs server_params or sessions")
+
+        self.server_params = server_params
+        self.size = len(sessions) if sessions else size
+        self.max_concurrency = max_concurrency or self.size * PER_SESSION_CONCURRENCY
+        self.restarts = 0
+        self._sessions = sessions
+        self._workers: list[_Worker] = []
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._rotation = itertools.count()
+        self._restart_lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()  # Restarts and stops in the background
+
+    async def start(self):
+        """Start all workers concurrently."""
+        if self._sessions:
+            self._workers = [_Worker.wrap(i, s) for i, s in enumerate(self._sessions)]
+            return
+
+        self._workers = [_Worker(i, self.server_params) for i in range(self.size)]
+        await asyncio.gather(*(w.start() for w in self._workers))
+
+    async def close(self):
+        """Stop all owned workers, after pending restarts and stops finish."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*(w.stop() for w in self._workers))
+        self._workers = []
+
+    async def __aenter__(self) -> "SessionPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def call_tool(
+        self, name: str, arguments: dict[str, Any] | None = None, **kwargs
+    ):
+        """Run a tool call on the least busy live session."""
+        async with self._semaphore:
+            attempt = 0
+            while True:
+                worker = await self._pick_worker()
+                worker.outstanding += 1
+                try:
+                    return await worker.session.call_tool(
+                        name, arguments=arguments, **kwargs
+                    )
+                except Exception as e:
+                    if not is_transport_error(e):
+                        raise
+                    await self._replace(worker)
+                    if attempt >= MAX_RETRIES:
+                        raise
+                    attempt += 1
+                    span = current_span()
+                    if span is not None:
+                        span.retries += 1
+                finally:
+                    worker.outstanding -= 1
+
+    async def _pick_worker(self) -> _Worker:
+        """Live worker with the fewest outstanding calls (round-robin on ties)."""
+        # Dead slots past their backoff are restarted: in the background while
+        # other sessions are live, otherwise this call waits for them
+        now = time.monotonic()
+        restarts = []
+        for worker in self._workers:
+            if not worker.alive and worker.server_params is not None and worker.retry_at <= now:
+                worker.retry_at = math.inf  # Claimed by this restart
+                restarts.append(self._track(self._replace(worker)))
+
+        live = [w for w in self._workers if w.alive]
+        if not live and restarts:
+            await asyncio.gather(*restarts, return_exceptions=True)
+            live = [w for w in self._workers if w.alive]
+        if not live:
+            raise ConnectionError("No live MCP sessions in pool")
+
+        offset = next(self._rotation) % len(live)
+        rotated = live[offset:] + live[:offset]
+        return min(rotated, key=lambda w: w.outstanding)
+
+    async def _replace(self, worker: _Worker):
+        """Swap a crashed worker for a fresh subprocess."""
+        worker.alive = False
+        if worker.server_params is None:
+            return  # Caller-managed session, cannot restart
+
+        async with self._restart_lock:
+            if self._workers[worker.index] is not worker:
+                return  # Already replaced by a concurrent caller
+
+            replacement = _Worker(worker.index, worker.server_params)
+            replacement.retry_at = math.inf  # Not restartable while starting
+            self._workers[worker.index] = replacement
+            self.restarts += 1
+            self._track(worker.stop())
+            try:
+                await replacement.start()
+            except Exception:
+                replacement.alive = False
+                replacement.failures = worker.failures + 1
+                replacement.retry_at = time.monotonic() + min(
+                    RESTART_BACKOFF_MAX, RESTART_BACKOFF * 2 ** (replacement.failures - 1)
+                )
+
+    def _track(self, coro) -> asyncio.Task:
+        """Run `coro` in a task that close() waits for."""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def stats(self) -> dict[str, Any]:
+        """Per-session load and restart count."""
+        return {
+            "size": self.size,
+            "live": sum(1 for w in self._workers if w.alive),
+            "outstanding": [w.outstanding for w in self._workers],
+            "restarts": self.restarts,
+        }
+
+
+@asynccontextmanager
+async def open_session(server_params: StdioServerParameters, size: int = 1):
+    """An initialized ClientSession for size 1, a started SessionPool otherwise."""
+    if size > 1:
+        async with SessionPool(server_params, size=size) as pool:
+            yield pool
+        return
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
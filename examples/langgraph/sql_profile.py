@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+DataStore Profiling by SQL Pushdown
+
+Builds aggregate SELECT statements over a DataStore resource's fields and
+runs them through ckan_datastore_search_sql, so PostgreSQL computes
+counts, null rates, distinct counts, min/max and means and only a few
+kilobytes come back. Many columns are aggregated per statement.
+
+The result has the same shape as csv_profiler.TableProfile.to_dict(), so
+callers can fall back to paged record scanning (iter_datastore) when a
+portal has SQL search disabled.
+
+Usage:
+    try:
+        profile = await profile_datastore_sql(mcp_client, resource_id)
+    except SQLProfileError:
+        ...  # Stream records instead
+"""
+
+from typing import Any
+
+from ckan_client import CKANMCPClient
+
+# Configuration
+COLUMNS_PER_QUERY = 16  # Column aggregates batched into one SELECT
+
+# CKAN DataStore types by profile type; types not listed only get counts
+NUMERIC_TYPES = frozenset(
+    {"int", "int2", "int4", "int8", "integer", "bigint", "numeric", "float4", "float8"}
+)
+INTEGER_TYPES = frozenset({"int", "int2", "int4", "int8", "integer", "bigint"})
+TEXT_TYPES = frozenset({"text", "varchar", "char", "citext"})
+DATE_TYPES = frozenset({"date", "timestamp", "timestamptz", "time"})
+
+
+class SQLProfileError(RuntimeError):
+    """The portal refused or failed the aggregate queries."""
+
+
+def quote_identifier(name: str) -> str:
+    """Double-quote a table or column name for datastore_search_sql."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def profile_type(ckan_type: str) -> str:
+    """Map a DataStore field type onto the profiler's type names."""
+    if ckan_type in INTEGER_TYPES:
+        return "integer"
+    if ckan_type in NUMERIC_TYPES:
+        return "number"
+    if ckan_type in DATE_TYPES:
+        return "date"
+    if ckan_type == "bool":
+        return "boolean"
+    return "string"
+
+
+def column_aggregates(index: int, field: dict[str, Any]) -> list[str]:
+    """SELECT expressions for one field, aliased c<index>_<stat>."""
+    column = quote_identifier(field["id"])
+    ckan_type = field.get("type", "text")
+    if ckan_type in TEXT_TYPES:
+        # Empty strings count as nulls, as in the CSV profiler
+        column = f"NULLIF({column}, '')"
+    expressions = [
+        f'COUNT({column}) AS "c{index}_count"',
+        f'COUNT(DISTINCT {column}) AS "c{index}_distinct"',
+    ]
+    if ckan_type in NUMERIC_TYPES or ckan_type in TEXT_TYPES or ckan_type in DATE_TYPES:
+        expressions.append(f'MIN({column}) AS "c{index}_min"')
+        expressions.append(f'MAX({column}) AS "c{index}_max"')
+    if ckan_type in NUMERIC_TYPES:
+        expressions.append(f'AVG({column}) AS "c{index}_mean"')
+    return expressions
+
+
+def profile_queries(
+    resource_id: str,
+    fields: list[dict[str, Any]],
+    columns_per_query: int = COLUMNS_PER_QUERY,
+) -> list[tuple[list[int], str]]:
+    """Aggregate statements, each covering a batch of field indexes."""
+    table = quote_identifier(resource_id)
+    queries = []
+    for start in range(0, len(fields), columns_per_query):
+        indexes = list(range(start, min(start + columns_per_query, len(fields))))
+        expressions = ['COUNT(*) AS "row_count"']
+        for i in indexes:
+            expressions.extend(column_aggregates(i, fields[i]))
+        queries.append((indexes, f"SELECT {', '.join(expressions)} FROM {table}"))
+    return queries
+
+
+def _number(value: Any, ckan_type: str) -> Any:
+    # numeric aggregates may come back as strings; text MIN/MAX stay as-is
+    if ckan_type in NUMERIC_TYPES and isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+async def profile_datastore_sql(
+    mcp_client: CKANMCPClient,
+    resource_id: str,
+    fields: list[dict[str, Any]] | None = None,
+) -> dict[str, Any]:
+    """Profile a DataStore table with aggregate queries; raise SQLProfileError if refused."""
+    if fields is None:
+        response = await mcp_client.datastore_search(resource_id, limit=1)
+        if "error" in response:
+            raise SQLProfileError(response["error"])
+        fields = response.get("fields", [])
+    # Skip DataStore internals such as _id and _full_text
+    fields = [f for f in fields if not f["id"].startswith("_")]
+
+    rows = 0
+    columns: list[dict[str, Any]] = [{} for _ in fields]
+    for indexes, sql in profile_queries(resource_id, fields):
+        response = await mcp_client.datastore_search_sql(sql)
+        if "error" in response:
+            raise SQLProfileError(response["error"])
+        records = response.get("records") or []
+        if not records:
+            raise SQLProfileError("Aggregate query returned no rows")
+        result = records[0]
+        rows = int(result["row_count"])
+
+        for i in indexes:
+            field = fields[i]
+            ckan_type = field.get("type", "text")
+            nulls = rows - int(result[f"c{i}_count"])
+            summary: dict[str, Any] = {
+                "name": field["id"],
+                "type": profile_type(ckan_type),
+                "count": rows,
+                "nulls": nulls,
+                "null_rate": nulls / rows if rows else 0.0,
+                "distinct": int(result[f"c{i}_distinct"]),
+                "distinct_exact": True,
+            }
+            if f"c{i}_min" in result:
+                summary["min"] = _number(result[f"c{i}_min"], ckan_type)
+                summary["max"] = _number(result[f"c{i}_max"], ckan_type)
+            if f"c{i}_mean" in result:
+                summary["mean"] = _number(result[f"c{i}_mean"], ckan_type)
+            columns[i] = summary
+
+    return {"rows": rows, "columns": columns, "method": "sql"}
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+Local Stand-In for the CKAN MCP Server
+
+A Python MCP stdio server exposing the tools the workflows call, so
+concurrency, caching and pagination can be soak-tested offline. Three
+backends are available:
+
+- synthetic (default): a seeded synthetic catalog (see synthetic.py).
+  Each server_url gets its own reproducible catalog; search matches every
+  query term against title and notes, "*:*" matches everything. SQL runs
+  against an in-memory SQLite copy of the resource records (or is refused
+  with --disable-sql, like portals without SQL search).
+- record: proxies every call to the real Node server and writes the
+  result to a fixture file.
+- replay: serves recorded fixtures; unknown calls return a tool error.
+
+Responses are rendered like the Node server (indented JSON, truncated at
+CHARACTER_LIMIT). Latency, jitter, truncation and errors can be injected
+on top of any backend; fault decisions are seeded per call, so a run
+replays the same faults regardless of request interleaving.
+
+Run (the workflows connect to it via StdioServerParameters):
+    python standin_server.py --packages 5000 --seed 42
+    python standin_server.py --record fixtures/
+    python standin_server.py --replay fixtures/ --latency 200 --jitter 150 \\
+        --truncate-rate 0.05 --error-rate 0.02
+    python standin_server.py --latency 100 --tail-rate 0.02 --tail-latency 3000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shlex
+import sqlite3
+import sys
+import zlib
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.server.fastmcp import FastMCP
+from mcp.types import CallToolResult, TextContent
+
+from synthetic import (
+    DATASTORE_FIELDS,
+    datastore_result,
+    generate_packages,
+    generate_records,
+    render_response,
+    search_result,
+)
+from tool_cache import cache_key, is_error
+from truncated_json import TRUNCATION_MARKER, decode_partial
+
+# Configuration
+DEFAULT_PACKAGES = 2000
+DEFAULT_RECORDS = 5000
+MCP_SERVER_PATH = os.path.join(os.path.dirname(__file__), "../../dist/index.js")
+MAX_SQL_ROWS = 32000  # CKAN's default ckan.datastore.search.rows_max
+MIN_TRUNCATED_LENGTH = 200  # Shorter responses are never truncated
+MODIFIED_RANGE = re.compile(r"metadata_modified:\[(\S+) TO \*\]")
+
+
+def text_result(text: str, error: bool = False) -> CallToolResult:
+    """Tool result with a single text block."""
+    return CallToolResult(content=[TextContent(type="text", text=text)], isError=error)
+
+
+def _arguments(**kwargs: Any) -> dict[str, Any]:
+    # Only the arguments the caller set, so recorded calls match what the
+    # Node server would have received
+    return {k: v for k, v in kwargs.items() if v is not None}
+
+
+class SyntheticBackend:
+    """Per-portal synthetic catalogs, generated lazily."""
+
+    def __init__(self, packages: int, records: int, seed: int, sql_enabled: bool = True):
+        self.packages = packages
+        self.records = records
+        self.seed = seed
+        self.sql_enabled = sql_enabled
+        self._catalogs: dict[str, tuple[list[dict], list[str]]] = {}
+        self._records: dict[str, list[dict]] = {}
+        self._sql: sqlite3.Connection | None = None
+        self._sql_tables: set[str] = set()
+
+    def _portal_seed(self, server_url: str) -> int:
+        return self.seed ^ zlib.crc32(server_url.rstrip("/").encode("utf-8"))
+
+    def catalog(self, server_url: str) -> tuple[list[dict], list[str]]:
+        """Packages plus lowercase search text for one portal."""
+        if server_url not in self._catalogs:
+            packages = generate_packages(self.packages, self._portal_seed(server_url))
+            texts = [
+                f"{p.get('title') or ''} {p.get('notes') or ''}".lower() for p in packages
+            ]
+            self._catalogs[server_url] = (packages, texts)
+        return self._catalogs[server_url]
+
+    def resource_records(self, resource_id: str) -> list[dict]:
+        """DataStore records for one resource."""
+        if resource_id not in self._records:
+            seed = self.seed ^ zlib.crc32(resource_id.encode("utf-8"))
+            self._records[resource_id] = generate_records(self.records, seed)
+        return self._records[resource_id]
+
+    def search(
+        self,
+        server_url: str,
+        q: str,
+        start: int,
+        rows: int,
+        fq: str | None = None,
+        sort: str | None = None,
+    ) -> dict[str, Any]:
+        packages, texts = self.catalog(server_url)
+        terms = [t for t in (q or "").lower().split() if t not in ("*:*", "*")]
+        if terms:
+            packages = [
+                p for p, text in zip(packages, texts) if all(t in text for t in terms)
+            ]
+        # Only the metadata_modified range filter and sort used by the harvester
+        if fq and (match := MODIFIED_RANGE.fullmatch(fq.strip())):
+            since = _parse_time(match.group(1))
+            packages = [p for p in packages if _parse_time(p["metadata_modified"]) >= since]
+        if sort and sort.split()[0] == "metadata_modified":
+            packages = sorted(
+                packages,
+                key=lambda p: _parse_time(p["metadata_modified"]),
+                reverse=sort.split()[-1] == "desc",
+            )
+        return search_result(packages, start, rows)
+
+    def show(self, server_url: str, package_id: str) -> dict[str, Any] | None:
+        packages, _ = self.catalog(server_url)
+        for p in packages:
+            if package_id in (p["id"], p["name"]):
+                return p
+        return None
+
+    def datastore(
+        self, resource_id: str, offset: int, limit: int
+    ) -> dict[str, Any]:
+        return datastore_result(
+            self.resource_records(resource_id), resource_id, offset, limit
+        )
+
+    def sql(self, sql: str) -> dict[str, Any]:
+        """Run a datastore_search_sql query against SQLite copies of the records."""
+        if self._sql is None:
+            self._sql = sqlite3.connect(":memory:")
+        # Load every quoted identifier that looks like a resource table
+        for name in _quoted_identifiers(sql):
+            if name not in self._sql_tables:
+                self._load_table(name)
+
+        cursor = self._sql.execute(sql)
+        columns = [d[0] for d in cursor.description or []]
+        rows = cursor.fetchmany(MAX_SQL_ROWS)
+        types = {f["id"]: f["type"] for f in DATASTORE_FIELDS}
+        return {
+            "records": [dict(zip(columns, row)) for row in rows],
+            "fields": [{"id": c, "type": types.get(c, "numeric")} for c in columns],
+            "sql": sql,
+        }
+
+    def _load_table(self, resource_id: str):
+        columns = [f["id"] for f in DATASTORE_FIELDS]
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        self._sql.execute(f'CREATE TABLE "{resource_id}" ({quoted})')
+        self._sql.executemany(
+            f'INSERT INTO "{resource_id}" VALUES ({", ".join("?" * len(columns))})',
+            [
+                tuple(r.get(c) for c in columns)
+                for r in self.resource_records(resource_id)
+            ],
+        )
+        self._sql_tables.add(resource_id)
+
+    async def call(self, name: str, arguments: dict[str, Any]) -> CallToolResult:
+        """Serve one tool call from the synthetic catalog."""
+        server_url = arguments.get("server_url", "")
+        if name == "ckan_package_search":
+            return text_result(
+                render_response(
+                    self.search(
+                        server_url,
+                        arguments.get("q", "*:*"),
+                        arguments.get("start", 0),
+                        arguments.get("rows", 10),
+                        arguments.get("fq"),
+                        arguments.get("sort"),
+                    )
+                )
+            )
+        if name == "ckan_package_show":
+            package = self.show(server_url, arguments["id"])
+            if package is None:
+                return text_result(
+                    f"Error fetching package: Package not found: {arguments['id']}",
+                    error=True,
+                )
+            return text_result(render_response(package))
+        if name == "ckan_datastore_search":
+            return text_result(
+                render_response(
+                    self.datastore(
+                        arguments["resource_id"],
+                        arguments.get("offset", 0),
+                        arguments.get("limit", 100),
+                    )
+                )
+            )
+        if name == "ckan_datastore_search_sql":
+            if not self.sql_enabled:
+                # What portals without ckan.datastore.sqlsearch.enabled return
+                return text_result(
+                    "Error querying DataStore SQL: CKAN API error (403): "
+                    "Access denied: datastore_search_sql is not enabled",
+                    error=True,
+                )
+            try:
+                return text_result(render_response(self.sql(arguments["sql"])))
+            except sqlite3.Error as e:
+                return text_result(f"Error querying DataStore SQL: {e}", error=True)
+        return text_result(f"Unknown tool: {name}", error=True)
+
+
+def _parse_time(value: str) -> datetime:
+    # CKAN timestamps are naive UTC; Solr dates end in "Z"
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _quoted_identifiers(sql: str) -> list[str]:
+    # "..." identifiers, as required by datastore_search_sql for table names
+    parts = sql.split('"')
+    return [parts[i] for i in range(1, len(parts) - 1, 2)]
+
+
+def fixture_path(fixture_dir: str, name: str, arguments: dict[str, Any]) -> str:
+    """File holding the recorded result of one tool call."""
+    return os.path.join(fixture_dir, name, cache_key(name, arguments)[:24] + ".json")
+
+
+class RecordingBackend:
+    """Proxies calls to the real CKAN MCP Server and writes fixtures."""
+
+    def __init__(self, fixture_dir: str, server_params: StdioServerParameters):
+        self.fixture_dir = fixture_dir
+        self.server_params = server_params
+        self.session: ClientSession | None = None
+
+    @asynccontextmanager
+    async def connect(self):
+        """Keep one upstream session open for the lifetime of the server."""
+        async with AsyncExitStack() as stack:
+            read, write = await stack.enter_async_context(
+                stdio_client(self.server_params)
+            )
+            self.session = await stack.enter_async_context(ClientSession(read, write))
+            await self.session.initialize()
+            try:
+                yield self
+            finally:
+                self.session = None
+
+    async def call(self, name: str, arguments: dict[str, Any]) -> CallToolResult:
+        """Forward one call upstream and record its result."""
+        result = await self.session.call_tool(name, arguments=arguments)
+        path = fixture_path(self.fixture_dir, name, arguments)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fixture = {
+            "tool": name,
+            "arguments": arguments,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "result": result.model_dump(mode="json", exclude_none=True),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        return result
+
+
+class ReplayBackend:
+    """
+    Serves tool results recorded by RecordingBackend.
+
+    Paged tools also serve windows that were not recorded verbatim: every
+    recorded page of the same query is merged, and any start/rows (or
+    offset/limit) window they cover is rebuilt from it. Clients that adapt
+    their page size, or retry truncated pages with fewer rows, keep working.
+    """
+
+    def __init__(self, fixture_dir: str):
+        self.fixture_dir = fixture_dir
+        self._results: dict[str, CallToolResult | None] = {}
+        self._pages: dict[str, dict[str, tuple[dict, dict[int, Any]]]] = {}
+
+    async def call(self, name: str, arguments: dict[str, Any]) -> CallToolResult:
+        """Replay the recorded result, or a tool error if none was recorded."""
+        path = fixture_path(self.fixture_dir, name, arguments)
+        if path not in self._results:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    fixture = json.load(f)
+                self._results[path] = CallToolResult.model_validate(fixture["result"])
+            except FileNotFoundError:
+                self._results[path] = None
+
+        result = self._results[path]
+        if result is None and name in PAGED_TOOLS:
+            result = self._window(name, arguments)
+        if result is None:
+            return text_result(
+                f"No fixture recorded for {name} {json.dumps(arguments, ensure_ascii=False)}",
+                error=True,
+            )
+        return result
+
+    def _window(self, name: str, arguments: dict[str, Any]) -> CallToolResult | None:
+        # Rebuild a page from the merged items of every recorded page
+        offset_key, limit_key, array_key, default_limit = PAGED_TOOLS[name]
+        pages = self._load_pages(name)
+        entry = pages.get(_query_key(name, arguments))
+        if entry is None:
+            return None
+
+        response, items = entry
+        offset = arguments.get(offset_key, 0)
+        limit = arguments.get(limit_key, default_limit)
+        total = response.get("count", response.get("total"))
+        end = offset + limit if total is None else min(offset + limit, total)
+        if any(i not in items for i in range(offset, end)):
+            return None
+        page = dict(response)
+        page[array_key] = [items[i] for i in range(offset, end)]
+        return text_result(render_response(page))
+
+    def _load_pages(self, name: str) -> dict[str, tuple[dict, dict[int, Any]]]:
+        # Index the items of every successful fixture of one paged tool
+        if name in self._pages:
+            return self._pages[name]
+        offset_key, _, array_key, _ = PAGED_TOOLS[name]
+        pages: dict[str, tuple[dict, dict[int, Any]]] = {}
+        directory = os.path.join(self.fixture_dir, name)
+        for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                fixture = json.load(f)
+            result = CallToolResult.model_validate(fixture["result"])
+            text = next((c.text for c in result.content if c.type == "text"), "")
+            if is_error(result):
+                continue
+            try:
+                if TRUNCATION_MARKER in text:
+                    # Complete items before the cut are still usable
+                    response, _, _ = decode_partial(text, array_key)
+                else:
+                    response = json.loads(text)
+            except (json.JSONDecodeError, ValueError):
+                continue  # Markdown responses cannot be re-paged
+            arguments = fixture["arguments"]
+            _, items = pages.setdefault(_query_key(name, arguments), (response, {}))
+            first = arguments.get(offset_key, 0)
+            for i, item in enumerate(response.get(array_key) or []):
+                items[first + i] = item
+        self._pages[name] = pages
+        return pages
+
+
+# Paged tools: (offset argument, limit argument, array key, default limit)
+PAGED_TOOLS = {
+    "ckan_package_search": ("start", "rows", "results", 10),
+    "ckan_datastore_search": ("offset", "limit", "records", 100),
+}
+
+
+def _query_key(name: str, arguments: dict[str, Any]) -> str:
+    # Identifies a paged query independently of the requested window
+    offset_key, limit_key, _, _ = PAGED_TOOLS[name]
+    rest = {k: v for k, v in arguments.items() if k not in (offset_key, limit_key)}
+    return cache_key(name, rest)
+
+
+class FaultInjector:
+    """
+    Wraps a backend with injected latency, jitter, slow tails, truncation
+    and errors.
+
+    Each call draws from its own generator, seeded by the seed, the call
+    key and how often that call was seen, so repeated runs inject the same
+    faults even when requests interleave differently.
+    """
+
+    def __init__(
+        self,
+        backend,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        truncate_rate: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        tail_rate: float = 0.0,
+        tail_latency: float = 0.0,
+    ):
+        self.backend = backend
+        self.latency = latency
+        self.jitter = jitter
+        self.truncate_rate = truncate_rate
+        self.error_rate = error_rate
+        self.seed = seed
+        self.tail_rate = tail_rate  # Share of calls that take tail_latency extra
+        self.tail_latency = tail_latency
+        self._seen: dict[str, int] = {}
+
+    async def call(self, name: str, arguments: dict[str, Any]) -> CallToolResult:
+        """Call the backend, then apply the faults drawn for this call."""
+        key = cache_key(name, arguments)
+        n = self._seen.get(key, 0)
+        self._seen[key] = n + 1
+        rnd = random.Random(f"{self.seed}:{key}:{n}")
+
+        delay = self.latency + rnd.uniform(-self.jitter, self.jitter)
+        # Drawn only when enabled, so existing seeds keep their fault sequence
+        if self.tail_rate and rnd.random() < self.tail_rate:
+            delay += self.tail_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if rnd.random() < self.error_rate:
+            return text_result("Error: injected upstream failure (HTTP 503)", error=True)
+
+        result = await self.backend.call(name, arguments)
+        if rnd.random() < self.truncate_rate and not is_error(result):
+            result = _truncate(result, rnd)
+        return result
+
+
+def _truncate(result: CallToolResult, rnd: random.Random) -> CallToolResult:
+    # Cut the first text block at a random point, as truncateText would
+    content = list(result.content)
+    for i, block in enumerate(content):
+        if block.type != "text":
+            continue
+        text = block.text
+        if len(text) < MIN_TRUNCATED_LENGTH or TRUNCATION_MARKER in text:
+            return result
+        cut = rnd.randint(len(text) // 10, len(text) - 1)
+        content[i] = TextContent(
+            type="text",
+            text=text[:cut] + f"\n\n... [Response truncated at {cut} characters]",
+        )
+        return result.model_copy(update={"content": content})
+    return result
+
+
+def build_server(backend, lifespan=None) -> FastMCP:
+    """Register the CKAN tools used by the workflows."""
+    app = FastMCP("ckan-standin", log_level="WARNING", lifespan=lifespan)
+
+    @app.tool()
+    async def ckan_package_search(
+        server_url: str,
+        q: str | None = None,
+        rows: int | None = None,
+        start: int | None = None,
+        fq: str | None = None,
+        sort: str | None = None,
+        response_format: str | None = None,
+    ) -> CallToolResult:
+        """Search packages."""
+        return await backend.call(
+            "ckan_package_search",
+            _arguments(
+                server_url=server_url,
+                q=q,
+                rows=rows,
+                start=start,
+                fq=fq,
+                sort=sort,
+                response_format=response_format,
+            ),
+        )
+
+    @app.tool()
+    async def ckan_package_show(
+        server_url: str, id: str, response_format: str | None = None
+    ) -> CallToolResult:
+        """Show one package."""
+        return await backend.call(
+            "ckan_package_show",
+            _arguments(server_url=server_url, id=id, response_format=response_format),
+        )
+
+    @app.tool()
+    async def ckan_datastore_search(
+        server_url: str,
+        resource_id: str,
+        limit: int | None = None,
+        offset: int | None = None,
+        sort: str | None = None,
+        response_format: str | None = None,
+    ) -> CallToolResult:
+        """Page through DataStore records (synthetic records are kept in _id order)."""
+        return await backend.call(
+            "ckan_datastore_search",
+            _arguments(
+                server_url=server_url,
+                resource_id=resource_id,
+                limit=limit,
+                offset=offset,
+                sort=sort,
+                response_format=response_format,
+            ),
+        )
+
+    @app.tool()
+    async def ckan_datastore_search_sql(
+        server_url: str, sql: str, response_format: str | None = None
+    ) -> CallToolResult:
+        """Run a SQL query against DataStore resources."""
+        return await backend.call(
+            "ckan_datastore_search_sql",
+            _arguments(server_url=server_url, sql=sql, response_format=response_format),
+        )
+
+    return app
+
+
+def main():
+    """Run the stand-in server over stdio."""
+    parser = argparse.ArgumentParser(description="Local stand-in CKAN MCP server")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", metavar="DIR", help="Proxy to Node and record fixtures")
+    mode.add_argument("--replay", metavar="DIR", help="Serve recorded fixtures")
+    parser.add_argument(
+        "--upstream",
+        default=f"node {MCP_SERVER_PATH}",
+        help="Command starting the server to record from",
+    )
+    parser.add_argument("--packages", type=int, default=DEFAULT_PACKAGES)
+    parser.add_argument("--records", type=int, default=DEFAULT_RECORDS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--disable-sql", action="store_true", help="Refuse datastore_search_sql calls"
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± milliseconds")
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Share of slow calls")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="Milliseconds added")
+    args = parser.parse_args()
+
+    lifespan = None
+    if args.record:
+        command, *command_args = shlex.split(args.upstream)
+        recorder = RecordingBackend(
+            args.record, StdioServerParameters(command=command, args=command_args)
+        )
+        backend = recorder
+        lifespan = lambda app: recorder.connect()  # noqa: E731
+    elif args.replay:
+        if not os.path.isdir(args.replay):
+            sys.exit(f"Fixture directory not found: {args.replay}")
+        backend = ReplayBackend(args.replay)
+    else:
+        backend = SyntheticBackend(
+            args.packages, args.records, args.seed, sql_enabled=not args.disable_sql
+        )
+
+    if args.latency or args.jitter or args.truncate_rate or args.error_rate or args.tail_rate:
+        backend = FaultInjector(
+            backend,
+            latency=args.latency / 1000,
+            jitter=args.jitter / 1000,
+            truncate_rate=args.truncate_rate,
+            error_rate=args.error_rate,
+            seed=args.seed,
+            tail_rate=args.tail_rate,
+            tail_latency=args.tail_latency / 1000,
+        )
+
+    build_server(backend, lifespan=lifespan).run()
+
+
+if __name__ == "__main__":
+    main()
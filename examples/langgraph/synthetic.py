@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Seeded Synthetic CKAN Packages
+
+Generates packages shaped like real portal metadata (long Italian/English
+notes, many resources, DCAT-AP_IT style extras) for benchmarks and the
+stand-in MCP server. The same seed always yields the same catalog.
+
+Also renders tool responses the way the CKAN MCP Server does: JSON with
+2-space indentation, cut at CHARACTER_LIMIT with a truncation marker.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from ckan_client import CHARACTER_LIMIT
+
+WORDS = (
+    "dati mobilità urbana trasporti comune regione servizio pubblico anno "
+    "popolazione ambiente qualità aria rilevazione stazione monitoraggio "
+    "open data dataset records annual report transport public service "
+    "municipality region environment quality measurement station the of and"
+).split()
+FORMATS = ["CSV", "JSON", "XML", "PDF", "XLSX", "ZIP", "GeoJSON", "RDF", "HTML", ""]
+LICENSES = ["cc-by-4.0", "cc-by-sa-4.0", "cc0", "iodl-2.0", ""]
+EXTRA_KEYS = [
+    "spatial", "geographic_coverage", "temporal_start", "temporal_end",
+    "frequency", "update_frequency", "identifier", "issued", "modified",
+    "publisher_name", "publisher_identifier", "holder_name", "holder_identifier",
+    "theme", "conforms_to", "language", "alternate_identifier", "creator",
+    "contact_point", "landing_page", "version", "source_catalog_title",
+    "source_catalog_homepage", "source_catalog_language", "harvest_object_id",
+    "harvest_source_id", "harvest_source_title", "dcat_type", "access_rights",
+    "provenance",
+]
+REFERENCE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _text(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def generate_package(rnd: random.Random, index: int) -> dict[str, Any]:
+    """One synthetic package."""
+    name = f"dataset-{index:06d}"
+    org = f"org-{rnd.randint(0, 199):03d}"
+    modified = REFERENCE_TIME - timedelta(
+        days=rnd.randint(0, 1500), seconds=rnd.randint(0, 86399)
+    )
+
+    resources = []
+    for j in range(rnd.choice([1, 1, 2, 3, 4, 6, 10, 20])):
+        fmt = rnd.choice(FORMATS)
+        resources.append(
+            {
+                "id": f"{index:06d}-res-{j:02d}",
+                "package_id": f"pkg-{index:06d}",
+                "name": _text(rnd, rnd.randint(2, 8)),
+                "description": _text(rnd, rnd.randint(0, 60)) if rnd.random() < 0.7 else "",
+                "format": fmt,
+                "mimetype": f"text/{fmt.lower()}" if fmt else None,
+                "url": f"https://example.org/files/{name}/{j}.{fmt.lower() or 'bin'}"
+                if rnd.random() < 0.95
+                else "",
+                "datastore_active": fmt == "CSV" and rnd.random() < 0.4,
+                "size": rnd.randint(100, 10**9),
+                "created": modified.isoformat(),
+                "last_modified": modified.isoformat(),
+                "position": j,
+                "state": "active",
+            }
+        )
+
+    return {
+        "id": f"pkg-{index:06d}",
+        "name": name,
+        "title": _text(rnd, rnd.randint(3, 12)).rstrip(".") if rnd.random() < 0.98 else "",
+        "notes": _text(rnd, rnd.choice([0, 10, 30, 80, 200, 800])) if rnd.random() < 0.9 else "",
+        "license_id": rnd.choice(LICENSES),
+        "author": "Ufficio Statistica" if rnd.random() < 0.5 else None,
+        "maintainer": "Servizio Open Data" if rnd.random() < 0.6 else None,
+        "author_email": "statistica@example.org" if rnd.random() < 0.4 else None,
+        "maintainer_email": "opendata@example.org" if rnd.random() < 0.5 else None,
+        "organization": {
+            "id": f"{org}-id",
+            "name": org,
+            "title": f"Comune {org.upper()}",
+            "description": _text(rnd, 40),
+            "image_url": f"https://example.org/logos/{org}.png",
+            "type": "organization",
+            "state": "active",
+        }
+        if rnd.random() < 0.95
+        else None,
+        "tags": [
+            {"name": rnd.choice(WORDS), "display_name": "", "state": "active"}
+            for _ in range(rnd.randint(0, 15))
+        ],
+        "groups": [{"name": rnd.choice(WORDS), "title": _text(rnd, 2)}],
+        "extras": [
+            {"key": key, "value": _text(rnd, rnd.randint(1, 6))}
+            for key in rnd.sample(EXTRA_KEYS, rnd.randint(0, len(EXTRA_KEYS)))
+        ],
+        "resources": resources,
+        "num_resources": len(resources),
+        "num_tags": 0,
+        "metadata_created": (modified - timedelta(days=rnd.randint(0, 900))).isoformat(),
+        "metadata_modified": modified.isoformat(),
+        "state": "active",
+        "private": False,
+        "type": "dataset",
+    }
+
+
+def generate_packages(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    """A reproducible catalog of `count` packages."""
+    rnd = random.Random(seed)
+    return [generate_package(rnd, i) for i in range(count)]
+
+
+def generate_records(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    """Reproducible DataStore records (mixed numeric, text, dates, nulls)."""
+    rnd = random.Random(seed)
+    return [
+        {
+            "_id": i + 1,
+            "anno": 2000 + rnd.randint(0, 25),
+            "comune": rnd.choice(WORDS).capitalize(),
+            "valore": round(rnd.uniform(0, 10000), 2) if rnd.random() < 0.95 else None,
+            "conteggio": rnd.randint(0, 500),
+            "data": f"20{rnd.randint(10, 25)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            "note": _text(rnd, rnd.randint(0, 8)) if rnd.random() < 0.5 else None,
+        }
+        for i in range(count)
+    ]
+
+
+DATASTORE_FIELDS = [
+    {"id": "_id", "type": "int"},
+    {"id": "anno", "type": "int"},
+    {"id": "comune", "type": "text"},
+    {"id": "valore", "type": "numeric"},
+    {"id": "conteggio", "type": "int"},
+    {"id": "data", "type": "date"},
+    {"id": "note", "type": "text"},
+]
+
+
+def render_response(result: Any, limit: int = CHARACTER_LIMIT) -> str:
+    """Serialize like the server: indented JSON, truncated at `limit`."""
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n\n... [Response truncated at {limit} characters]"
+
+
+def search_result(
+    packages: list[dict[str, Any]], start: int = 0, rows: int = 10
+) -> dict[str, Any]:
+    """package_search result for a slice of the catalog."""
+    return {
+        "count": len(packages),
+        "facets": {},
+        "results": packages[start : start + rows],
+        "sort": "score desc, metadata_modified desc",
+        "search_facets": {},
+    }
+
+
+def datastore_result(
+    records: list[dict[str, Any]], resource_id: str, offset: int = 0, limit: int = 100
+) -> dict[str, Any]:
+    """datastore_search result for a slice of the records."""
+    return {
+        "include_total": True,
+        "limit": limit,
+        "records_format": "objects",
+        "resource_id": resource_id,
+        "total_estimation_threshold": None,
+        "records": records[offset : offset + limit],
+        "fields": DATASTORE_FIELDS,
+        "total": len(records),
+    }
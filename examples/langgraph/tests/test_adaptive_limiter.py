@@ -0,0 +1,50 @@
+"""AdaptiveLimiter AIMD decisions, fed with synthetic latencies."""
+
+import asyncio
+
+import adaptive_limiter
+from adaptive_limiter import AdaptiveLimiter
+
+
+async def feed(limiter, samples):
+    """Run (tool, latency, overloaded) samples through one slot each."""
+    for tool, latency, overloaded in samples:
+        await limiter.acquire()
+        await limiter.release(latency, overloaded=overloaded, tool=tool)
+
+
+def test_mixed_tools_with_steady_latency_keep_the_limit():
+    limiter = AdaptiveLimiter(initial_limit=8)
+    # Fast search pages interleaved with slower quality lookups, none of them slowing down
+    samples = [("ckan_package_search", 0.006, False), ("ckan_get_mqa_quality", 0.08, False)] * 200
+    asyncio.run(feed(limiter, samples))
+    assert limiter.decreases == 0
+    assert limiter.limit == 8
+
+
+def test_one_outlier_does_not_halve(monkeypatch):
+    monkeypatch.setattr(adaptive_limiter.time, "monotonic", iter(range(10**6)).__next__)
+    limiter = AdaptiveLimiter(initial_limit=8)
+    samples = [("ckan_package_show", 0.05, False)] * 20
+    samples += [("ckan_package_show", 1.5, False)]
+    samples += [("ckan_package_show", 0.05, False)] * 20
+    asyncio.run(feed(limiter, samples))
+    assert limiter.decreases == 0
+
+
+def test_sustained_slowdown_halves(monkeypatch):
+    monkeypatch.setattr(adaptive_limiter.time, "monotonic", iter(range(10**6)).__next__)
+    limiter = AdaptiveLimiter(initial_limit=8)
+    samples = [("ckan_package_show", 0.05, False)] * 20
+    samples += [("ckan_package_show", 0.5, False)] * adaptive_limiter.OVERLOAD_STREAK
+    asyncio.run(feed(limiter, samples))
+    assert limiter.decreases == 1
+    assert limiter.limit == 4
+
+
+def test_overloaded_response_halves_at_once(monkeypatch):
+    monkeypatch.setattr(adaptive_limiter.time, "monotonic", iter(range(10**6)).__next__)
+    limiter = AdaptiveLimiter(initial_limit=8)
+    asyncio.run(feed(limiter, [("ckan_package_show", 0.05, True)]))
+    assert limiter.overloads == 1
+    assert limiter.limit == 4
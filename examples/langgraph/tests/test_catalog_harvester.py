@@ -0,0 +1,93 @@
+"""CatalogStore.sync high water handling, with a fake client instead of MCP."""
+
+import asyncio
+import re
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import catalog_harvester
+from catalog_harvester import CatalogStore, _sort_key, solr_date
+
+SERVER = "https://demo.ckan.org"
+
+
+def make_packages(count):
+    return [
+        {
+            "id": f"pkg-{i:02d}",
+            "name": f"pkg-{i:02d}",
+            "metadata_modified": f"2026-01-{i + 1:02d}T12:00:00.000000",
+        }
+        for i in range(count)
+    ]
+
+
+class FakeClient:
+    """iter_packages over sorted packages, honouring the high water fq.
+
+    Packages in `flaky` are skipped (as if truncated on every attempt) the
+    first time they come up, and served normally afterwards.
+    """
+
+    def __init__(self, packages, flaky=()):
+        self.packages = packages
+        self.flaky = set(flaky)
+        self.fqs = []
+        self.last_search_skipped = 0
+        self.last_search_count = None
+
+    async def iter_packages(self, query, server_url=None, fq=None, sort=None):
+        self.fqs.append(fq)
+        self.last_search_skipped = 0
+        since = re.fullmatch(r"metadata_modified:\[(\S+) TO \*\]", fq).group(1) if fq else None
+        matching = [
+            p for p in self.packages if since is None or solr_date(p["metadata_modified"]) >= since
+        ]
+        self.last_search_count = len(matching)
+        for package in matching:
+            if package["id"] in self.flaky:
+                self.flaky.discard(package["id"])
+                self.last_search_skipped += 1
+                continue
+            yield package
+
+
+def stored_ids(store):
+    packages, _ = store.tables()
+    return set(packages.column("id").to_pylist())
+
+
+def test_skipped_package_holds_the_high_water_and_is_fetched_next_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_harvester, "BATCH_SIZE", 3)
+    packages = make_packages(10)
+    flaky = packages[4]
+    client = FakeClient(packages, flaky=[flaky["id"]])
+    store = CatalogStore(str(tmp_path), SERVER)
+
+    first = asyncio.run(store.sync(client))
+    assert first["skipped"] == 1
+    assert not first["complete"]
+    assert stored_ids(store) == {p["id"] for p in packages} - {flaky["id"]}
+    # Held at the last package before the skip, even though later batches were written
+    assert store.manifest["high_water"] == packages[3]["metadata_modified"]
+    assert _sort_key(store.manifest["high_water"]) < _sort_key(flaky["metadata_modified"])
+
+    second = asyncio.run(store.sync(client))
+    assert client.fqs[1] == f"metadata_modified:[{solr_date(packages[3]['metadata_modified'])} TO *]"
+    assert second["skipped"] == 0
+    assert second["complete"]
+    assert flaky["id"] in stored_ids(store)
+    assert store.manifest["high_water"] == packages[-1]["metadata_modified"]
+
+
+def test_sync_without_skips_advances_to_the_last_package(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_harvester, "BATCH_SIZE", 3)
+    packages = make_packages(7)
+    store = CatalogStore(str(tmp_path), SERVER)
+
+    summary = asyncio.run(store.sync(FakeClient(packages)))
+    assert summary["complete"]
+    assert summary["fetched"] == 7
+    assert store.manifest["high_water"] == packages[-1]["metadata_modified"]
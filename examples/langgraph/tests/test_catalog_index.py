@@ -0,0 +1,105 @@
+"""CatalogIndex matching rule, facets and in-place updates."""
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from catalog_harvester import CatalogStore
+from catalog_index import CatalogIndex, min_should_match
+from ckan_records import DatasetRecord
+
+
+def package(pid, title, formats=("CSV",), modified="2026-01-01T00:00:00"):
+    return {
+        "id": pid,
+        "name": pid,
+        "title": title,
+        "metadata_modified": modified,
+        "resources": [{"name": f"{pid} data", "format": f} for f in formats],
+    }
+
+
+def index_of(*packages):
+    index = CatalogIndex()
+    index.update(DatasetRecord.from_dict(p) for p in packages)
+    return index
+
+
+def ids(result):
+    return {r.id for r in result.records}
+
+
+def test_min_should_match_follows_ckan_default():
+    # mm "2<-1 5<80%": all of 1-2 terms, all but one of 3-5, 80% (rounded down) of more
+    assert [min_should_match(n) for n in range(1, 12)] == [1, 2, 2, 3, 4, 4, 5, 6, 7, 8, 8]
+
+
+def test_two_terms_must_both_match():
+    index = index_of(
+        package("both", "Parcheggi biciclette"),
+        package("one", "Parcheggi auto"),
+    )
+    assert ids(index.search("parcheggi biciclette")) == {"both"}
+
+
+def test_three_terms_allow_one_miss():
+    index = index_of(
+        package("three", "Autobus ferrovia tram"),
+        package("two", "Autobus ferrovia orari"),
+        package("one", "Autobus orari linee"),
+    )
+    result = index.search("autobus ferrovia tram")
+    assert ids(result) == {"three", "two"}
+    assert result.count == 2
+    assert result.records[0].id == "three"
+
+
+def test_inline_res_format_filter():
+    index = index_of(
+        package("csv", "Qualità aria", formats=("csv",)),
+        package("json", "Qualità aria", formats=("JSON",)),
+    )
+    assert ids(index.search("qualità aria res_format:CSV")) == {"csv"}
+    assert ids(index.search("aria", filters={"res_format": "json"})) == {"json"}
+    # Inline and explicit filters on different facets both apply
+    assert not ids(index.search("aria res_format:CSV", filters={"license_id": "cc-by"}))
+    with pytest.raises(ValueError):
+        index.search("aria", filters={"colour": "red"})
+
+
+def test_update_replaces_and_remove_drops():
+    index = index_of(package("a", "Rifiuti urbani"), package("b", "Rifiuti speciali"))
+    index.update([DatasetRecord.from_dict(package("a", "Energia elettrica"))])
+    assert len(index) == 2
+    assert ids(index.search("rifiuti")) == {"b"}
+    assert ids(index.search("energia")) == {"a"}
+
+    assert index.remove(["b", "missing"]) == 1
+    assert len(index) == 1
+    assert not ids(index.search("rifiuti"))
+    assert ids(index.search("")) == {"a"}
+
+
+def test_refresh_applies_store_changes(tmp_path):
+    store = CatalogStore(str(tmp_path / "old"), "https://demo.ckan.org")
+    store._write_part(
+        [
+            package("a", "Rifiuti urbani", modified="2026-01-01T00:00:00"),
+            package("b", "Rifiuti speciali", modified="2026-01-02T00:00:00"),
+        ]
+    )
+    index = CatalogIndex.from_store(store)
+    assert len(index) == 2
+
+    # A newer version of a, a new package c, and b gone (as after a --full sync)
+    changed = CatalogStore(str(tmp_path / "new"), "https://demo.ckan.org")
+    changed._write_part(
+        [
+            package("a", "Energia elettrica", modified="2026-02-01T00:00:00"),
+            package("c", "Rifiuti differenziati", modified="2026-02-02T00:00:00"),
+        ]
+    )
+    assert index.refresh(changed) == {"added": 1, "updated": 1, "removed": 1}
+    assert ids(index.search("rifiuti")) == {"c"}
+    assert ids(index.search("energia")) == {"a"}
+    assert index.refresh(changed) == {"added": 0, "updated": 0, "removed": 0}
@@ -0,0 +1,66 @@
+"""CKANMCPClient.iter_packages paging, with a fake session over synthetic pages."""
+
+import asyncio
+
+from ckan_client import CHARACTER_LIMIT, CKANMCPClient
+from standin_server import text_result
+from synthetic import generate_packages, render_response, search_result
+
+
+class FakeSearchSession:
+    """ckan_package_search over a fixed package list, cut at CHARACTER_LIMIT."""
+
+    def __init__(self, packages, with_count=True):
+        self.packages = packages
+        self.with_count = with_count
+        self.calls = []
+
+    async def call_tool(self, name, arguments=None, **kwargs):
+        rows, start = arguments["rows"], arguments["start"]
+        self.calls.append((start, rows))
+        result = search_result(self.packages, start, rows)
+        if not self.with_count:
+            del result["count"]
+        return text_result(render_response(result, limit=CHARACTER_LIMIT))
+
+
+def collect(client, **kwargs):
+    async def run():
+        return [d["id"] async for d in client.iter_packages("*:*", **kwargs)]
+
+    return asyncio.run(run())
+
+
+def test_oversized_package_is_skipped_and_the_rest_yielded():
+    packages = generate_packages(60, 1)
+    # Truncated even as a one-row page
+    packages[20]["notes"] = "x" * (2 * CHARACTER_LIMIT)
+    session = FakeSearchSession(packages)
+    client = CKANMCPClient(session, server_url="https://demo.ckan.org")
+
+    ids = collect(client)
+    assert ids == [p["id"] for i, p in enumerate(packages) if i != 20]
+    assert client.last_search_skipped == 1
+    assert client.last_search_count == 60
+    # Halved down to one row, then the one-row page was tried twice before the skip
+    assert session.calls.count((20, 1)) == 2
+
+
+def test_skipped_packages_do_not_count_toward_max_results():
+    packages = generate_packages(60, 2)
+    packages[3]["notes"] = "x" * (2 * CHARACTER_LIMIT)
+    client = CKANMCPClient(FakeSearchSession(packages), server_url="https://demo.ckan.org")
+
+    ids = collect(client, max_results=30)
+    assert len(ids) == 30
+    assert packages[3]["id"] not in ids
+    assert client.last_search_skipped == 1
+
+
+def test_pages_past_the_first_without_a_count():
+    packages = generate_packages(60, 3)
+    session = FakeSearchSession(packages, with_count=False)
+    client = CKANMCPClient(session, server_url="https://demo.ckan.org")
+
+    assert collect(client, max_results=25) == [p["id"] for p in packages[:25]]
+    assert collect(client) == [p["id"] for p in packages]
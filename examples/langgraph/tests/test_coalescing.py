@@ -0,0 +1,83 @@
+"""CoalescingSession sharing and cancellation, with a fake session."""
+
+import asyncio
+
+from tool_cache import CoalescingSession
+
+ARGS = {"id": "ds-1"}
+
+
+class GatedSession:
+    """call_tool blocks until release() and records how each call ended."""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+        self.gate = asyncio.Event()
+
+    async def call_tool(self, name, arguments=None, **kwargs):
+        self.started += 1
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"{name} #{self.started}"
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_cancelled_waiter_leaves_the_call_running_for_others():
+    async def run():
+        session = GatedSession()
+        coalescer = CoalescingSession(session)
+        first = asyncio.ensure_future(coalescer.call_tool("ckan_package_show", ARGS))
+        second = asyncio.ensure_future(coalescer.call_tool("ckan_package_show", ARGS))
+        await settle()
+        first.cancel()
+        await settle()
+        session.gate.set()
+        assert await second == "ckan_package_show #1"
+        assert first.cancelled()
+        assert session.started == 1
+        assert session.cancelled == 0
+        assert coalescer.stats() == {"calls": 1, "coalesced": 1, "in_flight": 0}
+
+    asyncio.run(run())
+
+
+def test_cancelling_the_last_waiter_cancels_the_call():
+    async def run():
+        session = GatedSession()
+        coalescer = CoalescingSession(session)
+        waiters = [
+            asyncio.ensure_future(coalescer.call_tool("ckan_package_show", ARGS))
+            for _ in range(2)
+        ]
+        await settle()
+        for waiter in waiters:
+            waiter.cancel()
+        await settle()
+        assert session.cancelled == 1
+        assert coalescer.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_call_after_a_cancelled_flight_starts_a_fresh_one():
+    async def run():
+        session = GatedSession()
+        coalescer = CoalescingSession(session)
+        waiter = asyncio.ensure_future(coalescer.call_tool("ckan_package_show", ARGS))
+        await settle()
+        waiter.cancel()
+        await settle()
+        session.gate.set()
+        result = await coalescer.call_tool("ckan_package_show", ARGS)
+        assert result == "ckan_package_show #2"
+        assert coalescer.stats() == {"calls": 2, "coalesced": 0, "in_flight": 0}
+
+    asyncio.run(run())
@@ -0,0 +1,95 @@
+"""HedgedSession budgets, latency samples and deadlines, with fake sessions."""
+
+import asyncio
+
+import pytest
+from mcp.types import CallToolResult, TextContent
+
+import adaptive_limiter
+import hedging
+from adaptive_limiter import LimitedSession, PortalLimiters
+from hedging import HedgedSession, ToolDeadlineExceeded
+
+
+def result(text, error=False):
+    return CallToolResult(content=[TextContent(type="text", text=text)], isError=error)
+
+
+class ScriptedSession:
+    """Each call sleeps and returns the next (seconds, result) step."""
+
+    def __init__(self, steps):
+        self.steps = iter(steps)
+        self.calls = 0
+
+    async def call_tool(self, name, arguments=None, **kwargs):
+        self.calls += 1
+        seconds, outcome = next(self.steps)
+        await asyncio.sleep(seconds)
+        return outcome
+
+
+def test_hedges_do_not_spend_retry_tokens(monkeypatch):
+    monkeypatch.setattr(hedging, "MIN_SAMPLES", 1)
+    monkeypatch.setattr(hedging, "MIN_HEDGE_DELAY", 0.01)
+    monkeypatch.setattr(hedging, "BACKOFF_BASE", 0.0)
+    ok = result("ok")
+    overloaded = result("CKAN API error (503): unavailable", error=True)
+    # A fast call to set the hedge delay, then a slow attempt that is hedged,
+    # then a 503 that has to be retried
+    session = ScriptedSession(
+        [(0.01, ok), (0.2, ok), (0.0, ok), (0.0, overloaded), (0.0, ok)]
+    )
+    hedged = HedgedSession(session)
+    hedged.hedge_budget.tokens = 1
+    hedged.budget.tokens = 1
+
+    async def run():
+        await hedged.call_tool("ckan_package_show")
+        await hedged.call_tool("ckan_package_show")  # hedged
+        return await hedged.call_tool("ckan_package_show")  # retried
+
+    assert asyncio.run(run()) is ok
+    assert hedged.hedges == 1
+    assert hedged.retries == 1
+    assert hedged.budget.denied == 0
+
+
+def test_cancelled_losers_are_not_recorded(monkeypatch):
+    monkeypatch.setattr(hedging, "MIN_SAMPLES", 1)
+    monkeypatch.setattr(hedging, "MIN_HEDGE_DELAY", 0.01)
+    ok = result("ok")
+    session = ScriptedSession([(0.01, ok), (0.5, ok), (0.0, ok)])
+    hedged = HedgedSession(session)
+
+    async def run():
+        await hedged.call_tool("ckan_package_show")
+        await hedged.call_tool("ckan_package_show")
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert hedged.hedge_wins == 1
+    # The first call and the winning hedge; not the cancelled 0.5 s attempt
+    assert len(hedged._latencies["ckan_package_show"]) == 2
+    assert max(hedged._latencies["ckan_package_show"]) < 0.1
+
+
+def test_deadline_miss_counts_as_overload():
+    limiters = PortalLimiters()
+    session = ScriptedSession([(1.0, result("ok"))])
+    hedged = HedgedSession(
+        LimitedSession(session, limiters, "https://demo.ckan.org"),
+        deadlines={"ckan_package_show": 0.05},
+    )
+
+    async def run():
+        with pytest.raises(ToolDeadlineExceeded):
+            await hedged.call_tool("ckan_package_show")
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    limiter = limiters.get("https://demo.ckan.org")
+    assert hedged.deadline_misses == 1
+    assert limiter.overloads == 1
+    assert limiter.in_flight == 0
+    assert limiter.limit == adaptive_limiter.INITIAL_LIMIT * adaptive_limiter.BACKOFF
@@ -0,0 +1,132 @@
+"""The pruned and vectorised scoring paths against score_dataset(), over synthetic packages."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from metadata_quality import MetadataQualityScorer
+from synthetic import generate_packages
+
+NOWS = [datetime(2026, 6, 1, tzinfo=timezone.utc), datetime(2026, 6, 1)]
+
+
+def packages_with_edge_cases(count=2000, seed=7):
+    packages = generate_packages(count, seed)
+    # Repeated extras key: the last value wins, as in the dict _score_richness builds
+    packages[0]["extras"] = [{"key": "frequency", "value": "x"}, {"key": "frequency", "value": ""}]
+    packages[1]["metadata_modified"] = "not a date"
+    packages[2]["metadata_modified"] = None
+    packages[3]["metadata_modified"] = "2024-01-01T10:00:00"  # Naive, compared in local time
+    packages[4]["organization"] = None
+    packages[5]["resources"] = []
+    packages[6]["resources"][0].update(format="", url=None, description="")
+    packages[7]["notes"] = ""
+    packages[8]["author"] = ""
+    packages[9]["tags"] = []
+    return packages
+
+
+def assert_same_scores(result, expected):
+    assert result["score"].tolist() == [q["score"] for q in expected]
+    assert result["level"] == [q["level"] for q in expected]
+    for name, values in result["breakdown"].items():
+        assert values.tolist() == [q["breakdown"][name] for q in expected], name
+
+
+@pytest.mark.parametrize("threshold", [0, 40, 55, 60, 70, 80, 90, 101])
+def test_score_at_least_agrees_with_score_dataset(threshold):
+    now = NOWS[0]
+    for dataset in packages_with_edge_cases(1500):
+        full = MetadataQualityScorer.score_dataset(dataset, now)
+        pruned = MetadataQualityScorer.score_at_least(dataset, threshold, now)
+        if full["score"] >= threshold:
+            assert pruned is not None
+            assert pruned["score"] == full["score"]
+            assert pruned["level"] == full["level"]
+            assert pruned["breakdown"] == full["breakdown"]
+        else:
+            assert pruned is None
+
+
+@pytest.mark.parametrize("k, threshold", [(1, 0), (10, 75), (100, 0), (100, 60), (5000, 0)])
+def test_top_k_equals_sorting_score_dataset(k, threshold):
+    now = NOWS[0]
+    packages = packages_with_edge_cases(1500)
+    scores = [MetadataQualityScorer.score_dataset(p, now)["score"] for p in packages]
+    # Stable sort: ties keep input order
+    expected = sorted(
+        (i for i, score in enumerate(scores) if score >= threshold), key=lambda i: -scores[i]
+    )[:k]
+
+    top = MetadataQualityScorer.top_k(packages, k, threshold, now)
+    assert [id(dataset) for dataset, _ in top] == [id(packages[i]) for i in expected]
+    assert [quality["score"] for _, quality in top] == [scores[i] for i in expected]
+
+
+def test_filter_datasets_keeps_input_order():
+    now = NOWS[0]
+    packages = packages_with_edge_cases(500)
+    expected = [
+        p for p in packages if MetadataQualityScorer.score_dataset(p, now)["score"] >= 60
+    ]
+    kept = [d for d, _ in MetadataQualityScorer.filter_datasets(packages, 60, now)]
+    assert [id(d) for d in kept] == [id(p) for p in expected]
+
+
+@pytest.mark.parametrize("now", NOWS)
+def test_score_batch_matches_score_dataset(now):
+    pytest.importorskip("numpy")
+    packages = packages_with_edge_cases()
+    expected = [MetadataQualityScorer.score_dataset(p, now) for p in packages]
+    assert_same_scores(MetadataQualityScorer.score_batch(packages, now), expected)
+
+
+@pytest.mark.parametrize("now", NOWS)
+def test_score_tables_matches_score_dataset(tmp_path, now):
+    pytest.importorskip("numpy")
+    pytest.importorskip("pyarrow")
+    from catalog_harvester import CatalogStore
+
+    store = CatalogStore(str(tmp_path), "https://demo.ckan.org")
+    packages = packages_with_edge_cases()
+    store._write_part(packages[:1000], advance=False)
+    store._write_part(packages[1000:], advance=False)
+
+    expected = [MetadataQualityScorer.score_dataset(d, now) for d in store.datasets()]
+    assert_same_scores(MetadataQualityScorer.score_tables(*store.tables(), now), expected)
+
+
+@pytest.mark.parametrize("naive", [False, True])
+def test_score_tables_parses_uniform_dates_in_bulk(tmp_path, naive):
+    pytest.importorskip("numpy")
+    pytest.importorskip("pyarrow")
+    from catalog_harvester import CatalogStore
+
+    store = CatalogStore(str(tmp_path), "https://demo.ckan.org")
+    packages = generate_packages(500, 3)
+    if naive:
+        for package in packages:
+            package["metadata_modified"] = package["metadata_modified"][:19]
+    store._write_part(packages, advance=False)
+
+    for now in NOWS:
+        expected = [MetadataQualityScorer.score_dataset(d, now) for d in store.datasets()]
+        assert_same_scores(MetadataQualityScorer.score_tables(*store.tables(), now), expected)
+
+
+def test_max_subscores_match_the_rules():
+    # score_at_least prunes with these bounds; they must be the rules' real maxima
+    m = MetadataQualityScorer
+    assert m.MAX_SUBSCORES == {
+        "completeness": sum(p for _, p, _ in m.COMPLETENESS_FIELDS) + m.GEO_POINTS,
+        "richness": m.NOTES_TIERS[0][1]
+        + m.TAG_TIERS[0][1]
+        + m.TEMPORAL_POINTS
+        + m.FREQUENCY_POINTS,
+        "resources": m.RESOURCE_POINTS
+        + m.OPEN_FORMAT_POINTS
+        + m.CSV_POINTS
+        + 2 * m.ALL_RESOURCES_POINTS
+        + m.DATASTORE_POINTS,
+        "freshness": m.FRESHNESS_TIERS[0][1],
+    }
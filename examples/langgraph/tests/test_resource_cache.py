@@ -0,0 +1,73 @@
+"""ResourceCache eviction against a local HTTP server."""
+
+import contextlib
+import os
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from resource_cache import ResourceCache
+
+FILES = {f"/{name}.csv": name.encode() * 100 for name in "abc"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = FILES[self.path]
+        etag = f'"{self.path}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_recently_used_files_are_not_evicted(tmp_path):
+    cache = ResourceCache(str(tmp_path), max_bytes=150)
+    with serve() as base:
+        resources = [cache.fetch_sync(f"{base}/{name}.csv") for name in "abc"]
+
+    # Over budget, but every file was just handed out
+    assert cache.evictions == 0
+    assert all(os.path.exists(r.path) for r in resources)
+
+    cache.evict_grace = 0
+    cache.evict()
+    assert cache.evictions == 2
+    assert cache.stats()["bytes"] <= 150
+
+
+def test_refetch_after_the_file_was_evicted(tmp_path):
+    cache = ResourceCache(str(tmp_path), revalidate_after=0)
+    with serve() as base:
+        url = f"{base}/a.csv"
+        first = cache.fetch_sync(url)
+        assert cache.fetch_sync(url).status == "revalidated"
+
+        # Evicted between the URL lookup and the touch: the 304 cannot be used
+        with contextlib.closing(sqlite3.connect(tmp_path / "index.sqlite")) as conn, conn:
+            conn.execute("DELETE FROM objects")
+        again = cache.fetch_sync(url)
+
+    assert again.status == "downloaded"
+    assert again.path == first.path
+    with again.mmap() as data:
+        assert data[:] == FILES["/a.csv"]
@@ -0,0 +1,86 @@
+"""SessionPool worker restarts, with fake workers instead of server subprocesses."""
+
+import asyncio
+
+import pytest
+
+import session_pool
+from session_pool import SessionPool, _Worker
+
+
+class BrokenSession:
+    async def call_tool(self, name, arguments=None, **kwargs):
+        raise ConnectionError("pipe closed")
+
+
+class FakeSession:
+    async def call_tool(self, name, arguments=None, **kwargs):
+        return f"{name} ok"
+
+
+def fake_workers(monkeypatch, outcomes):
+    """Each worker start takes the next outcome: a session, or None to fail."""
+    outcomes = iter(outcomes)
+
+    async def run(self):
+        try:
+            session = next(outcomes)
+            if session is None:
+                self._error = ConnectionError("spawn failed")
+                return
+            self.session = session
+            self.alive = True
+            self._ready.set()
+            await self._stop.wait()
+        finally:
+            self.alive = False
+            self.session = None
+            self._ready.set()
+
+    monkeypatch.setattr(_Worker, "_run", run)
+    monkeypatch.setattr(session_pool, "RESTART_BACKOFF", 0.05)
+
+
+def test_failed_restart_is_retried_after_backoff(monkeypatch):
+    fake_workers(monkeypatch, [BrokenSession(), None, FakeSession()])
+
+    async def run():
+        async with SessionPool(server_params=object(), size=1) as pool:
+            # The worker dies, its replacement fails to start: the slot backs off
+            with pytest.raises(ConnectionError):
+                await pool.call_tool("ckan_package_search")
+            assert pool.stats()["live"] == 0
+            with pytest.raises(ConnectionError):
+                await pool.call_tool("ckan_package_search")
+
+            await asyncio.sleep(0.06)
+            assert await pool.call_tool("ckan_package_search") == "ckan_package_search ok"
+            assert pool.stats()["live"] == 1
+            assert pool.restarts == 2
+        assert not pool._tasks
+
+    asyncio.run(run())
+
+
+def test_backoff_doubles_per_failed_start(monkeypatch):
+    fake_workers(monkeypatch, [BrokenSession(), None, None, FakeSession()])
+
+    async def run():
+        async with SessionPool(server_params=object(), size=1) as pool:
+            with pytest.raises(ConnectionError):
+                await pool.call_tool("ckan_package_search")
+            first = pool._workers[0]
+            assert first.failures == 1
+            first_retry = first.retry_at
+
+            await asyncio.sleep(0.06)
+            with pytest.raises(ConnectionError):
+                await pool.call_tool("ckan_package_search")
+            second = pool._workers[0]
+            assert second.failures == 2
+            assert second.retry_at - first_retry >= 0.1  # 0.05 s, then 0.1 s
+
+            await asyncio.sleep(0.11)
+            assert await pool.call_tool("ckan_package_search") == "ckan_package_search ok"
+
+    asyncio.run(run())
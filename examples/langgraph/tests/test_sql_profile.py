@@ -0,0 +1,34 @@
+"""profile_datastore_sql result typing, with a fake client returning string aggregates."""
+
+import asyncio
+
+from sql_profile import profile_datastore_sql
+
+FIELDS = [
+    {"id": "_id", "type": "int"},
+    {"id": "code", "type": "text"},
+    {"id": "amount", "type": "numeric"},
+]
+
+
+class FakeSQLClient:
+    async def datastore_search_sql(self, sql):
+        # PostgreSQL numerics come back as strings, like text values
+        return {
+            "records": [
+                {
+                    "row_count": "4",
+                    "c0_count": "3", "c0_distinct": "3", "c0_min": "00123", "c0_max": "1e5",
+                    "c1_count": "4", "c1_distinct": "4", "c1_min": "-2.5", "c1_max": "1e5",
+                    "c1_mean": "12.25",
+                }
+            ]
+        }
+
+
+def test_only_numeric_aggregates_are_coerced():
+    profile = asyncio.run(profile_datastore_sql(FakeSQLClient(), "res", FIELDS))
+    code, amount = profile["columns"]
+    assert (code["type"], code["min"], code["max"]) == ("string", "00123", "1e5")
+    assert code["nulls"] == 1
+    assert (amount["min"], amount["max"], amount["mean"]) == (-2.5, 100000.0, 12.25)
@@ -0,0 +1,28 @@
+"""Prometheus export of Tracer spans."""
+
+import re
+
+from tracing import Tracer, label_value
+
+# name="value" pairs as the text format allows them: \\, \" and \n are the only escapes
+SAMPLE = re.compile(r'^[a-z_]+\{(?:[a-z_]+="(?:[^"\\\n]|\\[\\"n])*",?)+\} \S+$')
+
+
+def test_label_value_escapes():
+    assert label_value('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+    assert label_value("plain") == "plain"
+
+
+def test_prometheus_lines_stay_valid_with_awkward_names():
+    tracer = Tracer()
+    with tracer.activate():
+        for name in ['say "hi"', "C:\\data", "two\nlines"]:
+            with tracer.span(name, "node"):
+                pass
+
+    lines = tracer.to_prometheus().splitlines()
+    samples = [line for line in lines if not line.startswith("#")]
+    assert samples
+    assert all(SAMPLE.match(line) for line in samples), samples
+    assert 'ckan_span_errors_total{kind="node",name="say \\"hi\\""} 0' in samples
+    assert 'ckan_span_errors_total{kind="node",name="two\\nlines"} 0' in samples
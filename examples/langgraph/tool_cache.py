@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+TTL/LRU Cache for MCP Tool Calls
+
+Caches `call_tool` results keyed on a canonical hash of tool name plus
+arguments, so repeated identical queries skip the Node round trip and the
+upstream CKAN request.
+
+- Per-tool TTL (seconds); a TTL of 0 disables caching for that tool
+- Size-bounded in-memory LRU
+- Optional SQLite backing store shared across runs, capped at
+  MAX_DISK_ENTRIES rows (soonest-expiring rows are dropped first)
+- Hit/miss counters
+- CoalescingSession: identical calls already in flight share one request
+
+Usage:
+    cache = ToolCallCache(disk_path="tool_cache.sqlite")
+    mcp_client = CKANMCPClient(CachedSession(CoalescingSession(session), cache))
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from mcp.types import CallToolResult
+
+from tracing import current_span
+from truncated_json import TRUNCATION_MARKER
+
+# Configuration
+DEFAULT_TTL = 300  # Seconds, for tools not listed in TOOL_TTLS
+TOOL_TTLS = {
+    "ckan_package_search": 300,
+    "ckan_package_show": 900,
+    "ckan_datastore_search": 600,
+    "ckan_datastore_search_sql": 600,
+    "ckan_status_show": 0,  # Never cache
+}
+MAX_ENTRIES = 1024
+MAX_DISK_ENTRIES = 50_000  # Rows in the SQLite store; None = unbounded
+
+
+def cache_key(name: str, arguments: dict[str, Any] | None) -> str:
+    """Canonical hash of a tool call (argument order does not matter)."""
+    payload = json.dumps(
+        {"tool": name, "arguments": arguments or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_error(result: CallToolResult) -> bool:
+    """Error flag of a tool result (`isError` in mcp 1.x, `is_error` in 2.x)."""
+    return bool(getattr(result, "isError", None) or getattr(result, "is_error", False))
+
+
+def is_truncated(result: CallToolResult) -> bool:
+    """True if a text block was cut at the server's CHARACTER_LIMIT."""
+    return any(c.type == "text" and TRUNCATION_MARKER in c.text for c in result.content)
+
+
+class ToolCallCache:
+    """In-memory LRU of tool results with per-tool TTL and optional disk store."""
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        ttls: dict[str, float] | None = None,
+        default_ttl: float = DEFAULT_TTL,
+        disk_path: str | None = None,
+        max_disk_entries: int | None = MAX_DISK_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttls = TOOL_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, CallToolResult]] = OrderedDict()
+
+        self.conn = None
+        if disk_path:
+            self.conn = sqlite3.connect(disk_path, timeout=30)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tool_cache (
+                    key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    result TEXT NOT NULL
+                )
+                """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS tool_cache_expires ON tool_cache (expires_at)"
+            )
+            self._disk_rows = self._trim_disk()
+            self.conn.commit()
+
+    def ttl_for(self, name: str) -> float:
+        """TTL in seconds for a tool."""
+        return self.ttls.get(name, self.default_ttl)
+
+    def get(self, name: str, arguments: dict[str, Any] | None) -> CallToolResult | None:
+        """Return a cached result, or None on miss/expiry."""
+        if self.ttl_for(name) <= 0:
+            return None
+
+        key = cache_key(name, arguments)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, result = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+
+        if self.conn:
+            row = self.conn.execute(
+                "SELECT expires_at, result FROM tool_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[0] > now:
+                result = CallToolResult.model_validate_json(row[1])
+                self._remember(key, row[0], result)
+                self.hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    def put(
+        self, name: str, arguments: dict[str, Any] | None, result: CallToolResult
+    ):
+        """Store a successful, complete result (truncated ones are retried, not cached)."""
+        ttl = self.ttl_for(name)
+        if ttl <= 0 or is_error(result) or is_truncated(result):
+            return
+
+        key = cache_key(name, arguments)
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, result)
+
+        if self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tool_cache VALUES (?, ?, ?, ?)",
+                (key, name, expires_at, result.model_dump_json()),
+            )
+            # Upper bound (replaced keys are counted too); recounted when trimming
+            self._disk_rows += 1
+            if self.max_disk_entries is not None and self._disk_rows > self.max_disk_entries:
+                self._disk_rows = self._trim_disk()
+            self.conn.commit()
+
+    def _trim_disk(self) -> int:
+        """Drop expired rows, then the soonest-expiring ones over the cap; return the row count."""
+        self.conn.execute("DELETE FROM tool_cache WHERE expires_at <= ?", (time.time(),))
+        rows = self.conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()[0]
+        if self.max_disk_entries is not None and rows > self.max_disk_entries:
+            # Trim a little below the cap so the next trim is not one put away
+            excess = rows - self.max_disk_entries * 9 // 10
+            self.conn.execute(
+                "DELETE FROM tool_cache WHERE key IN "
+                "(SELECT key FROM tool_cache ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            )
+            rows -= excess
+        return rows
+
+    def _remember(self, key: str, expires_at: float, result: CallToolResult):
+        """Insert into the in-memory LRU, evicting the oldest entries."""
+        self._entries[key] = (expires_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def close(self):
+        """Close the disk store, if any."""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+class CachedSession:
+    """Wraps a ClientSession so call_tool goes through a ToolCallCache."""
+
+    def __init__(self, session, cache: ToolCallCache):
+        self.session = session
+        self.cache = cache
+
+    async def call_tool(
+        self, name: str, arguments: dict[str, Any] | None = None, **kwargs
+    ) -> CallToolResult:
+        """Return a cached result or forward to the wrapped session."""
+        result = self.cache.get(name, arguments)
+        span = current_span()
+        if span is not None and self.cache.ttl_for(name) > 0:
+            span.cache = "miss" if result is None else "hit"
+        if result is not None:
+            return result
+
+        result = await self.session.call_tool(name, arguments=arguments, **kwargs)
+        self.cache.put(name, arguments, result)
+        return result
+
+    def __getattr__(self, name: str):
+        # Delegate everything else (initialize, list_tools, ...) to the session
+        return getattr(self.session, name)
+
+
+@dataclass(slots=True)
+class _Flight:
+    """A call in flight and how many callers are waiting on it."""
+
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class CoalescingSession:
+    """
+    Wraps a ClientSession so identical concurrent calls share one request.
+
+    The first caller starts the call; callers with the same tool and
+    arguments arriving before it finishes await the same task. A caller
+    that is cancelled stops waiting without cancelling the shared call;
+    the call is cancelled only when its last waiter goes away. Calls with
+    extra keyword arguments (progress callbacks, timeouts) are not shared.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: dict[str, _Flight] = {}
+
+    async def call_tool(
+        self, name: str, arguments: dict[str, Any] | None = None, **kwargs
+    ) -> CallToolResult:
+        """Join an identical call in flight, or start one."""
+        if kwargs:
+            return await self.session.call_tool(name, arguments=arguments, **kwargs)
+
+        key = cache_key(name, arguments)
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(self.session.call_tool(name, arguments=arguments))
+            flight = self._flights[key] = _Flight(task)
+            task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+            span = current_span()
+            if span is not None:
+                span.attrs["coalesced"] = True
+
+        flight.waiters += 1
+        try:
+            # shield: cancelling this waiter must not cancel the shared task
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every waiter gave up; nobody needs the result
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: str, flight: _Flight):
+        # A later call with the same key may already have started a new flight
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, Any]:
+        """Requests sent and calls that joined one in flight."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
+
+    def __getattr__(self, name: str):
+        # Delegate everything else (initialize, list_tools, ...) to the session
+        return getattr(self.session, name)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Latency Tracing for LangGraph Workflows
+
+Records a span for every graph node, every MCP tool call and every
+response decode, so a slow run can be attributed to the Node server or
+upstream portal (tool spans), JSON decoding (decode spans) or scoring and
+other local work (node spans).
+
+Each span holds wall time, bytes received, items decoded, cache hit/miss
+and transport retries. Spans nest through a context variable, so the
+session wrappers (CachedSession, SessionPool) annotate the tool span they
+run under without holding a reference to the tracer.
+
+Traces are exported as JSON or Prometheus text, with p50/p95/p99 per span
+name.
+
+Usage:
+    tracer = Tracer()
+    mcp_client = CKANMCPClient(TracedSession(CachedSession(session, cache)))
+    graph.add_node("search", traced_node(search_wrapper, "search"))
+
+    with tracer.activate():
+        result = await workflow.ainvoke(initial_state)
+    print(tracer.format_summary())
+    tracer.export("trace.json")  # or "metrics.prom"
+"""
+
+import functools
+import inspect
+import itertools
+import json
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable
+
+# Configuration
+PERCENTILES = (50, 95, 99)
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_active_tracer: ContextVar["Tracer | None"] = ContextVar("active_tracer", default=None)
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+@dataclass(slots=True)
+class Span:
+    """One timed operation."""
+
+    name: str
+    kind: str  # "node", "tool" or "decode"
+    span_id: int
+    parent_id: int | None
+    start: float  # Unix time
+    duration_s: float = 0.0
+    bytes: int = 0
+    items: int = 0
+    cache: str | None = None  # "hit" or "miss" when a tool cache is in front
+    retries: int = 0
+    error: str | None = None
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+def label_value(value: Any) -> str:
+    """Escape a Prometheus label value (backslash, double quote, newline)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Tracer:
+    """Collects spans and exports them as JSON or Prometheus text."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._ids = itertools.count(1)
+
+    @contextmanager
+    def activate(self):
+        """Make this tracer receive spans opened in the current context."""
+        token = _active_tracer.set(self)
+        try:
+            yield self
+        finally:
+            _active_tracer.reset(token)
+
+    @contextmanager
+    def span(self, name: str, kind: str):
+        """Time a block as a child of the current span."""
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            kind=kind,
+            span_id=next(self._ids),
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_s = time.perf_counter() - started
+            _current_span.reset(token)
+            self.spans.append(span)
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Per "kind:name" counts, totals and latency percentiles."""
+        groups: dict[str, list[Span]] = {}
+        for span in self.spans:
+            groups.setdefault(f"{span.kind}:{span.name}", []).append(span)
+
+        summary = {}
+        for key, spans in sorted(groups.items()):
+            durations = sorted(s.duration_s for s in spans)
+            entry = {
+                "kind": spans[0].kind,
+                "name": spans[0].name,
+                "count": len(spans),
+                "total_s": sum(durations),
+                **{f"p{p}_s": percentile(durations, p) for p in PERCENTILES},
+                "max_s": durations[-1],
+                "bytes": sum(s.bytes for s in spans),
+                "items": sum(s.items for s in spans),
+                "cache_hits": sum(1 for s in spans if s.cache == "hit"),
+                "cache_misses": sum(1 for s in spans if s.cache == "miss"),
+                "retries": sum(s.retries for s in spans),
+                "errors": sum(1 for s in spans if s.error),
+            }
+            entry["durations"] = durations
+            summary[key] = entry
+        return summary
+
+    def format_summary(self) -> str:
+        """Plain-text table of the summary, slowest total first."""
+        summary = self.summary()
+        lines = [
+            f"{'span':38} {'count':>5} {'total':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'KB':>9}",
+        ]
+        for key, entry in sorted(summary.items(), key=lambda kv: -kv[1]["total_s"]):
+            lines.append(
+                f"{key[:38]:38} {entry['count']:5d} {entry['total_s']:7.3f}s "
+                f"{entry['p50_s']:7.3f}s {entry['p95_s']:7.3f}s {entry['p99_s']:7.3f}s "
+                f"{entry['bytes'] / 1024:9.1f}"
+            )
+        return "\n".join(lines)
+
+    def to_json(self) -> dict[str, Any]:
+        """Spans plus the summary, as a JSON-serializable dict."""
+        summary = self.summary()
+        for entry in summary.values():
+            del entry["durations"]
+        return {"spans": [asdict(s) for s in self.spans], "summary": summary}
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition of the summary."""
+        lines = [
+            "# HELP ckan_span_duration_seconds Wall time of workflow spans",
+            "# TYPE ckan_span_duration_seconds histogram",
+        ]
+        summary = self.summary()
+        for entry in summary.values():
+            entry["labels"] = (
+                f'kind="{label_value(entry["kind"])}",name="{label_value(entry["name"])}"'
+            )
+        for entry in summary.values():
+            labels = entry["labels"]
+            durations = entry["durations"]
+            for le in HISTOGRAM_BUCKETS:
+                count = sum(1 for d in durations if d <= le)
+                lines.append(f'ckan_span_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(
+                f'ckan_span_duration_seconds_bucket{{{labels},le="+Inf"}} {entry["count"]}'
+            )
+            lines.append(f"ckan_span_duration_seconds_sum{{{labels}}} {entry['total_s']}")
+            lines.append(f"ckan_span_duration_seconds_count{{{labels}}} {entry['count']}")
+
+        lines += [
+            "# HELP ckan_span_duration_quantile_seconds Latency percentiles of workflow spans",
+            "# TYPE ckan_span_duration_quantile_seconds gauge",
+        ]
+        for entry in summary.values():
+            labels = entry["labels"]
+            for p in PERCENTILES:
+                lines.append(
+                    f'ckan_span_duration_quantile_seconds{{{labels},quantile="{p / 100}"}} '
+                    f"{entry[f'p{p}_s']}"
+                )
+
+        for metric, key, help_text in (
+            ("ckan_span_bytes_total", "bytes", "Response bytes received"),
+            ("ckan_span_items_total", "items", "Items decoded"),
+            ("ckan_span_cache_hits_total", "cache_hits", "Tool cache hits"),
+            ("ckan_span_cache_misses_total", "cache_misses", "Tool cache misses"),
+            ("ckan_span_retries_total", "retries", "Transport retries"),
+            ("ckan_span_errors_total", "errors", "Failed spans"),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for entry in summary.values():
+                labels = entry["labels"]
+                lines.append(f"{metric}{{{labels}}} {entry[key]}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Write Prometheus text for .prom/.txt paths, JSON otherwise."""
+        if path.endswith((".prom", ".txt")):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_json(), indent=2, ensure_ascii=False)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+@contextmanager
+def span(name: str, kind: str):
+    """Span on the active tracer; yields None when tracing is off."""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, kind) as s:
+        yield s
+
+
+def current_span() -> Span | None:
+    """Innermost open span in this context, for annotations."""
+    return _current_span.get() if _active_tracer.get() is not None else None
+
+
+def traced_node(fn: Callable, name: str | None = None) -> Callable:
+    """Wrap a graph node so each invocation is recorded as a span."""
+    node_name = name or fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with span(node_name, "node"):
+                return await fn(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(node_name, "node"):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+class TracedSession:
+    """Wraps a ClientSession so every call_tool is recorded as a span."""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def call_tool(self, name: str, arguments: dict[str, Any] | None = None, **kwargs):
+        """Forward the call, recording wall time and response size."""
+        with span(name, "tool") as s:
+            result = await self.session.call_tool(name, arguments=arguments, **kwargs)
+            if s is not None:
+                s.bytes = sum(
+                    len(c.text.encode("utf-8")) for c in result.content if c.type == "text"
+                )
+                # isError in mcp 1.x, is_error in 2.x (see tool_cache.is_error)
+                if getattr(result, "isError", None) or getattr(result, "is_error", False):
+                    s.error = "tool error"
+            return result
+
+    def __getattr__(self, name: str):
+        # Delegate everything else (initialize, list_tools, ...) to the session
+        return getattr(self.session, name)
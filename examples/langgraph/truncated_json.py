@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Truncation-Tolerant JSON Decoding for MCP Responses
+
+The CKAN MCP Server cuts responses at CHARACTER_LIMIT and appends a
+"[Response truncated at N characters]" marker, so `json.loads` on a large
+page fails and the whole page is lost.
+
+`decode_partial` walks the top-level object key by key and the chosen
+array (`results` for package_search, `records` for datastore_search)
+element by element, keeping every value that is complete before the cut.
+The number of recovered items tells the caller where to resume
+(`start`/`offset`).
+
+Usage:
+    data, recovered, complete = decode_partial(text, "results")
+    next_start = start + recovered
+"""
+
+import json
+from typing import Any
+
+TRUNCATION_MARKER = "[Response truncated"
+TRUNCATION_PREFIX = "\n\n... "  # Added by truncateText() before the marker
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def strip_truncation_marker(text: str) -> tuple[str, bool]:
+    """Remove the server's truncation marker; return (text, truncated)."""
+    if TRUNCATION_MARKER not in text:
+        return text, False
+    head = text.split(TRUNCATION_MARKER)[0]
+    if head.endswith(TRUNCATION_PREFIX):
+        head = head[: -len(TRUNCATION_PREFIX)]
+    return head, True
+
+
+def _skip_ws(text: str, idx: int) -> int:
+    while idx < len(text) and text[idx] in _WHITESPACE:
+        idx += 1
+    return idx
+
+
+def _decode_value(text: str, idx: int) -> tuple[Any, int]:
+    """
+    Decode one value, requiring something after it.
+
+    A value running to the very end of truncated text may itself be cut
+    (e.g. a number), so it is only accepted if a delimiter follows.
+    """
+    value, end = _decoder.raw_decode(text, idx)
+    if _skip_ws(text, end) >= len(text):
+        raise json.JSONDecodeError("Value reaches end of truncated text", text, end)
+    return value, end
+
+
+def _decode_array(text: str, idx: int, items: list) -> tuple[int, bool]:
+    """Decode array elements from just after '['; return (index, closed)."""
+    idx = _skip_ws(text, idx)
+    if text.startswith("]", idx):
+        return idx + 1, True
+
+    while True:
+        try:
+            item, idx = _decode_value(text, idx)
+        except json.JSONDecodeError:
+            return idx, False
+        items.append(item)
+
+        idx = _skip_ws(text, idx)
+        if text.startswith(",", idx):
+            idx = _skip_ws(text, idx + 1)
+        elif text.startswith("]", idx):
+            return idx + 1, True
+        else:
+            return idx, False
+
+
+def decode_partial(text: str, array_key: str) -> tuple[dict[str, Any], int, bool]:
+    """
+    Decode a possibly truncated JSON object.
+
+    Returns (data, recovered, complete): `data` holds every complete
+    top-level value plus the complete elements of `array_key`, `recovered`
+    is the number of those elements, and `complete` is False if the text
+    was cut anywhere.
+    """
+    text, truncated = strip_truncation_marker(text)
+
+    if not truncated:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        else:
+            if isinstance(data, dict):
+                return data, len(data.get(array_key) or []), True
+            return {}, 0, False
+
+    data: dict[str, Any] = {}
+    idx = _skip_ws(text, 0)
+    if not text.startswith("{", idx):
+        return data, 0, False
+    idx += 1
+
+    while True:
+        idx = _skip_ws(text, idx)
+        if text.startswith("}", idx):
+            break
+
+        try:
+            key, idx = _decoder.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            break
+        idx = _skip_ws(text, idx)
+        if not text.startswith(":", idx):
+            break
+        idx = _skip_ws(text, idx + 1)
+
+        if key == array_key and text.startswith("[", idx):
+            items: list = []
+            data[key] = items
+            idx, closed = _decode_array(text, idx + 1, items)
+            if not closed:
+                break
+        else:
+            try:
+                data[key], idx = _decode_value(text, idx)
+            except json.JSONDecodeError:
+                break
+
+        idx = _skip_ws(text, idx)
+        if text.startswith(",", idx):
+            idx += 1
+
+    return data, len(data.get(array_key) or []), False
+
+
+# Example usage
+if __name__ == "__main__":
+    full = json.dumps(
+        {"count": 3, "results": [{"name": f"ds-{i}"} for i in range(3)]}, indent=2
+    )
+    cut = full[: len(full) - 30] + "\n\n... [Response truncated at 50000 characters]"
+
+    data, recovered, complete = decode_partial(cut, "results")
+    print(f"count={data.get('count')} recovered={recovered} complete={complete}")
+    print([d["name"] for d in data["results"]])